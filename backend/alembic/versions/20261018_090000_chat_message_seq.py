@@ -0,0 +1,56 @@
+"""chat_message_seq
+
+Revision ID: 3f2a9c1d7b64
+Revises: 660d0da9861d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b64'
+down_revision: Union[str, None] = '660d0da9861d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions',
+        sa.Column('last_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chat_messages',
+        sa.Column('seq', sa.Integer(), nullable=True))
+
+    # Number existing messages per session in creation order
+    op.execute("""
+        UPDATE chat_messages
+        SET seq = numbered.seq
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY chat_session_id ORDER BY created_at, id
+            ) AS seq
+            FROM chat_messages
+        ) AS numbered
+        WHERE chat_messages.id = numbered.id
+    """)
+    op.execute("""
+        UPDATE chat_sessions
+        SET last_seq = counts.last_seq
+        FROM (
+            SELECT chat_session_id, max(seq) AS last_seq
+            FROM chat_messages
+            GROUP BY chat_session_id
+        ) AS counts
+        WHERE chat_sessions.id = counts.chat_session_id
+    """)
+
+    op.create_index('ix_chat_messages_session_seq', 'chat_messages',
+        ['chat_session_id', 'seq'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_session_seq', table_name='chat_messages')
+    op.drop_column('chat_messages', 'seq')
+    op.drop_column('chat_sessions', 'last_seq')
@@ -0,0 +1,57 @@
+"""hot_query_indexes
+
+Revision ID: 8c4e1b5a2d90
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e1b5a2d90'
+down_revision: Union[str, None] = '3f2a9c1d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Close all but the newest open session per user so the partial unique
+    # index can be built
+    op.execute("""
+        UPDATE chat_sessions
+        SET end_time = CURRENT_TIMESTAMP
+        WHERE end_time IS NULL
+          AND id NOT IN (
+              SELECT max(id) FROM chat_sessions
+              WHERE end_time IS NULL
+              GROUP BY user_id
+          )
+    """)
+
+    # Build outside a transaction so Postgres does not lock writes on large tables
+    with op.get_context().autocommit_block():
+        op.create_index('ux_chat_sessions_user_open', 'chat_sessions', ['user_id'],
+            unique=True,
+            postgresql_where=sa.text('end_time IS NULL'),
+            sqlite_where=sa.text('end_time IS NULL'),
+            postgresql_concurrently=True)
+        op.create_index('ix_chat_sessions_user_id_id', 'chat_sessions', ['user_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True)
+        op.create_index('ix_chat_messages_session_created', 'chat_messages',
+            ['chat_session_id', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True)
+        op.create_index(op.f('ix_auth_sessions_expires_at'), 'auth_sessions', ['expires_at'],
+            unique=False,
+            postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_auth_sessions_expires_at'), table_name='auth_sessions')
+    op.drop_index('ix_chat_messages_session_created', table_name='chat_messages')
+    op.drop_index('ix_chat_sessions_user_id_id', table_name='chat_sessions')
+    op.drop_index('ux_chat_sessions_user_open', table_name='chat_sessions')
@@ -0,0 +1,54 @@
+"""context_budget
+
+Revision ID: 5e3b8d1f4a27
+Revises: 8c4e1b5a2d90
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e3b8d1f4a27'
+down_revision: Union[str, None] = '8c4e1b5a2d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_messages',
+        sa.Column('token_count', sa.Integer(), nullable=True))
+    op.add_column('chat_sessions',
+        sa.Column('token_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chat_sessions',
+        sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_sessions',
+        sa.Column('summary_seq', sa.Integer(), server_default='0', nullable=False))
+
+    # Rough backfill (characters / 4 plus per-message overhead); the app's
+    # estimator is used for new messages and whenever a count is missing
+    op.execute("""
+        UPDATE chat_messages
+        SET token_count = (length(content) + 3) / 4 + 4
+            + CASE WHEN response IS NULL OR response = '' THEN 0
+                   ELSE (length(response) + 3) / 4 + 4 END
+    """)
+    op.execute("""
+        UPDATE chat_sessions
+        SET token_total = totals.token_total
+        FROM (
+            SELECT chat_session_id, sum(token_count) AS token_total
+            FROM chat_messages
+            GROUP BY chat_session_id
+        ) AS totals
+        WHERE chat_sessions.id = totals.chat_session_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'summary_seq')
+    op.drop_column('chat_sessions', 'summary')
+    op.drop_column('chat_sessions', 'token_total')
+    op.drop_column('chat_messages', 'token_count')
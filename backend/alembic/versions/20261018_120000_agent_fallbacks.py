@@ -0,0 +1,26 @@
+"""agent_fallbacks
+
+Revision ID: 9a6c2e4f1b83
+Revises: 5e3b8d1f4a27
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6c2e4f1b83'
+down_revision: Union[str, None] = '5e3b8d1f4a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('agents',
+        sa.Column('fallbacks', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('agents', 'fallbacks')
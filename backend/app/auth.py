@@ -1,3 +1,4 @@
+import functools
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict, Any
@@ -6,18 +7,40 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from .models import User, AuthSession
 import jwt
-from passlib.context import CryptContext
-from .config import SECRET_KEY, ALGORITHM
-from .database import get_db
+from .config import (
+    SECRET_KEY,
+    ALGORITHM,
+    AUTH_CACHE_ENABLED,
+    AUTH_CACHE_TTL,
+    AUTH_CACHE_MAX_SIZE,
+    ADMIN_USERNAMES
+)
+from .database import get_db, async_session_maker
+from .cache import TTLCache
+from .ws import manager
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 logger = logging.getLogger(__name__)
 
+# Validated auth sessions keyed by session id: session_id -> user projection
+auth_session_cache = TTLCache(
+    maxsize=AUTH_CACHE_MAX_SIZE,
+    ttl=AUTH_CACHE_TTL,
+    enabled=AUTH_CACHE_ENABLED
+)
+# Logouts on any worker evict the session here too (see revoke_auth_session)
+manager.on_invalidate("auth_session", auth_session_cache.invalidate)
+
+@functools.lru_cache(maxsize=None)
+def password_context():
+    """bcrypt hashing context, built on first use (passlib is slow to import)"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 async def register_user(db: AsyncSession, username: str, email: str, password: str) -> Tuple[bool, str, Optional[User]]:
     """Register a new user"""
@@ -80,28 +103,116 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def verify_auth_session(db: AsyncSession, session_id: str) -> bool:
-    """Verify if an authentication session is valid"""
+def invalidate_auth_session(session_id: str) -> bool:
+    """Drop a session from the auth cache after logout, refresh or expiry"""
+    return auth_session_cache.invalidate(session_id)
+
+async def revoke_auth_session(session_id: str):
+    """Drop a session from the auth cache of every worker
+
+    Other workers hear about it over the websocket broker. With the default
+    in-process broker and several workers, they keep serving the session
+    from their cache for up to AUTH_CACHE_TTL.
+    """
+    invalidate_auth_session(session_id)
+    await manager.publish_invalidation("auth_session", session_id)
+
+async def get_auth_principal(db: AsyncSession, session_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve an auth session to its user, serving repeat lookups from the cache"""
+    cached = auth_session_cache.get(session_id)
+    if cached is not None:
+        if cached["expires_at"] > datetime.utcnow():
+            return cached
+        invalidate_auth_session(session_id)
+
     try:
-        stmt = select(AuthSession).where(AuthSession.id == session_id)
+        stmt = (
+            select(AuthSession, User)
+            .join(User, AuthSession.user_id == User.id)
+            .where(AuthSession.id == session_id)
+        )
         result = await db.execute(stmt)
-        session = result.scalar_one_or_none()
+        row = result.one_or_none()
 
-        if not session:
+        if not row:
             logger.warning(f"Auth session not found: {session_id}")
-            return False
+            return None
 
-        if session.expires_at < datetime.utcnow():
+        session, user = row
+        now = datetime.utcnow()
+        if session.expires_at < now:
             await db.delete(session)
             await db.commit()
             logger.info(f"Auth session expired: {session_id}")
-            return False
+            return None
 
-        logger.info(f"Auth session verified: {session_id}")
-        return True
+        principal = {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "expires_at": session.expires_at
+        }
+        auth_session_cache.set(
+            session_id,
+            principal,
+            ttl=(session.expires_at - now).total_seconds()
+        )
+        logger.debug("Auth session verified: %s", session_id)
+        return principal
     except Exception as e:
         logger.error(f"Error verifying auth session: {e}", exc_info=True)
-        return False
+        return None
+
+async def verify_auth_session(db: AsyncSession, session_id: str) -> bool:
+    """Verify if an authentication session is valid"""
+    return await get_auth_principal(db, session_id) is not None
+
+class WebSocketPrincipal:
+    """The user behind a websocket, resolved once when it connects"""
+
+    __slots__ = ("user_id", "username", "session_id", "is_admin")
+
+    def __init__(self, user_id: int, username: str, session_id: str):
+        self.user_id = user_id
+        self.username = username
+        self.session_id = session_id
+        self.is_admin = username in ADMIN_USERNAMES
+
+async def authenticate_websocket(token: str, session_id: str) -> Optional[WebSocketPrincipal]:
+    """Validate a websocket's access token and auth session
+
+    The token is checked without the database and the session through the
+    auth cache. On a cache miss a database session is opened just for the
+    lookup, so a connected socket holds no pooled connection.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    user_id = payload.get("user_id")
+    if user_id is None:
+        return None
+
+    async with async_session_maker() as db:
+        principal = await get_auth_principal(db, session_id)
+    if principal is None or principal["id"] != user_id:
+        return None
+    return WebSocketPrincipal(principal["id"], principal["username"], session_id)
+
+async def get_admin_user(request: Request) -> WebSocketPrincipal:
+    """Dependency: the admin behind a request
+
+    Uses the websocket check, so no database session stays open while a
+    long-running admin request (such as a profile) is served.
+    """
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    auth_session_id = request.cookies.get("auth_session_id")
+    principal = await authenticate_websocket(token, auth_session_id) if token and auth_session_id else None
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    if not principal.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return principal
 
 async def create_auth_session(db: AsyncSession, user_id: int, session_id: str, expire_days: int = 7) -> bool:
     """Create a new authentication session"""
@@ -123,6 +234,7 @@ async def create_auth_session(db: AsyncSession, user_id: int, session_id: str, e
 
 async def delete_auth_session(db: AsyncSession, session_id: str) -> bool:
     """Delete an authentication session"""
+    invalidate_auth_session(session_id)
     try:
         stmt = select(AuthSession).where(AuthSession.id == session_id)
         result = await db.execute(stmt)
@@ -131,6 +243,7 @@ async def delete_auth_session(db: AsyncSession, session_id: str) -> bool:
         if session:
             await db.delete(session)
             await db.commit()
+            await revoke_auth_session(session_id)
             logger.info(f"Deleted auth session: {session_id}")
             return True
         return False
@@ -177,31 +290,29 @@ async def get_current_user(
         if user_id is None:
             raise credentials_exception
 
-        # Verify session
-        if not await verify_auth_session(db, auth_session_id):
+        # Verify session and load the user in one (usually cached) lookup
+        principal = await get_auth_principal(db, auth_session_id)
+        if principal is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired session"
             )
-
-        # Get user
-        stmt = select(User).where(User.id == user_id)
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user is None:
+        if principal["id"] != user_id:
             raise credentials_exception
 
         return {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email
+            "id": principal["id"],
+            "username": principal["username"],
+            "email": principal["email"]
         }
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired"
         )
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
     except Exception as e:
         logger.error(f"Error getting current user: {e}", exc_info=True)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from typing import Callable, Optional, Set, Union
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Called with (channel, message) for every message on a subscribed channel
+MessageHandler = Callable[[str, str], None]
+
+class Broker:
+    """Pub/sub transport between the workers serving websockets
+
+    Subscriptions are declared synchronously and applied by the backend in
+    the background, so the connection manager can update them from its
+    non-async bookkeeping.
+    """
+
+    def __init__(self):
+        self.handler: Optional[MessageHandler] = None
+        self.channels: Set[str] = set()
+        self.publish_errors = 0
+
+    def bind(self, handler: MessageHandler):
+        """Set the callback receiving messages from subscribed channels"""
+        self.handler = handler
+
+    async def start(self):
+        """Connect to the backend"""
+
+    async def close(self):
+        """Disconnect from the backend"""
+
+    def subscribe(self, channel: str):
+        self.channels.add(channel)
+
+    def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+
+    async def publish(self, channel: str, message: str):
+        raise NotImplementedError
+
+    def _deliver(self, channel: str, message: str):
+        if self.handler is not None and channel in self.channels:
+            try:
+                self.handler(channel, message)
+            except Exception as e:
+                logger.error(f"Error delivering message on {channel}: {e}")
+
+class InProcessBroker(Broker):
+    """Delivers within this process only; enough for a single worker"""
+
+    async def publish(self, channel: str, message: str):
+        self._deliver(channel, message)
+
+class RedisError(Exception):
+    """Error reply from the Redis server"""
+
+def encode_command(*args: Union[str, bytes]) -> bytes:
+    """Encode a command in the Redis serialization protocol (RESP)"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply; error replies are returned as RedisError"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest
+    if prefix == b"-":
+        return RedisError(rest.decode())
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected RESP prefix: {prefix!r}")
+
+class RedisBroker(Broker):
+    """Pub/sub over a Redis server (or anything speaking its protocol)
+
+    Uses one connection for pipelined PUBLISH commands and one in subscriber
+    mode. The subscriber reconnects on failure and re-subscribes to every
+    current channel; messages published while it is down are lost, as with
+    any Redis pub/sub client.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 1.0):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.reconnect_delay = reconnect_delay
+        self._pub_writer: Optional[asyncio.StreamWriter] = None
+        self._pub_replies: Optional[asyncio.Task] = None
+        self._pub_lock = asyncio.Lock()
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._sub_task: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            reply = await read_reply(reader)
+            if isinstance(reply, RedisError):
+                writer.close()
+                raise reply
+        return reader, writer
+
+    async def start(self):
+        await self._connect_publisher()
+        self._sub_task = asyncio.create_task(self._subscriber())
+        # Wait for the first subscriber connection so early joins are not lost
+        await asyncio.wait_for(self._subscribed.wait(), 5)
+
+    async def close(self):
+        for task in (self._sub_task, self._pub_replies):
+            if task:
+                task.cancel()
+        for writer in (self._sub_writer, self._pub_writer):
+            if writer:
+                writer.close()
+        self._sub_writer = self._pub_writer = None
+
+    async def _connect_publisher(self):
+        reader, writer = await self._open()
+        self._pub_writer = writer
+        self._pub_replies = asyncio.create_task(self._drain_replies(reader))
+
+    async def _drain_replies(self, reader: asyncio.StreamReader):
+        """Consume PUBLISH replies so commands can be pipelined"""
+        try:
+            while True:
+                reply = await read_reply(reader)
+                if isinstance(reply, RedisError):
+                    self.publish_errors += 1
+                    logger.error(f"Redis publish failed: {reply}")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self._pub_writer = None
+
+    async def publish(self, channel: str, message: str):
+        """Publish, falling back to this worker's sockets while Redis is unreachable
+
+        A broker outage degrades fan-out to local delivery; it never fails
+        the caller. Each fallback is counted in publish_errors.
+        """
+        try:
+            if self._pub_writer is None or self._pub_writer.is_closing():
+                async with self._pub_lock:
+                    if self._pub_writer is None or self._pub_writer.is_closing():
+                        await self._connect_publisher()
+            self._pub_writer.write(encode_command("PUBLISH", channel, message))
+            await self._pub_writer.drain()
+        except (OSError, RedisError) as e:
+            self.publish_errors += 1
+            self._pub_writer = None
+            logger.error(f"Redis publish on {channel} failed, delivering locally: {e}")
+            self._deliver(channel, message)
+
+    def subscribe(self, channel: str):
+        if channel in self.channels:
+            return
+        self.channels.add(channel)
+        if self._sub_writer is not None:
+            self._sub_writer.write(encode_command("SUBSCRIBE", channel))
+
+    def unsubscribe(self, channel: str):
+        if channel not in self.channels:
+            return
+        self.channels.discard(channel)
+        if self._sub_writer is not None:
+            self._sub_writer.write(encode_command("UNSUBSCRIBE", channel))
+
+    async def _subscriber(self):
+        while True:
+            try:
+                reader, writer = await self._open()
+                if self.channels:
+                    writer.write(encode_command("SUBSCRIBE", *self.channels))
+                self._sub_writer = writer
+                self._subscribed.set()
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        self._deliver(reply[1].decode(), reply[2].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis subscriber connection lost: {e}")
+                self._sub_writer = None
+                await asyncio.sleep(self.reconnect_delay)
+
+def create_broker(url: Optional[str]) -> Broker:
+    """Build the broker for a URL: memory:// (default) or redis://host:port"""
+    scheme = urlparse(url).scheme if url else "memory"
+    if scheme in ("", "memory"):
+        return InProcessBroker()
+    if scheme == "redis":
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported broker URL: {url}")
@@ -27,11 +27,40 @@ DATABASE_URL = os.getenv(
     f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 
+# Database engine profile. Each worker process owns its own pool, so the
+# pool is clamped to this worker's share of DB_MAX_CONNECTIONS.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_CONNECTIONS_PER_WORKER = max(1, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+DB_POOL_SIZE = min(int(os.getenv("DB_POOL_SIZE", "10")), DB_CONNECTIONS_PER_WORKER)
+DB_MAX_OVERFLOW = min(int(os.getenv("DB_MAX_OVERFLOW", "10")), DB_CONNECTIONS_PER_WORKER - DB_POOL_SIZE)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 disables
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
+# Upstream API endpoints (overridable to point at local stand-ins)
+DEEPGRAM_API_URL = os.getenv("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+DEEPGRAM_STREAM_URL = os.getenv("DEEPGRAM_STREAM_URL", "wss://api.deepgram.com/v1/listen")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+ANTHROPIC_API_BASE = os.getenv("ANTHROPIC_API_BASE", "https://api.anthropic.com/v1")
+ANTHROPIC_API_VERSION = os.getenv("ANTHROPIC_API_VERSION", "2023-06-01")
+
+# Outbound HTTP client settings (one pooled session per upstream service)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "120"))
+
 # Server settings
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8001"))  # Changed to 8001 to match frontend expectations
@@ -80,6 +109,15 @@ AVAILABLE_VOICES = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
 SESSION_COOKIE_NAME = os.getenv("SESSION_COOKIE_NAME", "auth_session_id")
 SESSION_EXPIRE_DAYS = int(os.getenv("SESSION_EXPIRE_DAYS", "7"))
 
+# Auth session cache settings (per worker; the TTL bounds staleness across workers)
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+# Usernames allowed on the admin websocket (comma separated)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+# Longest sampling profile an admin can take of a running worker (seconds)
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
 # Upload settings
 UPLOAD_DIR = BASE_DIR / "uploads"
 MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))  # 10MB default
@@ -90,10 +128,34 @@ ALLOWED_EXTENSIONS = {
     'document': {'txt', 'pdf', 'doc', 'docx'}
 }
 
+# TTS audio cache (content-addressed files with LRU eviction)
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(BASE_DIR / "cache" / "tts")))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 512MB default
+
+# Tutor response cache (per worker), keyed by agent, system prompt and normalized
+# prompt; the optional similarity tier also matches near-identical prompts
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "10000"))
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))  # cosine threshold
+RESPONSE_CACHE_EMBEDDING_DIM = int(os.getenv("RESPONSE_CACHE_EMBEDDING_DIM", "512"))
+
 # WebSocket settings
-WS_HEARTBEAT_INTERVAL = int(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+WS_HEARTBEAT_INTERVAL = int(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))  # ping sockets quiet this long
+WS_IDLE_TIMEOUT = int(os.getenv("WS_IDLE_TIMEOUT", str(3 * WS_HEARTBEAT_INTERVAL)))  # then close them after this
 WS_RECONNECT_INTERVAL = int(os.getenv("WS_RECONNECT_INTERVAL", "5"))
 WS_MAX_RECONNECT_ATTEMPTS = int(os.getenv("WS_MAX_RECONNECT_ATTEMPTS", "5"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))  # messages buffered per socket
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))  # seconds for a single send
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "evict")  # "evict" or "drop" when a queue is full
+# Binary websocket frames: compress message payloads at least this large
+WS_COMPRESS_MIN_BYTES = int(os.getenv("WS_COMPRESS_MIN_BYTES", "1024"))
+WS_COMPRESS_LEVEL = int(os.getenv("WS_COMPRESS_LEVEL", "6"))
+WS_MAX_MESSAGE_SIZE = int(os.getenv("WS_MAX_MESSAGE_SIZE", str(1024 * 1024)))  # decompressed bytes per frame
+# Pub/sub between workers: memory:// for a single worker, redis://host:port for several
+WS_BROKER_URL = os.getenv("WS_BROKER_URL", "memory://")
 
 # System prompts
 DEFAULT_SYSTEM_PROMPT = os.getenv("DEFAULT_SYSTEM_PROMPT", """You are a highly skilled and patient language tutor. Your role is to:
@@ -121,10 +183,9 @@ Remember to:
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = BASE_DIR / "logs/app.log"
-
-# Ensure directories exist
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+# Fraction of requests logged at INFO; slow requests and server errors are always logged
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
 
 # Agent providers
 AVAILABLE_PROVIDERS = {
@@ -135,9 +196,60 @@ AVAILABLE_PROVIDERS = {
     "anthropic": {
         "models": ["claude-3-opus", "claude-3-sonnet", "claude-2.1"],
         "api_key": ANTHROPIC_API_KEY
+    },
+    # Offline stand-in that echoes the prompt; for development and tests
+    "fake": {
+        "models": ["echo"],
+        "api_key": None
     }
 }
 
+# LLM gateway: concurrent completions per provider (LLM_MAX_CONCURRENCY_<PROVIDER>
+# overrides the default) and how long a request may wait for a free slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_CONCURRENCY_LIMITS = {
+    provider: int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", LLM_MAX_CONCURRENCY))
+    for provider in AVAILABLE_PROVIDERS
+}
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_FAKE_TOKEN_DELAY = float(os.getenv("LLM_FAKE_TOKEN_DELAY", "0"))  # seconds between fake tokens
+
+# Failover chain ("provider:model,provider:model") for agents without their own
+LLM_FALLBACKS = os.getenv("LLM_FALLBACKS", "")
+# Hedging: start the next provider in the chain when the current one has not
+# produced a token after its p95 time to first token (LLM_HEDGE_DEFAULT_DELAY
+# until LLM_HEDGE_MIN_SAMPLES calls were measured, never below LLM_HEDGE_MIN_DELAY)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+# Circuit breaker per provider over its last LLM_BREAKER_WINDOW calls
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Context window per model, in tokens (prompt plus reply)
+MODEL_CONTEXT_LIMITS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4-turbo-preview": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "claude-3-opus": 200000,
+    "claude-3-sonnet": 200000,
+    "claude-2.1": 200000,
+    "echo": 4096
+}
+DEFAULT_CONTEXT_LIMIT = int(os.getenv("DEFAULT_CONTEXT_LIMIT", "8192"))
+
+# Conversation context: history sent per turn is capped at CONTEXT_MAX_HISTORY_TOKENS
+# (and by the model's window); older exchanges are folded into a rolling summary
+# until the kept history is back under CONTEXT_FOLD_RATIO of the budget
+CONTEXT_MAX_HISTORY_TOKENS = int(os.getenv("CONTEXT_MAX_HISTORY_TOKENS", "3000"))
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "500"))
+CONTEXT_FOLD_RATIO = float(os.getenv("CONTEXT_FOLD_RATIO", "0.75"))
+
 # Default provider and model if not specified
 DEFAULT_PROVIDER = os.getenv("DEFAULT_PROVIDER", "openai")
 if DEFAULT_PROVIDER not in AVAILABLE_PROVIDERS:
@@ -147,7 +259,7 @@ DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
 if DEFAULT_MODEL not in AVAILABLE_PROVIDERS[DEFAULT_PROVIDER]["models"]:
     DEFAULT_MODEL = "gpt-4o-mini"
 
-# Validate required settings
+# Validate required settings; called from app startup
 def validate_settings():
     required_settings = {
         "DATABASE_URL": DATABASE_URL,
@@ -163,5 +275,8 @@ def validate_settings():
             f"Missing required environment variables: {', '.join(missing_settings)}"
         )
 
-# Run validation on startup
-validate_settings()
+# Ensure directories exist; called from app startup rather than at import so
+# tools and tests that only read settings do not touch the filesystem
+def ensure_directories():
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
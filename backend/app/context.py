@@ -0,0 +1,138 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from .config import (
+    MODEL_CONTEXT_LIMITS,
+    DEFAULT_CONTEXT_LIMIT,
+    CONTEXT_MAX_HISTORY_TOKENS,
+    CONTEXT_SUMMARY_MAX_TOKENS,
+    CONTEXT_FOLD_RATIO
+)
+
+# Tokens a chat API spends on each message's role and delimiters
+MESSAGE_OVERHEAD_TOKENS = 4
+# Longest excerpt of one side of an exchange kept in the summary
+SUMMARY_EXCERPT_CHARS = 160
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Fast local token estimate, close to BPE tokenizers for chat text
+
+    Takes the larger of the word/punctuation count and UTF-8 bytes / 4, so
+    short words are not undercounted and non-Latin scripts, which spend
+    more bytes per token, are not overcounted by much.
+    """
+    if not text:
+        return 0
+    return max(len(_PIECES.findall(text)), (len(text.encode("utf-8")) + 3) // 4)
+
+def exchange_tokens(content: Optional[str], response: Optional[str]) -> int:
+    """Estimated tokens of a stored exchange as sent to the model"""
+    tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    if response:
+        tokens += estimate_tokens(response) + MESSAGE_OVERHEAD_TOKENS
+    return tokens
+
+def model_context_limit(model: str) -> int:
+    return MODEL_CONTEXT_LIMITS.get(model, DEFAULT_CONTEXT_LIMIT)
+
+def _excerpt(text: Optional[str]) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= SUMMARY_EXCERPT_CHARS:
+        return text
+    return text[:SUMMARY_EXCERPT_CHARS].rsplit(" ", 1)[0] + "…"
+
+def fold_summary(summary: Optional[str], entries: List[Tuple], max_tokens: int = CONTEXT_SUMMARY_MAX_TOKENS) -> str:
+    """Extend a rolling summary with older exchanges
+
+    Each exchange becomes one line of excerpts; when the summary outgrows
+    max_tokens the oldest lines are dropped first.
+    """
+    lines = summary.splitlines() if summary else []
+    for _, content, response, _ in entries:
+        line = f"- Learner: {_excerpt(content)}"
+        if response:
+            line += f" / Tutor: {_excerpt(response)}"
+        lines.append(line)
+    sizes = [estimate_tokens(line) for line in lines]
+    total = sum(sizes)
+    start = 0
+    while total > max_tokens and start < len(lines) - 1:
+        total -= sizes[start]
+        start += 1
+    return "\n".join(lines[start:])
+
+class ContextWindow:
+    """Messages for one turn and the summary state they were built from"""
+
+    def __init__(self, messages: List[Dict[str, str]], summary: Optional[str], summary_seq: int, folded: int, history_tokens: int):
+        self.messages = messages
+        self.summary = summary
+        self.summary_seq = summary_seq
+        # Exchanges newly folded into the summary; non-zero means it should be saved
+        self.folded = folded
+        self.history_tokens = history_tokens
+
+    @property
+    def has_history(self) -> bool:
+        """Whether earlier exchanges or a summary precede the new prompt"""
+        return len(self.messages) > 2
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Estimated tokens of every message sent for the turn"""
+        return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in self.messages)
+
+def build_context(
+    params: Dict,
+    summary: Optional[str],
+    summary_seq: int,
+    entries: List[Tuple],
+    content: str,
+    max_history_tokens: Optional[int] = None
+) -> ContextWindow:
+    """Assemble the system prompt, rolling summary and a budgeted history suffix
+
+    `entries` are the (seq, content, response, token_count) exchanges after
+    summary_seq in seq order. The history budget is what the model's window
+    leaves after the reply (max_tokens), system prompt, summary and new
+    prompt, capped at max_history_tokens. When the history overflows it,
+    the oldest exchanges are folded into the summary until the rest fits
+    in CONTEXT_FOLD_RATIO of the budget, so the summary is not rewritten
+    on every turn.
+    """
+    if max_history_tokens is None:
+        max_history_tokens = CONTEXT_MAX_HISTORY_TOKENS
+    system_prompt = params["system_prompt"]
+    fixed = (
+        params["max_tokens"]
+        + estimate_tokens(system_prompt)
+        + estimate_tokens(content)
+        + CONTEXT_SUMMARY_MAX_TOKENS
+        + 3 * MESSAGE_OVERHEAD_TOKENS
+    )
+    budget = max(0, min(model_context_limit(params["model"]) - fixed, max_history_tokens))
+
+    sizes = [
+        exchange_tokens(entry[1], entry[2]) if entry[3] is None else entry[3]
+        for entry in entries
+    ]
+    total = sum(sizes)
+    start = 0
+    if total > budget:
+        target = budget * CONTEXT_FOLD_RATIO
+        while start < len(entries) and total > target:
+            total -= sizes[start]
+            start += 1
+        summary = fold_summary(summary, entries[:start])
+        summary_seq = entries[start - 1][0]
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    for _, user_text, response, _ in entries[start:]:
+        messages.append({"role": "user", "content": user_text})
+        if response:
+            messages.append({"role": "assistant", "content": response})
+    messages.append({"role": "user", "content": content})
+    return ContextWindow(messages, summary, summary_seq, start, total)
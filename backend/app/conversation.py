@@ -0,0 +1,138 @@
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import (
+    create_chat_session,
+    get_active_chat_session_id,
+    get_active_agent,
+    get_agent_by_name,
+    get_context_history,
+    save_context_summary,
+    append_chat_message
+)
+from .context import ContextWindow, build_context
+from .llm import agent_call_params, llm_gateway
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+class ChatTurn:
+    """One prompt/response exchange, streamed from the LLM and saved at the end
+
+    Everything that needs the database is loaded up front by prepare_chat_turn,
+    so the stream itself runs without holding a session.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        chat_session_id: int,
+        content: str,
+        params: Dict,
+        context: ContextWindow,
+        agent_id: Optional[int] = None
+    ):
+        self.turn_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.agent_id = agent_id
+        self.chat_session_id = chat_session_id
+        self.content = content
+        self.params = params
+        self.context = context
+        self.messages = context.messages
+        self.parts: List[str] = []
+        self.first_token_at: Optional[float] = None
+        # Set when the reply was served from the response cache
+        self.cached = False
+
+    @property
+    def response_text(self) -> str:
+        return "".join(self.parts)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Yield text deltas from the provider while collecting the full response
+
+        A reply cached for the same agent and prompt is yielded as a single
+        delta without calling the provider; complete provider replies are
+        added to the cache. Only the opening turn of a conversation uses the
+        cache: later prompts ("why?", "translate that") depend on history
+        the cache key does not cover.
+        """
+        system_prompt, model = self.params["system_prompt"], self.params["model"]
+        cacheable = not self.context.has_history
+        cached = None
+        if cacheable:
+            cached = response_cache.get(self.agent_id, system_prompt, model, self.content, self.context.prompt_tokens)
+        if cached is not None:
+            self.cached = True
+            self.first_token_at = time.perf_counter()
+            self.parts.append(cached)
+            yield cached
+            return
+
+        start = time.perf_counter()
+        async for delta in llm_gateway.stream_call(self.params, self.messages):
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+                logger.debug(
+                    f"First token from {self.params['provider']}/{self.params['model']} "
+                    f"after {self.first_token_at - start:.3f}s"
+                )
+            self.parts.append(delta)
+            yield delta
+        if cacheable:
+            response_cache.set(self.agent_id, system_prompt, model, self.content, self.response_text)
+
+    async def save(self, db: AsyncSession) -> Optional[Tuple]:
+        """Persist the complete exchange; returns the new history entry"""
+        return await append_chat_message(db, self.user_id, self.content, self.response_text, self.chat_session_id)
+
+    def delta_message(self, delta: str) -> Dict:
+        """WebSocket frame carrying one increment of the assistant reply"""
+        return {
+            "type": "assistant_delta",
+            "turn_id": self.turn_id,
+            "chat_session_id": self.chat_session_id,
+            "delta": delta
+        }
+
+    def done_message(self, entry: Optional[Tuple]) -> Dict:
+        """Frame closing the turn, with the seq the exchange was saved under"""
+        return {
+            "type": "assistant_done",
+            "turn_id": self.turn_id,
+            "chat_session_id": self.chat_session_id,
+            "seq": entry[0] if entry else None
+        }
+
+async def prepare_chat_turn(
+    db: AsyncSession,
+    user_id: int,
+    content: str,
+    agent_name: Optional[str] = None
+) -> ChatTurn:
+    """Resolve the agent, chat session and context window for a new turn
+
+    The agent is looked up by name, falling back to the user's active agent
+    and then to the configured defaults. Only the history after the
+    session's rolling summary is loaded; if it no longer fits the budget,
+    the summary is advanced and saved here.
+    """
+    agent = await get_agent_by_name(db, agent_name) if agent_name else None
+    if agent is None:
+        agent = await get_active_agent(db, user_id)
+    params = agent_call_params(agent)
+
+    chat_session_id = await get_active_chat_session_id(db, user_id)
+    if not chat_session_id:
+        chat_session_id = await create_chat_session(db, user_id)
+    if not chat_session_id:
+        raise RuntimeError(f"Failed to create chat session for user {user_id}")
+
+    summary, summary_seq, history = await get_context_history(db, user_id, chat_session_id)
+    context = build_context(params, summary, summary_seq, history, content)
+    if context.folded:
+        await save_context_summary(db, chat_session_id, context.summary, context.summary_seq)
+    return ChatTurn(user_id, chat_session_id, content, params, context, agent.id if agent else None)
@@ -1,15 +1,157 @@
 import logging
+import time
 from datetime import datetime
-from typing import AsyncGenerator, Optional, List, Tuple
+from typing import Any, AsyncGenerator, Dict, Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, update
-from .config import DATABASE_URL
+from sqlalchemy import select, update, func, exists, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_ECHO
+)
 from .models import Base, User, Agent, ActiveAgent, ChatSession, ChatMessage, AuthSession
+from .context import exchange_tokens
+from .metrics import metrics, QUERY_BUCKETS
 
 logger = logging.getLogger(__name__)
 
+class PoolStats:
+    """Counters describing how the connection pool is used"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # id(dbapi connection) -> monotonic creation time
+        self.connected_at: Dict[int, float] = {}
+
+    def record_wait(self, seconds: float):
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+def get_engine_options(database_url: str) -> Dict[str, Any]:
+    """Build create_async_engine arguments from the configured engine profile"""
+    url = make_url(database_url)
+    options: Dict[str, Any] = {"echo": DB_ECHO}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep the default pool
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {
+            "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        }
+    return options
+
 # Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+    pool_stats.connected_at[id(dbapi_connection)] = time.monotonic()
+
+@event.listens_for(engine.sync_engine, "close")
+def _on_close(dbapi_connection, connection_record):
+    pool_stats.disconnects += 1
+    pool_stats.connected_at.pop(id(dbapi_connection), None)
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.checkouts += 1
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_stats.checkins += 1
+
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements, by statement kind",
+    ("statement",),
+    QUERY_BUCKETS
+)
+_STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    kind = statement[:6].upper()
+    DB_QUERY_SECONDS.observe(elapsed, kind if kind in _STATEMENT_KINDS else "OTHER")
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _on_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get a snapshot of pool occupancy, checkout wait time and connection age"""
+    pool = engine.sync_engine.pool
+    now = time.monotonic()
+    ages = [now - created for created in pool_stats.connected_at.values()]
+    snapshot: Dict[str, Any] = {
+        "pool_class": type(pool).__name__,
+        "checkouts_total": pool_stats.checkouts,
+        "checkins_total": pool_stats.checkins,
+        "connections_opened_total": pool_stats.connects,
+        "connections_closed_total": pool_stats.disconnects,
+        "checkout_timeouts_total": pool_stats.timeouts,
+        "wait_seconds_total": round(pool_stats.wait_seconds_total, 6),
+        "wait_seconds_max": round(pool_stats.wait_seconds_max, 6),
+        "wait_seconds_avg": round(pool_stats.wait_seconds_total / pool_stats.checkouts, 6) if pool_stats.checkouts else 0.0,
+        "connection_age_seconds_max": round(max(ages), 3) if ages else 0.0,
+        "connection_age_seconds_avg": round(sum(ages) / len(ages), 3) if ages else 0.0
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        snapshot.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": DB_MAX_OVERFLOW
+        })
+    return snapshot
 
 # Create async session maker
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -38,13 +180,17 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
 # Database utility functions
 async def create_chat_session(db: AsyncSession, user_id: int) -> Optional[int]:
-    """Create a new chat session"""
+    """Create a new chat session, or return the user's open one if it exists"""
     try:
         chat_session = ChatSession(user_id=user_id)
         db.add(chat_session)
         await db.commit()
         await db.refresh(chat_session)
         return chat_session.id
+    except IntegrityError:
+        # ux_chat_sessions_user_open allows a single open session per user
+        await db.rollback()
+        return await get_active_chat_session_id(db, user_id)
     except Exception as e:
         logger.error(f"Error creating chat session: {e}")
         await db.rollback()
@@ -64,44 +210,170 @@ async def end_chat_session(db: AsyncSession, session_id: int):
         logger.error(f"Error ending chat session: {e}")
         await db.rollback()
 
-async def update_and_get_history(
+async def get_active_chat_session_id(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Get the id of the user's open chat session, if any"""
+    stmt = select(ChatSession.id).where(
+        ChatSession.user_id == user_id,
+        ChatSession.end_time.is_(None)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def user_owns_chat_session(db: AsyncSession, user_id: int, chat_session_id: int) -> bool:
+    """Check that a chat session exists and belongs to the user"""
+    stmt = select(exists().where(
+        ChatSession.id == chat_session_id,
+        ChatSession.user_id == user_id
+    ))
+    result = await db.execute(stmt)
+    return bool(result.scalar())
+
+async def append_chat_message(
     db: AsyncSession,
     user_id: int,
     message: str,
     response: str,
     chat_session_id: int,
     audio_url: Optional[str] = None
-) -> List[Tuple]:
-    """Update chat history and return the updated history"""
+) -> Optional[Tuple]:
+    """Append a message to a session and return only the new entry
+
+    The entry is (seq, content, response, audio_url, created_at). `seq` is
+    allocated by bumping ChatSession.last_seq in the same transaction, so it
+    is gapless and strictly increasing within a session. The session's
+    token_total grows by the exchange's estimated tokens in the same update.
+    """
     try:
-        # Add new message
+        token_count = exchange_tokens(message, response)
+        stmt = (
+            update(ChatSession)
+            .where(ChatSession.id == chat_session_id)
+            .values(
+                last_seq=ChatSession.last_seq + 1,
+                token_total=ChatSession.token_total + token_count
+            )
+            .returning(ChatSession.last_seq)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        seq = result.scalar_one()
+
         chat_message = ChatMessage(
             chat_session_id=chat_session_id,
             user_id=user_id,
             content=message,
             response=response,
-            audio_url=audio_url
+            audio_url=audio_url,
+            seq=seq,
+            token_count=token_count
         )
         db.add(chat_message)
         await db.commit()
 
-        # Get updated history
+        return (seq, chat_message.content, chat_message.response, chat_message.audio_url, chat_message.created_at)
+    except Exception as e:
+        logger.error(f"Error appending chat message: {e}")
+        await db.rollback()
+        return None
+
+async def get_history_since(
+    db: AsyncSession,
+    user_id: int,
+    chat_session_id: int,
+    since_seq: int = 0
+) -> List[Tuple]:
+    """Get the history entries of a session with seq greater than since_seq"""
+    try:
         stmt = select(ChatMessage).where(
-            ChatMessage.chat_session_id == chat_session_id
-        ).order_by(ChatMessage.created_at)
-        
+            ChatMessage.chat_session_id == chat_session_id,
+            ChatMessage.user_id == user_id,
+            ChatMessage.seq > since_seq
+        ).order_by(ChatMessage.seq)
+
         result = await db.execute(stmt)
         messages = result.scalars().all()
-        
+
         return [
-            (msg.content, msg.response, msg.audio_url, msg.created_at)
+            (msg.seq, msg.content, msg.response, msg.audio_url, msg.created_at)
             for msg in messages
         ]
     except Exception as e:
-        logger.error(f"Error updating chat history: {e}")
-        await db.rollback()
+        logger.error(f"Error retrieving chat history delta: {e}")
         return []
 
+async def get_context_history(
+    db: AsyncSession,
+    user_id: int,
+    chat_session_id: int
+) -> Tuple[Optional[str], int, List[Tuple]]:
+    """Get a session's rolling summary, the seq it covers and the exchanges after it
+
+    Exchanges are (seq, content, response, token_count) in seq order; only
+    the ones not yet folded into the summary are loaded.
+    """
+    result = await db.execute(
+        select(ChatSession.summary, ChatSession.summary_seq).where(
+            ChatSession.id == chat_session_id,
+            ChatSession.user_id == user_id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None, 0, []
+    summary, summary_seq = row
+
+    result = await db.execute(
+        select(ChatMessage.seq, ChatMessage.content, ChatMessage.response, ChatMessage.token_count)
+        .where(
+            ChatMessage.chat_session_id == chat_session_id,
+            ChatMessage.seq > summary_seq
+        )
+        .order_by(ChatMessage.seq)
+    )
+    return summary, summary_seq, [tuple(r) for r in result.all()]
+
+async def save_context_summary(db: AsyncSession, chat_session_id: int, summary: str, summary_seq: int) -> bool:
+    """Store a rolling summary unless a concurrent turn already stored a newer one"""
+    try:
+        result = await db.execute(
+            update(ChatSession)
+            .where(
+                ChatSession.id == chat_session_id,
+                ChatSession.summary_seq < summary_seq
+            )
+            .values(summary=summary, summary_seq=summary_seq)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount > 0
+    except Exception as e:
+        logger.error(f"Error saving context summary: {e}")
+        await db.rollback()
+        return False
+
+def history_delta_message(chat_session_id: int, entries: List[Tuple], since_seq: int) -> Dict:
+    """Build a history_update payload carrying only the given entries
+
+    Clients apply the delta when `since_seq` matches the last seq they hold and
+    otherwise request a resync from their last seq.
+    """
+    return {
+        "type": "history_update",
+        "chat_session_id": chat_session_id,
+        "since_seq": since_seq,
+        "last_seq": entries[-1][0] if entries else since_seq,
+        "messages": [
+            {
+                "seq": seq,
+                "content": content,
+                "response": response,
+                "audioUrl": audio_url,
+                "created_at": created_at.isoformat() if created_at else None
+            }
+            for seq, content, response, audio_url, created_at in entries
+        ]
+    }
+
 async def get_chat_history(
     db: AsyncSession,
     user_id: int,
@@ -125,6 +397,65 @@ async def get_chat_history(
         logger.error(f"Error retrieving chat history: {e}")
         return []
 
+async def get_conversations_page(
+    db: AsyncSession,
+    user_id: int,
+    before: Optional[int] = None,
+    limit: Optional[int] = 50,
+    messages_limit: Optional[int] = None
+) -> List[Tuple[ChatSession, List[ChatMessage]]]:
+    """Get a page of conversations with their messages in two queries
+
+    Sessions are keyset-paginated newest first by id (pass the last id seen as
+    `before`); `limit=None` returns all of them. With `messages_limit` only the latest N messages of each
+    conversation are returned, still in chronological order.
+    """
+    has_messages = exists().where(ChatMessage.chat_session_id == ChatSession.id)
+    sessions_stmt = (
+        select(ChatSession)
+        .where(ChatSession.user_id == user_id, has_messages)
+        .order_by(ChatSession.id.desc())
+    )
+    if limit is not None:
+        sessions_stmt = sessions_stmt.limit(limit)
+    if before is not None:
+        sessions_stmt = sessions_stmt.where(ChatSession.id < before)
+    sessions = (await db.execute(sessions_stmt)).scalars().all()
+    if not sessions:
+        return []
+
+    session_ids = [session.id for session in sessions]
+    if messages_limit is None:
+        messages_stmt = (
+            select(ChatMessage)
+            .where(ChatMessage.chat_session_id.in_(session_ids))
+            .order_by(ChatMessage.chat_session_id, ChatMessage.created_at, ChatMessage.id)
+        )
+    else:
+        ranked = (
+            select(
+                ChatMessage,
+                func.row_number().over(
+                    partition_by=ChatMessage.chat_session_id,
+                    order_by=(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                ).label("rn")
+            )
+            .where(ChatMessage.chat_session_id.in_(session_ids))
+            .subquery()
+        )
+        message = aliased(ChatMessage, ranked)
+        messages_stmt = (
+            select(message)
+            .where(ranked.c.rn <= messages_limit)
+            .order_by(message.chat_session_id, message.created_at, message.id)
+        )
+    messages = (await db.execute(messages_stmt)).scalars().all()
+
+    by_session: Dict[int, List[ChatMessage]] = {session_id: [] for session_id in session_ids}
+    for msg in messages:
+        by_session[msg.chat_session_id].append(msg)
+    return [(session, by_session[session.id]) for session in sessions]
+
 async def get_active_agent(db: AsyncSession, user_id: int) -> Optional[Agent]:
     """Get active agent for user"""
     try:
@@ -135,6 +466,15 @@ async def get_active_agent(db: AsyncSession, user_id: int) -> Optional[Agent]:
         logger.error(f"Error getting active agent: {e}")
         return None
 
+async def get_agent_by_name(db: AsyncSession, name: str) -> Optional[Agent]:
+    """Get an agent by its unique name"""
+    try:
+        result = await db.execute(select(Agent).where(Agent.name == name))
+        return result.scalar_one_or_none()
+    except Exception as e:
+        logger.error(f"Error getting agent {name}: {e}")
+        return None
+
 async def set_active_agent(db: AsyncSession, user_id: int, agent_id: int):
     """Set active agent for user"""
     try:
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+from .config import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_TOTAL_TIMEOUT
+)
+from .metrics import metrics, UPSTREAM_BUCKETS
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_SECONDS = metrics.histogram(
+    "upstream_response_seconds",
+    "Time from sending an upstream request to its response headers, by service",
+    ("service",),
+    UPSTREAM_BUCKETS
+)
+UPSTREAM_ERRORS = metrics.counter("upstream_errors_total", "Upstream requests that failed or returned 5xx", ("service",))
+
+def _load_aiohttp():
+    """Import aiohttp, which is a large share of the app's import time
+
+    Nothing imports it at module level; the registry loads it once started.
+    """
+    import aiohttp
+    return aiohttp
+
+def _trace_config(service: str) -> "aiohttp.TraceConfig":
+    """Record upstream latency and errors for every request of a session"""
+    aiohttp = _load_aiohttp()
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        UPSTREAM_SECONDS.observe(time.perf_counter() - context.start, service)
+        if params.response.status >= 500:
+            UPSTREAM_ERRORS.inc(service)
+
+    async def on_request_exception(session, context, params):
+        UPSTREAM_ERRORS.inc(service)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+class HTTPClientRegistry:
+    """Application-lifetime aiohttp sessions, one per upstream service
+
+    Each service gets its own connector so a slow provider cannot exhaust the
+    connections of the others. Sessions keep connections alive between calls
+    and cache DNS lookups.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, "aiohttp.ClientSession"] = {}
+        self._started = False
+        self._preload: Optional[asyncio.Future] = None
+
+    async def start(self):
+        """Allow sessions to be created; called from app startup
+
+        aiohttp is imported in a worker thread in the meantime, so neither
+        startup nor the first upstream call waits for it.
+        """
+        self._started = True
+        self._preload = asyncio.ensure_future(asyncio.to_thread(_load_aiohttp))
+        logger.info("HTTP client registry started")
+
+    def get(self, name: str) -> "aiohttp.ClientSession":
+        """Get the shared session for a service, creating it on first use"""
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            if not self._started:
+                raise RuntimeError("HTTP client registry is not started")
+            aiohttp = _load_aiohttp()
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                use_dns_cache=True,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=HTTP_TOTAL_TIMEOUT,
+                connect=HTTP_CONNECT_TIMEOUT,
+                sock_read=HTTP_READ_TIMEOUT
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[_trace_config(name)]
+            )
+            self._sessions[name] = session
+        return session
+
+    async def close(self):
+        """Close every session; called from app shutdown"""
+        if self._preload is not None:
+            await self._preload
+            self._preload = None
+        for name, session in self._sessions.items():
+            try:
+                await session.close()
+            except Exception as e:
+                logger.error(f"Error closing HTTP session {name}: {e}")
+        self._sessions.clear()
+        self._started = False
+        logger.info("HTTP client registry closed")
+
+    def stats(self) -> Dict[str, Dict[str, Optional[int]]]:
+        """Get open connection counts per service"""
+        return {
+            name: {
+                "limit": session.connector.limit if session.connector else None,
+                "limit_per_host": session.connector.limit_per_host if session.connector else None,
+                "acquired": len(getattr(session.connector, "_acquired", ()))
+            }
+            for name, session in self._sessions.items()
+        }
+
+# Create a global instance of the client registry
+http_clients = HTTPClientRegistry()
+
+async def get_stt_http() -> "aiohttp.ClientSession":
+    """Dependency: shared session for speech-to-text calls"""
+    return http_clients.get("stt")
+
+async def get_tts_http() -> "aiohttp.ClientSession":
+    """Dependency: shared session for text-to-speech calls"""
+    return http_clients.get("tts")
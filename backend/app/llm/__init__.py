@@ -0,0 +1,15 @@
+"""LLM gateway: streaming chat completions from the configured providers"""
+from .providers import LLMError, PROVIDERS, fake_provider, stream_response
+from .gateway import LLMGateway, ProviderUnavailable, agent_call_params, llm_gateway, parse_chain
+
+__all__ = [
+    "LLMError",
+    "PROVIDERS",
+    "fake_provider",
+    "stream_response",
+    "LLMGateway",
+    "ProviderUnavailable",
+    "agent_call_params",
+    "llm_gateway",
+    "parse_chain"
+]
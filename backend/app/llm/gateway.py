@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from ..config import (
+    DEFAULT_SYSTEM_PROMPT,
+    DEFAULT_AGENT_PROVIDER,
+    DEFAULT_AGENT_MODEL,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_FREQUENCY_PENALTY,
+    DEFAULT_PRESENCE_PENALTY,
+    LLM_MAX_CONCURRENCY,
+    LLM_CONCURRENCY_LIMITS,
+    LLM_QUEUE_TIMEOUT,
+    LLM_FALLBACKS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_MIN_SAMPLES
+)
+from ..http_client import HTTPClientRegistry, http_clients
+from ..metrics import metrics, UPSTREAM_BUCKETS
+from ..models import Agent
+from .health import ProviderHealth
+from .providers import LLMError, PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "llm_first_token_seconds",
+    "Time from acquiring a provider slot to the first streamed token",
+    ("provider",),
+    UPSTREAM_BUCKETS
+)
+LLM_COMPLETION_SECONDS = metrics.histogram(
+    "llm_completion_seconds",
+    "Duration of completed and failed provider streams",
+    ("provider", "outcome"),
+    UPSTREAM_BUCKETS
+)
+
+class ProviderUnavailable(LLMError):
+    """Raised without calling a provider whose circuit breaker is open"""
+
+def parse_chain(text: Optional[str]) -> List[Tuple[str, str]]:
+    """Parse "provider:model,provider:model" into (provider, model) pairs"""
+    chain = []
+    for item in (text or "").split(","):
+        provider, _, model = item.strip().partition(":")
+        if provider and model:
+            chain.append((provider.strip().lower(), model.strip()))
+    return chain
+
+def agent_call_params(agent: Optional[Agent]) -> Dict:
+    """Provider, model and sampling parameters for an agent (defaults without one)"""
+    if agent is None:
+        return {
+            "system_prompt": DEFAULT_SYSTEM_PROMPT,
+            "provider": DEFAULT_AGENT_PROVIDER,
+            "model": DEFAULT_AGENT_MODEL,
+            "fallbacks": parse_chain(LLM_FALLBACKS),
+            "temperature": DEFAULT_TEMPERATURE,
+            "max_tokens": DEFAULT_MAX_TOKENS,
+            "top_p": DEFAULT_TOP_P,
+            "frequency_penalty": DEFAULT_FREQUENCY_PENALTY,
+            "presence_penalty": DEFAULT_PRESENCE_PENALTY
+        }
+    return {
+        "system_prompt": agent.system_prompt or DEFAULT_SYSTEM_PROMPT,
+        "provider": agent.provider or DEFAULT_AGENT_PROVIDER,
+        "model": agent.model or DEFAULT_AGENT_MODEL,
+        "fallbacks": parse_chain(agent.fallbacks or LLM_FALLBACKS),
+        "temperature": DEFAULT_TEMPERATURE if agent.temperature is None else agent.temperature,
+        "max_tokens": agent.max_tokens or DEFAULT_MAX_TOKENS,
+        "top_p": DEFAULT_TOP_P if agent.top_p is None else agent.top_p,
+        "frequency_penalty": DEFAULT_FREQUENCY_PENALTY if agent.frequency_penalty is None else agent.frequency_penalty,
+        "presence_penalty": DEFAULT_PRESENCE_PENALTY if agent.presence_penalty is None else agent.presence_penalty
+    }
+
+class ProviderStats:
+    __slots__ = ("limit", "in_flight", "waiting", "completed", "failed", "rejected", "short_circuited")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.short_circuited = 0
+
+# Marks the end of an attempt's stream
+_DONE = object()
+
+class _Attempt:
+    """One provider call in a failover chain, pumped by its own task
+
+    The first item (a delta, _DONE or the exception) resolves `first`, so
+    attempts can race on it; later items go to the queue.
+    """
+
+    def __init__(self, stream: AsyncIterator[str], provider: str, hedged: bool):
+        self.provider = provider
+        self.hedged = hedged
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.first = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream: AsyncIterator[str]):
+        try:
+            async for delta in stream:
+                self._put(delta)
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        if self.first.done():
+            self.queue.put_nowait(item)
+        else:
+            self.first.set_result(item)
+
+class LLMGateway:
+    """Single entry point for chat completions
+
+    Every provider gets its own pooled HTTP client from the registry (so a
+    slow provider cannot take the others' connections), a semaphore
+    capping its concurrent completions and a ProviderHealth tracking its
+    time to first token and error rate behind a circuit breaker. Requests
+    that wait longer than LLM_QUEUE_TIMEOUT for a slot fail with LLMError.
+
+    stream_chain tries a failover chain of providers: a provider failing
+    before its first token (or with an open breaker) hands over to the
+    next one, and with hedging the next one is also started when the
+    current one is slower than its p95 time to first token. The first
+    provider to produce a token wins and the others are cancelled.
+    """
+
+    def __init__(
+        self,
+        clients: HTTPClientRegistry = http_clients,
+        limits: Optional[Dict[str, int]] = None,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        health_options: Optional[Dict[str, Any]] = None
+    ):
+        self.clients = clients
+        self.limits = dict(LLM_CONCURRENCY_LIMITS if limits is None else limits)
+        self.queue_timeout = queue_timeout
+        self.health_options = health_options or {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, ProviderStats] = {}
+        self._health: Dict[str, ProviderHealth] = {}
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _slot(self, provider: str):
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            limit = self.limits.get(provider, LLM_MAX_CONCURRENCY)
+            semaphore = self._semaphores[provider] = asyncio.Semaphore(limit)
+            self._stats[provider] = ProviderStats(limit)
+            self._health[provider] = ProviderHealth(**self.health_options)
+        return semaphore, self._stats[provider], self._health[provider]
+
+    def health(self, provider: str) -> ProviderHealth:
+        return self._slot(provider.lower())[2]
+
+    def hedge_delay(self, provider: str) -> float:
+        """How long to wait for a first token before hedging: the provider's p95"""
+        health = self.health(provider)
+        if len(health.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, health.latency_quantile(0.95))
+
+    async def stream(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        **params
+    ) -> AsyncIterator[str]:
+        """Stream a completion from the named provider as text deltas
+
+        Every provider failure is raised as LLMError.
+        """
+        provider = provider.lower()
+        implementation = PROVIDERS.get(provider)
+        if implementation is None:
+            raise LLMError(f"Unsupported provider: {provider}")
+
+        semaphore, stats, health = self._slot(provider)
+        if not health.allow():
+            stats.short_circuited += 1
+            raise ProviderUnavailable(f"{provider} circuit breaker is open")
+        stats.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            stats.rejected += 1
+            health.release()
+            raise LLMError(f"{provider} is at its concurrency limit of {stats.limit}")
+        finally:
+            stats.waiting -= 1
+
+        stats.in_flight += 1
+        recorded = False
+        start = time.perf_counter()
+        try:
+            http = None if getattr(implementation, "local", False) else self.clients.get(f"llm.{provider}")
+            first = True
+            async for delta in implementation(http, model, messages, **params):
+                if first:
+                    ttft = time.perf_counter() - start
+                    health.record_latency(ttft)
+                    LLM_FIRST_TOKEN_SECONDS.observe(ttft, provider)
+                    first = False
+                yield delta
+            stats.completed += 1
+            health.record_success()
+            recorded = True
+            LLM_COMPLETION_SECONDS.observe(time.perf_counter() - start, provider, "ok")
+        except Exception as e:
+            stats.failed += 1
+            health.record_failure()
+            recorded = True
+            LLM_COMPLETION_SECONDS.observe(time.perf_counter() - start, provider, "error")
+            if isinstance(e, LLMError):
+                raise
+            # Connection errors and timeouts reach callers as LLMError too
+            raise LLMError(f"{provider} request failed: {e!r}") from e
+        finally:
+            if not recorded:
+                # Abandoned by the caller (e.g. lost a hedge): no outcome to record
+                health.release()
+            stats.in_flight -= 1
+            semaphore.release()
+
+    async def stream_chain(
+        self,
+        chain: List[Tuple[str, str]],
+        messages: List[Dict[str, str]],
+        hedge: Optional[bool] = None,
+        **params
+    ) -> AsyncIterator[str]:
+        """Stream from the first provider in the chain that answers
+
+        Failures after the first token cannot be retried elsewhere (the
+        caller already has part of the reply) and raise LLMError.
+        """
+        if len(chain) == 1:
+            async for delta in self.stream(chain[0][0], chain[0][1], messages, **params):
+                yield delta
+            return
+
+        hedge = LLM_HEDGE_ENABLED if hedge is None else hedge
+        attempts: List[_Attempt] = []
+        launched = 0
+        error: Optional[Exception] = None
+
+        def launch(hedged: bool = False):
+            nonlocal launched
+            provider, model = chain[launched]
+            launched += 1
+            attempts.append(_Attempt(self.stream(provider, model, messages, **params), provider, hedged))
+
+        try:
+            launch()
+            winner, item = None, None
+            while winner is None:
+                timeout = None
+                if hedge and len(attempts) == 1 and launched < len(chain):
+                    timeout = self.hedge_delay(attempts[0].provider)
+                pending = {attempt.first: attempt for attempt in attempts}
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch(hedged=True)
+                    continue
+                for future in done:
+                    attempt = pending[future]
+                    result = future.result()
+                    if isinstance(result, Exception):
+                        logger.warning(f"LLM provider {attempt.provider} failed: {result}")
+                        attempts.remove(attempt)
+                        error = result
+                    elif winner is None:
+                        winner, item = attempt, result
+                if winner is None and not attempts:
+                    if launched == len(chain):
+                        raise error if isinstance(error, LLMError) else LLMError(str(error))
+                    self.failovers += 1
+                    launch()
+
+            if winner.hedged:
+                self.hedge_wins += 1
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.task.cancel()
+            while item is not _DONE:
+                if isinstance(item, Exception):
+                    raise item if isinstance(item, LLMError) else LLMError(str(item))
+                yield item
+                item = await winner.queue.get()
+        finally:
+            for attempt in attempts:
+                attempt.task.cancel()
+            # Let the cancelled calls release their slots before returning
+            await asyncio.gather(*(attempt.task for attempt in attempts), return_exceptions=True)
+
+    def stream_call(self, call_params: Dict[str, Any], messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream a completion described by agent_call_params, with its fallbacks"""
+        params = dict(call_params)
+        params.pop("system_prompt", None)
+        primary = (params.pop("provider").lower(), params.pop("model"))
+        chain = [primary] + [link for link in params.pop("fallbacks", []) if link != primary]
+        return self.stream_chain(chain, messages, **params)
+
+    def stats(self) -> Dict[str, Any]:
+        """Concurrency, outcome and health counters per provider used so far"""
+        return {
+            "providers": {
+                provider: {
+                    **{name: getattr(stats, name) for name in ProviderStats.__slots__},
+                    **self._health[provider].stats()
+                }
+                for provider, stats in self._stats.items()
+            },
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+# Create a global instance of the gateway
+llm_gateway = LLMGateway()
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from ..config import (
+    LLM_LATENCY_WINDOW,
+    LLM_BREAKER_WINDOW,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_ERROR_RATE,
+    LLM_BREAKER_COOLDOWN
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class ProviderHealth:
+    """Latency and error-rate tracking with a circuit breaker for one provider
+
+    Latency is time to first token over the last LLM_LATENCY_WINDOW calls.
+    The breaker opens when at least LLM_BREAKER_ERROR_RATE of the last
+    LLM_BREAKER_WINDOW calls failed (after LLM_BREAKER_MIN_CALLS), rejects
+    calls for LLM_BREAKER_COOLDOWN seconds, then lets a single probe through:
+    its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        window: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+        latency_window: int = LLM_LATENCY_WINDOW
+    ):
+        self.min_calls = min_calls
+        self.error_rate_limit = error_rate
+        self.cooldown = cooldown
+        self.outcomes: deque = deque(maxlen=window)  # True for a failed call
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now; claims the probe when half open"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_latency(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def record_success(self):
+        self.outcomes.append(False)
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.outcomes.clear()
+        self._probing = False
+
+    def record_failure(self):
+        self.outcomes.append(True)
+        self._probing = False
+        if self.state == HALF_OPEN or self.state == CLOSED and (
+            len(self.outcomes) >= self.min_calls and self.error_rate >= self.error_rate_limit
+        ):
+            self._open()
+
+    def release(self):
+        """Give back a claimed probe without an outcome (the call was abandoned)"""
+        self._probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.latency_quantile(0.5), self.latency_quantile(0.95)
+        return {
+            "breaker": self.state,
+            "times_opened": self.times_opened,
+            "error_rate": round(self.error_rate, 4),
+            "ttft_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "ttft_p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import random
+import re
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+from ..config import (
+    OPENAI_API_KEY,
+    OPENAI_API_BASE,
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_API_BASE,
+    ANTHROPIC_API_VERSION,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_MAX_TOKENS,
+    DEFAULT_TOP_P,
+    DEFAULT_FREQUENCY_PENALTY,
+    DEFAULT_PRESENCE_PENALTY,
+    LLM_FAKE_TOKEN_DELAY
+)
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+class LLMError(Exception):
+    """Raised when a provider rejects or fails a completion request"""
+
+async def iter_sse_events(response: "aiohttp.ClientResponse") -> AsyncIterator[Tuple[Optional[str], str]]:
+    """Yield (event, data) pairs from a server-sent events body"""
+    event, data = None, []
+    async for raw in response.content:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+    if data:
+        yield event, "\n".join(data)
+
+async def _raise_for_status(response: "aiohttp.ClientResponse", provider: str):
+    if response.status != 200:
+        error_detail = await response.text()
+        logger.error(f"{provider} error {response.status}: {error_detail}")
+        raise LLMError(f"{provider} returned {response.status}: {error_detail}")
+
+async def stream_openai(
+    http: "aiohttp.ClientSession",
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    top_p: float = DEFAULT_TOP_P,
+    frequency_penalty: float = DEFAULT_FREQUENCY_PENALTY,
+    presence_penalty: float = DEFAULT_PRESENCE_PENALTY
+) -> AsyncIterator[str]:
+    """Stream text deltas from the OpenAI chat completions API"""
+    async with http.post(
+        f"{OPENAI_API_BASE}/chat/completions",
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+        json={
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "stream": True
+        }
+    ) as response:
+        await _raise_for_status(response, "openai")
+        async for _, data in iter_sse_events(response):
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+async def stream_anthropic(
+    http: "aiohttp.ClientSession",
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    top_p: float = DEFAULT_TOP_P,
+    frequency_penalty: float = DEFAULT_FREQUENCY_PENALTY,
+    presence_penalty: float = DEFAULT_PRESENCE_PENALTY
+) -> AsyncIterator[str]:
+    """Stream text deltas from the Anthropic messages API
+
+    System messages are lifted into the top-level `system` field; the
+    penalty parameters have no Anthropic equivalent and are ignored.
+    """
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    payload = {
+        "model": model,
+        "messages": [m for m in messages if m["role"] != "system"],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "top_p": top_p,
+        "stream": True
+    }
+    if system:
+        payload["system"] = system
+    async with http.post(
+        f"{ANTHROPIC_API_BASE}/messages",
+        headers={"x-api-key": ANTHROPIC_API_KEY or "", "anthropic-version": ANTHROPIC_API_VERSION},
+        json=payload
+    ) as response:
+        await _raise_for_status(response, "anthropic")
+        async for event, data in iter_sse_events(response):
+            if event == "message_stop":
+                break
+            if event == "error":
+                raise LLMError(f"anthropic stream error: {data}")
+            if event == "content_block_delta":
+                delta = json.loads(data).get("delta", {})
+                if delta.get("type") == "text_delta" and delta.get("text"):
+                    yield delta["text"]
+
+async def stream_fake(
+    http: "aiohttp.ClientSession",
+    model: str,
+    messages: List[Dict[str, str]],
+    **params
+) -> AsyncIterator[str]:
+    """Echo the last user message back word by word, without any network call"""
+    prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    for token in re.findall(r"\S+\s*", f"Echo: {prompt}"):
+        if LLM_FAKE_TOKEN_DELAY:
+            await asyncio.sleep(LLM_FAKE_TOKEN_DELAY)
+        yield token
+
+# Runs in process; the gateway passes no HTTP client
+stream_fake.local = True
+
+def fake_provider(
+    first_token_delay: float = 0.0,
+    token_delay: float = 0.0,
+    error_rate: float = 0.0,
+    name: str = "fake"
+):
+    """Build a fake provider that injects latency and failures
+
+    It waits first_token_delay before answering and token_delay between
+    tokens, and fails with LLMError before the first token with probability
+    error_rate. Otherwise it echoes like stream_fake, prefixed with `name`.
+    """
+    async def stream(http, model, messages, **params):
+        if first_token_delay:
+            await asyncio.sleep(first_token_delay)
+        if error_rate and random.random() < error_rate:
+            raise LLMError(f"{name} injected failure")
+        prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        for i, token in enumerate(re.findall(r"\S+\s*", f"{name}: {prompt}")):
+            if i and token_delay:
+                await asyncio.sleep(token_delay)
+            yield token
+
+    stream.local = True
+    return stream
+
+# Streaming implementation for each provider in AVAILABLE_PROVIDERS
+PROVIDERS = {
+    "openai": stream_openai,
+    "anthropic": stream_anthropic,
+    "fake": stream_fake
+}
+
+def stream_response(
+    http: "aiohttp.ClientSession",
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    **params
+) -> AsyncIterator[str]:
+    """Stream a completion from the named provider as text deltas"""
+    stream = PROVIDERS.get(provider.lower())
+    if stream is None:
+        raise LLMError(f"Unsupported provider: {provider}")
+    return stream(http, model, messages, **params)
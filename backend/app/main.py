@@ -1,8 +1,17 @@
 import logging
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import agents_router, multimedia_router, ws_router, auth_router, chat_router
-from .database import init_db
+from .routers import agents_router, multimedia_router, auth_router, chat_router, admin_router
+from .database import init_db, get_pool_stats
+from .http_client import http_clients
+from .auth import auth_session_cache
+from .tts_cache import tts_cache
+from .llm import llm_gateway
+from .response_cache import response_cache
+from .ws import manager
+from .middleware import RequestMiddleware, request_stats
+from .metrics import metrics, CONTENT_TYPE
 from .config import (
     CORS_SETTINGS,
     LOG_LEVEL,
@@ -13,7 +22,9 @@ from .config import (
     ENABLE_PDF,
     ENABLE_WEBSOCKET,
     ENABLE_TTS,
-    CORS_ORIGINS
+    CORS_ORIGINS,
+    validate_settings,
+    ensure_directories
 )
 
 # Configure logging to console
@@ -35,22 +46,36 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+# Logging, timing and X-Token-Expired for every HTTP request (pure ASGI, so
+# streamed responses are not buffered)
+app.add_middleware(RequestMiddleware)
 
 # Include routers
 app.include_router(auth_router.router, tags=["Authentication"])
 app.include_router(agents_router.router, tags=["Agents"])
 app.include_router(multimedia_router.router, tags=["Multimedia"])
 app.include_router(chat_router.router, tags=["Chat"])
+app.include_router(admin_router.router, tags=["Admin"])
+# Feature routers are only imported when enabled, keeping worker cold starts short
+if ENABLE_TTS:
+    from .routers import tts_router
+    app.include_router(tts_router.router, tags=["Text-to-Speech"])
 if ENABLE_WEBSOCKET:
+    from .routers import ws_router
     app.include_router(ws_router.router, tags=["WebSocket"])
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the database and other startup tasks"""
     try:
+        validate_settings()
+        ensure_directories()
         await init_db()
         logger.info("Database initialized successfully")
 
+        await http_clients.start()
+        await manager.start()
+
         # Log enabled features
         features = {
             "Audio": ENABLE_AUDIO,
@@ -70,33 +95,11 @@ async def startup_event():
         logger.error(f"Failed to initialize application: {e}")
         raise
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    logger.info(f"Request: {request.method} {request.url}")
-    try:
-        response = await call_next(request)
-        logger.info(f"Response status: {response.status_code}")
-        return response
-    except Exception as e:
-        logger.error(f"Request failed: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    """Handle authentication and token refresh"""
-    try:
-        response = await call_next(request)
-        
-        # Check if response indicates token expiration
-        if response.status_code == 401:
-            # Let the client handle token refresh
-            response.headers["X-Token-Expired"] = "true"
-        
-        return response
-    except Exception as e:
-        logger.error(f"Auth middleware error: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled upstream connections and the websocket broker"""
+    await http_clients.close()
+    await manager.close()
 
 @app.get("/", tags=["Health"])
 async def root():
@@ -120,9 +123,24 @@ async def health_check():
     return {
         "status": "healthy",
         "database": "connected",
-        "api_version": "1.0.0"
+        "api_version": "1.0.0",
+        "auth_cache": auth_session_cache.stats(),
+        "tts_cache": tts_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "response_cache": response_cache.stats(),
+        "requests": request_stats.stats()
     }
 
+@app.get("/metrics", tags=["Health"])
+async def prometheus_metrics():
+    """Request, database, upstream and websocket metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/metrics/db", tags=["Health"])
+async def db_pool_metrics():
+    """Connection pool telemetry for sizing the engine profile"""
+    return get_pool_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
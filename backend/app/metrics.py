@@ -0,0 +1,184 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Media type of the Prometheus text exposition format (the response adds the charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonic count per label combination; label values are passed positionally"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(labels)} {_format_value(value)}" for labels, value in self.values.items()]
+
+class Gauge(_Metric):
+    """Current value per label combination, or read from `callback` at export time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            return [f"{self.name} {_format_value(self.callback())}"]
+        return [f"{self.name}{self._labels(labels)} {_format_value(value)}" for labels, value in self.values.items()]
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram per label combination
+
+    observe() does one bisect over the bucket bounds and three in-place
+    updates. Counts are stored per bucket and only made cumulative at
+    export time.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def snapshot(self, *labels) -> Optional[Dict]:
+        """Count, sum and cumulative bucket counts of one label combination"""
+        series = self.series.get(labels)
+        if series is None:
+            return None
+        cumulative, total = [], 0
+        for count in series[0]:
+            total += count
+            cumulative.append(total)
+        return {"count": total, "sum": series[1], "buckets": dict(zip(self.buckets + (float("inf"),), cumulative))}
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels in self.series:
+            snapshot = self.snapshot(*labels)
+            for bound, count in snapshot["buckets"].items():
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {count}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {snapshot['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Metrics of this worker process, exported together
+
+    Like the other in-process stats these are per worker and are not
+    aggregated across processes. Under `uvicorn --workers N` every worker
+    shares one port, so a scrape reaches an arbitrary worker and counters
+    appear to jump backwards: scrape /metrics only from single-worker
+    processes, each on its own port.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Create a global instance of the metrics registry
+metrics = MetricsRegistry()
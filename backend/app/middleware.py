@@ -0,0 +1,123 @@
+import logging
+import random
+import time
+from typing import Any, Dict
+from .config import REQUEST_LOG_SAMPLE_RATE, REQUEST_LOG_SLOW_MS
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time until the last response chunk was sent",
+    ("method", "route")
+)
+
+def route_label(scope) -> str:
+    """Path template of the matched route, so path parameters do not add series"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class RequestStats:
+    """Request counters shared by the middleware and /health"""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.server_errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "server_errors": self.server_errors,
+            "slow": self.slow,
+            "mean_ms": round(self.total_ms / self.requests, 3) if self.requests else 0.0
+        }
+
+# Create a global instance of the request counters
+request_stats = RequestStats()
+
+class RequestMiddleware:
+    """Request logging, timing and the X-Token-Expired header in one pure ASGI layer
+
+    Only the `http.response.start` message is touched, so bodies are never
+    buffered and SSE or streamed audio pass through chunk by chunk. Latency
+    runs until the last body chunk is sent, but a request only counts as
+    slow when its response headers took longer than REQUEST_LOG_SLOW_MS, so
+    long SSE turns and streamed audio are not flagged. A
+    REQUEST_LOG_SAMPLE_RATE share of requests is logged at INFO; slow
+    requests and server errors are always logged, at WARNING. Log lines are formatted
+    lazily by the logging module, so skipped ones cost nothing.
+    """
+
+    def __init__(
+        self,
+        app,
+        stats: RequestStats = request_stats,
+        sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+        slow_ms: float = REQUEST_LOG_SLOW_MS
+    ):
+        self.app = app
+        self.stats = stats
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        # Time to response headers; stays unset if the app never responds
+        headers_ms = None
+        self.stats.in_flight += 1
+
+        async def send_wrapper(message):
+            nonlocal status, headers_ms
+            if message["type"] == "http.response.start":
+                headers_ms = (time.perf_counter() - start) * 1000
+                status = message["status"]
+                if status == 401:
+                    # Let the client handle token refresh
+                    message["headers"] = list(message.get("headers", ())) + [(b"x-token-expired", b"true")]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Request failed: %s %s", scope["method"], scope["path"])
+            raise
+        finally:
+            self.stats.in_flight -= 1
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._record(scope, status, elapsed_ms, elapsed_ms if headers_ms is None else headers_ms)
+
+    def _record(self, scope, status: int, elapsed_ms: float, headers_ms: float):
+        method, route = scope["method"], route_label(scope)
+        HTTP_REQUESTS.inc(method, route, status)
+        HTTP_LATENCY.observe(elapsed_ms / 1000, method, route)
+        stats = self.stats
+        stats.requests += 1
+        stats.total_ms += elapsed_ms
+        if status >= 500:
+            stats.server_errors += 1
+        slow = headers_ms >= self.slow_ms
+        if slow:
+            stats.slow += 1
+        if status >= 500 or slow:
+            level = logging.WARNING
+        elif self.sample_rate and random.random() < self.sample_rate:
+            level = logging.INFO
+        else:
+            return
+        logger.log(
+            level,
+            "%s %s -> %d in %.1f ms (headers after %.1f ms)",
+            scope["method"], scope["path"], status, elapsed_ms, headers_ms
+        )
+
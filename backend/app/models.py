@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index, text
 from sqlalchemy.orm import relationship, DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from .config import (
@@ -49,6 +49,8 @@ class Agent(Base):
     role = Column(String)
     connections = Column(String)
     tools = Column(String)
+    # Comma-separated "provider:model" links tried when the provider fails
+    fallbacks = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -72,11 +74,31 @@ class ChatSession(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime, nullable=True)
+    # Sequence number of the latest message; bumped atomically on append
+    last_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Estimated tokens of all messages; bumped with last_seq
+    token_total = Column(Integer, nullable=False, default=0, server_default="0")
+    # Rolling summary of the messages up to summary_seq, which are no longer sent verbatim
+    summary = Column(Text, nullable=True)
+    summary_seq = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="chat_session")
 
+    __table_args__ = (
+        # Active session lookup; also guarantees one open session per user
+        Index(
+            "ux_chat_sessions_user_open",
+            "user_id",
+            unique=True,
+            postgresql_where=text("end_time IS NULL"),
+            sqlite_where=text("end_time IS NULL")
+        ),
+        # Conversation listing, keyset-paginated by id
+        Index("ix_chat_sessions_user_id_id", "user_id", "id"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -88,18 +110,28 @@ class ChatMessage(Base):
     audio_url = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_error = Column(Boolean, default=False)
+    # Per-session position, 1-based and gapless; used for history deltas
+    seq = Column(Integer)
+    # Estimated tokens of the exchange (prompt and response) for context budgeting
+    token_count = Column(Integer)
 
     # Relationships
     chat_session = relationship("ChatSession", back_populates="messages")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_chat_messages_session_seq", "chat_session_id", "seq", unique=True),
+        # History ordering
+        Index("ix_chat_messages_session_created", "chat_session_id", "created_at"),
+    )
+
 class AuthSession(Base):
     __tablename__ = "auth_sessions"
 
     id = Column(String, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
     # Relationships
     user = relationship("User", back_populates="auth_sessions")
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from .config import PROFILER_MAX_SECONDS
+
+# (file, qualified name, first line) of one frame
+FrameKey = Tuple[str, str, int]
+
+# Bounds for sampling intervals in seconds; shorter ones would spin the
+# sampler thread and starve the event loop of the GIL
+MIN_INTERVAL = 0.001
+MAX_INTERVAL = 1.0
+
+# Root frames that tell the two kinds of samples apart in collapsed output
+ON_CPU_ROOT = "[on-cpu]"
+AWAITING_ROOT = "[awaiting]"
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already running in this worker"""
+
+def _frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return (code.co_filename, getattr(code, "co_qualname", code.co_name), code.co_firstlineno)
+
+def _thread_stack(frame) -> Tuple[FrameKey, ...]:
+    """Stack of a running thread, outermost frame first"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+def _await_stack(coro) -> Tuple[FrameKey, ...]:
+    """Stack of a suspended coroutine, following what each level awaits
+
+    Task.get_stack() only returns the outermost coroutine's frame; the
+    await chain holds the rest. It ends at a future or at an async
+    generator's __anext__, whose frame Python does not expose.
+    """
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_key(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return tuple(stack)
+
+def _frame_name(key: FrameKey) -> str:
+    return f"{key[1]} ({os.path.basename(key[0])}:{key[2]})"
+
+class Profile:
+    """Samples of one profiling run
+
+    `on_cpu` holds stacks of the event loop thread, sampled every `interval`
+    seconds from a separate thread, so it shows what the loop is running
+    (idle time shows up under the selector's select). `awaiting` holds the
+    await stacks of every asyncio task, sampled every `task_interval`
+    seconds on the loop, so it shows where requests wait.
+    """
+
+    def __init__(self, interval: float, task_interval: float):
+        self.interval = interval
+        self.task_interval = task_interval
+        self.on_cpu: Counter = Counter()
+        self.awaiting: Counter = Counter()
+        self.duration = 0.0
+
+    def _weighted(self):
+        for root, samples, weight in (
+            (ON_CPU_ROOT, self.on_cpu, self.interval),
+            (AWAITING_ROOT, self.awaiting, self.task_interval)
+        ):
+            for stack, count in samples.items():
+                yield root, stack, count * weight
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, weighted in milliseconds"""
+        lines = []
+        for root, stack, seconds in self._weighted():
+            names = ";".join([root] + [_frame_name(key).replace(";", ":") for key in stack])
+            lines.append(f"{names} {max(1, round(seconds * 1000))}")
+        return "\n".join(sorted(lines)) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope.app file with one sampled profile per kind of sample"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[FrameKey, int] = {}
+
+        def frame_id(key: FrameKey) -> int:
+            if key not in index:
+                index[key] = len(frames)
+                frames.append({"name": key[1], "file": key[0], "line": key[2]})
+            return index[key]
+
+        profiles = []
+        for name, samples, weight in (
+            ("Event loop thread (on CPU)", self.on_cpu, self.interval),
+            ("Asyncio tasks (awaiting)", self.awaiting, self.task_interval)
+        ):
+            stacks, weights = [], []
+            for stack, count in samples.items():
+                stacks.append([frame_id(key) for key in stack])
+                weights.append(count * weight)
+            profiles.append({
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"worker {os.getpid()} for {self.duration:.1f}s",
+            "exporter": "language-tutor sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+class SamplingProfiler:
+    """Time-boxed sampling profiler for the running worker
+
+    One profile at a time per worker; each run is capped at
+    PROFILER_MAX_SECONDS. Sampling costs one stack walk per interval, so it
+    is safe to run against live traffic.
+    """
+
+    def __init__(self, max_seconds: float = PROFILER_MAX_SECONDS):
+        self.max_seconds = max_seconds
+        self.running = False
+
+    async def run(self, seconds: float, interval: float = 0.005, task_interval: float = 0.05) -> Profile:
+        """Profile the event loop this is awaited on for `seconds`
+
+        Both intervals are clamped to MIN_INTERVAL..MAX_INTERVAL. Raises
+        ValueError unless `seconds` is positive.
+        """
+        if not seconds > 0:
+            raise ValueError("seconds must be positive")
+        if self.running:
+            raise ProfilerBusy("A profile is already running in this worker")
+        interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+        task_interval = min(max(task_interval, MIN_INTERVAL), MAX_INTERVAL)
+        self.running = True
+        seconds = min(max(seconds, interval), self.max_seconds)
+        profile = Profile(interval, task_interval)
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample_thread,
+            args=(profile, threading.get_ident(), interval, stop),
+            name="sampling-profiler",
+            daemon=True
+        )
+        start = loop.time()
+        try:
+            sampler.start()
+            me = asyncio.current_task()
+            while True:
+                for task in asyncio.all_tasks():
+                    if task is not me:
+                        profile.awaiting[_await_stack(task.get_coro())] += 1
+                remaining = start + seconds - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(task_interval, remaining))
+        finally:
+            stop.set()
+            if sampler.is_alive():
+                sampler.join()
+            profile.duration = loop.time() - start
+            self.running = False
+        return profile
+
+    @staticmethod
+    def _sample_thread(profile: Profile, thread_id: int, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                profile.on_cpu[_thread_stack(frame)] += 1
+
+# Create a global instance of the profiler
+profiler = SamplingProfiler()
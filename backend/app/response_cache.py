@@ -0,0 +1,189 @@
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from .config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_SIZE,
+    RESPONSE_CACHE_SEMANTIC,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_EMBEDDING_DIM
+)
+from .context import estimate_tokens
+
+_EDGE_PUNCTUATION = re.compile(r"^[\s¿¡\"'“”«»]+|[\s?!.,;:\"'“”«»…]+$")
+
+class AgentCacheStats:
+    __slots__ = ("hits", "semantic_hits", "misses", "tokens_saved")
+
+    def __init__(self):
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+class ResponseCache:
+    """In-process cache of complete tutor replies
+
+    Entries live in a namespace of (agent id, system prompt hash, model) and
+    are keyed by the normalized prompt. The exact tier is an LRU dict with a
+    TTL. The optional semantic tier indexes every entry in a SemanticIndex
+    (NumPy matrix, cosine similarity) and serves the closest prompt of the
+    namespace when its similarity reaches the threshold. Keys ignore
+    conversation history, so callers only use the cache for turns without
+    one (see ChatTurn.stream).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        enabled: bool = True,
+        semantic: bool = False,
+        threshold: float = RESPONSE_CACHE_SIMILARITY,
+        dim: int = RESPONSE_CACHE_EMBEDDING_DIM
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.threshold = threshold
+        # (namespace, prompt) -> (expires_at monotonic timestamp, response, response tokens)
+        self._data: "OrderedDict[Tuple, tuple]" = OrderedDict()
+        self.index = None
+        if enabled and semantic and maxsize > 0:
+            # NumPy is only imported when the similarity tier is on
+            from .semantic_index import SemanticIndex
+            self.index = SemanticIndex(maxsize, dim)
+        self._agents: Dict[str, AgentCacheStats] = {}
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case, width, whitespace and edge punctuation insensitive form of a prompt"""
+        text = unicodedata.normalize("NFKC", text).casefold()
+        return _EDGE_PUNCTUATION.sub("", " ".join(text.split()))
+
+    @staticmethod
+    def namespace(agent_id: Optional[int], system_prompt: str, model: str) -> Tuple:
+        digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        return (agent_id, digest, model)
+
+    def _agent(self, agent_id: Optional[int]) -> AgentCacheStats:
+        label = "default" if agent_id is None else str(agent_id)
+        stats = self._agents.get(label)
+        if stats is None:
+            stats = self._agents[label] = AgentCacheStats()
+        return stats
+
+    def _live(self, key: Hashable) -> Optional[tuple]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        return item
+
+    def _remove(self, key: Hashable):
+        self._data.pop(key, None)
+        if self.index is not None:
+            self.index.remove(key)
+
+    def get(
+        self,
+        agent_id: Optional[int],
+        system_prompt: str,
+        model: str,
+        content: str,
+        prompt_tokens: int = 0
+    ) -> Optional[str]:
+        """Return a cached reply for the prompt, or None
+
+        On a hit the agent is credited with the tokens the call would have
+        cost: prompt_tokens plus the cached reply.
+        """
+        if not self.enabled:
+            return None
+        stats = self._agent(agent_id)
+        namespace = self.namespace(agent_id, system_prompt, model)
+        prompt = self.normalize(content)
+        key = (namespace, prompt)
+        item = self._live(key)
+        if item is None and self.index is not None:
+            match = self.index.search(namespace, prompt)
+            if match is not None and match[1] >= self.threshold:
+                key = match[0]
+                item = self._live(key)
+                if item is not None:
+                    stats.semantic_hits += 1
+        if item is None:
+            stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        stats.hits += 1
+        stats.tokens_saved += prompt_tokens + item[2]
+        return item[1]
+
+    def set(self, agent_id: Optional[int], system_prompt: str, model: str, content: str, response: str):
+        """Store a complete reply, evicting the least recently used one when full"""
+        if not self.enabled or self.maxsize <= 0 or not response:
+            return
+        namespace = self.namespace(agent_id, system_prompt, model)
+        prompt = self.normalize(content)
+        key = (namespace, prompt)
+        self._data[key] = (time.monotonic() + self.ttl, response, estimate_tokens(response))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            oldest, _ = self._data.popitem(last=False)
+            if self.index is not None:
+                self.index.remove(oldest)
+            self.evictions += 1
+        if self.index is not None:
+            self.index.add(namespace, key, prompt)
+
+    def clear(self):
+        """Drop all entries and counters"""
+        for key in list(self._data):
+            self._remove(key)
+        self._agents.clear()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit ratio and tokens saved, overall and per agent"""
+        agents = {}
+        for label, stats in self._agents.items():
+            lookups = stats.hits + stats.misses
+            agents[label] = {
+                "hits": stats.hits,
+                "semantic_hits": stats.semantic_hits,
+                "misses": stats.misses,
+                "hit_ratio": round(stats.hits / lookups, 4) if lookups else 0.0,
+                "tokens_saved": stats.tokens_saved
+            }
+        hits = sum(a["hits"] for a in agents.values())
+        lookups = hits + sum(a["misses"] for a in agents.values())
+        return {
+            "enabled": self.enabled,
+            "semantic": self.index is not None,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "tokens_saved": sum(a["tokens_saved"] for a in agents.values()),
+            "evictions": self.evictions,
+            "agents": agents
+        }
+
+# Create a global instance of the response cache
+response_cache = ResponseCache(
+    RESPONSE_CACHE_MAX_SIZE,
+    RESPONSE_CACHE_TTL,
+    enabled=RESPONSE_CACHE_ENABLED,
+    semantic=RESPONSE_CACHE_SEMANTIC
+)
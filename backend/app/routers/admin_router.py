@@ -0,0 +1,38 @@
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from ..auth import WebSocketPrincipal, get_admin_user
+from ..profiler import ProfilerBusy, profiler
+
+router = APIRouter(prefix="/api/admin")
+logger = logging.getLogger(__name__)
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, description="How long to sample; capped at PROFILER_MAX_SECONDS"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Event loop sampling interval"),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    admin: WebSocketPrincipal = Depends(get_admin_user)
+):
+    """Sample the worker serving this request and return the profile
+
+    `speedscope` opens in https://www.speedscope.app; `collapsed` feeds
+    flamegraph.pl and similar tools. Only this worker process is profiled.
+    """
+    logger.info("Admin %s started a %.1fs profile", admin.username, seconds)
+    try:
+        result = await profiler.run(seconds, interval=interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if format == "collapsed":
+        return Response(
+            result.collapsed(),
+            media_type="text/plain",
+            headers={"Content-Disposition": 'attachment; filename="profile.collapsed.txt"'}
+        )
+    return Response(
+        json.dumps(result.speedscope()),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'}
+    )
@@ -27,6 +27,8 @@ class AgentCreate(BaseModel):
     role: Optional[str] = None
     connections: Optional[str] = None
     tools: Optional[str] = None
+    # Failover chain, e.g. "anthropic:claude-3-haiku-20240307,openai:gpt-4o-mini"
+    fallbacks: Optional[str] = None
 
 class AgentSelect(BaseModel):
     agent_name: str
@@ -44,6 +46,8 @@ class AgentUpdate(BaseModel):
     role: Optional[str] = None
     connections: Optional[str] = None
     tools: Optional[str] = None
+    # Failover chain, e.g. "anthropic:claude-3-haiku-20240307,openai:gpt-4o-mini"
+    fallbacks: Optional[str] = None
 
 async def get_active_agent(db: AsyncSession, user_id: int):
     try:
@@ -145,7 +149,8 @@ async def create_agent_endpoint(
             presence_penalty=agent.presence_penalty,
             role=agent.role,
             connections=agent.connections,
-            tools=agent.tools
+            tools=agent.tools,
+            fallbacks=agent.fallbacks
         )
         db.add(new_agent)
         await db.commit()
@@ -199,7 +204,8 @@ async def get_agents_endpoint(
                 "presence_penalty": agent.presence_penalty,
                 "role": agent.role,
                 "connections": agent.connections,
-                "tools": agent.tools
+                "tools": agent.tools,
+                "fallbacks": agent.fallbacks
             }
             for agent in agents
         ]
@@ -7,14 +7,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import or_
 import jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from ..database import get_db
 from ..models import User, AuthSession
 from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..auth import get_password_hash, revoke_auth_session, verify_password
 
 router = APIRouter(prefix="/api/auth")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 logger = logging.getLogger(__name__)
 
@@ -54,7 +53,7 @@ async def register(
             )
 
         # Create new user
-        hashed_password = pwd_context.hash(form_data.password)
+        hashed_password = get_password_hash(form_data.password)
         new_user = User(
             username=form_data.username,
             email=form_data.username,  # Using username field for email
@@ -122,7 +121,7 @@ async def login(
         result = await db.execute(stmt)
         user = result.scalar_one_or_none()
 
-        if not user or not pwd_context.verify(login_data.password, user.password_hash):
+        if not user or not verify_password(login_data.password, user.password_hash):
             raise HTTPException(
                 status_code=401,
                 detail="Incorrect username or password"
@@ -210,6 +209,8 @@ async def refresh_token(
         # Update session expiry
         session.expires_at = expire
         await db.commit()
+        # Cached entries carry the old expiry, so force a reload on every worker
+        await revoke_auth_session(auth_session_id)
 
         # Set new cookie
         response.set_cookie(
@@ -251,6 +252,8 @@ async def logout(
                 await db.commit()
         except Exception as e:
             logger.error(f"Error during logout: {e}")
+        # After the delete, so no worker can re-cache the session from the database
+        await revoke_auth_session(auth_session_id)
 
     response.delete_cookie(
         key="auth_session_id",
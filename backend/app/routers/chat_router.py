@@ -1,59 +1,81 @@
+import json
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete, desc
+from sqlalchemy import delete
 from datetime import datetime
-from ..database import get_db
+from ..database import (
+    async_session_maker,
+    get_db,
+    create_chat_session as create_session,
+    get_conversations_page,
+    get_history_since,
+    history_delta_message
+)
 from ..auth import get_current_user
+from ..conversation import prepare_chat_turn
+from ..llm import LLMError
 from ..models import ChatSession, ChatMessage, User
+from ..ws import manager
 
 router = APIRouter(prefix="/api")
 logger = logging.getLogger(__name__)
 
+class ChatStreamRequest(BaseModel):
+    prompt_text: str
+    agent_name: Optional[str] = None
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.get("/chat/conversations")
 async def get_conversations(
+    response: Response,
+    before: Optional[int] = Query(None, description="Return conversations with an id lower than this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size; every conversation when omitted"),
+    messages_limit: Optional[int] = Query(None, ge=1, description="Latest N messages per conversation"),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all conversations for the current user"""
+    """Get the current user's conversations, newest first
+
+    Without `limit` every conversation is returned, as the frontend
+    expects; with it, one page plus an X-Next-Cursor header.
+    """
     try:
-        query = (
-            select(ChatSession)
-            .where(ChatSession.user_id == current_user["id"])
-            .order_by(desc(ChatSession.created_at))
+        page = await get_conversations_page(
+            db,
+            current_user["id"],
+            before=before,
+            limit=limit,
+            messages_limit=messages_limit
         )
-        result = await db.execute(query)
-        sessions = result.scalars().all()
-
-        conversations = []
-        for session in sessions:
-            messages_query = (
-                select(ChatMessage)
-                .where(ChatMessage.chat_session_id == session.id)
-                .order_by(ChatMessage.created_at)
-            )
-            messages_result = await db.execute(messages_query)
-            messages = messages_result.scalars().all()
-            
-            # Only include conversations that have messages
-            if messages:
-                conversations.append({
-                    "id": session.id,
-                    "title": f"Conversation {session.id}",
-                    "created_at": session.start_time,
-                    "messages": [
-                        {
-                            "text": msg.content,
-                            "isUser": True if msg.response is None else False,
-                            "audioUrl": msg.audio_url
-                        }
-                        for msg in messages
-                    ]
-                })
-
-        return conversations
+
+        # Cursor for the next page; absent when this page is the last one
+        if limit is not None and len(page) == limit:
+            response.headers["X-Next-Cursor"] = str(page[-1][0].id)
+
+        return [
+            {
+                "id": session.id,
+                "title": f"Conversation {session.id}",
+                "created_at": session.start_time,
+                "messages": [
+                    {
+                        "text": msg.content,
+                        "isUser": True if msg.response is None else False,
+                        "audioUrl": msg.audio_url
+                    }
+                    for msg in messages
+                ]
+            }
+            for session, messages in page
+        ]
     except Exception as e:
         logger.error(f"Error getting conversations: {e}")
         raise HTTPException(
@@ -82,16 +104,11 @@ async def create_chat_session(
         if active_session:
             return {"session_id": active_session.id}
 
-        # Create new session
-        new_session = ChatSession(
-            user_id=current_user["id"],
-            start_time=datetime.utcnow()
-        )
-        db.add(new_session)
-        await db.commit()
-        await db.refresh(new_session)
-
-        return {"session_id": new_session.id}
+        # Create new session; a concurrent request may have won the race
+        session_id = await create_session(db, current_user["id"])
+        if session_id is None:
+            raise RuntimeError("No session created")
+        return {"session_id": session_id}
     except Exception as e:
         logger.error(f"Error creating chat session: {e}")
         raise HTTPException(
@@ -184,6 +201,17 @@ async def delete_conversation(
             detail="Could not delete conversation"
         )
 
+@router.get("/chat/sessions/{session_id}/messages")
+async def get_session_messages(
+    session_id: int,
+    since: int = Query(0, ge=0, description="Only return messages with a greater seq"),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the messages of a session added after a known sequence number"""
+    entries = await get_history_since(db, current_user["id"], session_id, since)
+    return history_delta_message(session_id, entries, since)
+
 @router.get("/chat/sessions/active")
 async def get_active_session(
     db: AsyncSession = Depends(get_db),
@@ -211,3 +239,50 @@ async def get_active_session(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not get active session"
         )
+
+@router.post("/chat/stream")
+async def stream_chat(
+    chat_request: ChatStreamRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Answer a prompt as server-sent events: `delta` events, then `done`
+
+    The exchange is saved once the reply is complete; a failed reply ends
+    with an `error` event and is not saved.
+    """
+    try:
+        turn = await prepare_chat_turn(db, current_user["id"], chat_request.prompt_text, chat_request.agent_name)
+    except Exception as e:
+        logger.error(f"Error preparing chat turn: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not start chat turn"
+        )
+
+    async def events():
+        try:
+            async for delta in turn.stream():
+                yield sse_event("delta", {"turn_id": turn.turn_id, "delta": delta})
+        except LLMError as e:
+            logger.error(f"LLM request failed: {e}")
+            yield sse_event("error", {"turn_id": turn.turn_id, "detail": "Language model unavailable"})
+            return
+
+        # The request's session is released before the body streams
+        async with async_session_maker() as session:
+            entry = await turn.save(session)
+        if entry is None:
+            yield sse_event("error", {"turn_id": turn.turn_id, "detail": "Failed to save message"})
+            return
+        yield sse_event("done", turn.done_message(entry))
+        await manager.send_to_user(
+            current_user["id"],
+            history_delta_message(turn.chat_session_id, [entry], entry[0] - 1)
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,16 +1,22 @@
 import logging
-import base64
-from pathlib import Path
-from datetime import datetime
 from fastapi import APIRouter, Request, HTTPException, UploadFile, File, Form, Depends, Cookie, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import jwt
-import aiohttp
-import openai
-from ..config import SECRET_KEY, ALGORITHM, DEEPGRAM_API_KEY
-from ..database import get_db, create_chat_session, end_chat_session, update_and_get_history
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import SECRET_KEY, ALGORITHM, DEEPGRAM_API_KEY, DEEPGRAM_API_URL
+from ..database import (
+    get_db,
+    async_session_maker,
+    create_chat_session,
+    end_chat_session,
+    get_active_chat_session_id,
+    history_delta_message
+)
 from ..auth import verify_auth_session
+from ..conversation import prepare_chat_turn
+from ..http_client import get_stt_http
+from ..llm import LLMError
 from ..ws import manager
 
 router = APIRouter()
@@ -21,7 +27,16 @@ class TextRequest(BaseModel):
     agent_name: str
 
 @router.post("/api/multimedia/text/")
-async def text_endpoint(request: Request, text_data: TextRequest, include_response: bool = False):
+async def text_endpoint(
+    request: Request,
+    text_data: TextRequest,
+    include_response: bool = False
+):
+    """Answer a prompt, relaying the reply to the user's sockets as it streams
+
+    The database is used in short sessions before and after the LLM call, so
+    no pooled connection is held while the reply streams.
+    """
     logger.info("Received text message for processing.")
     
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -43,60 +58,43 @@ async def text_endpoint(request: Request, text_data: TextRequest, include_respon
         
         logger.info(f"Token decoded successfully. User ID: {user_id}")
         
-        async with get_db() as db:
-            logger.info(f"Verifying auth session: {auth_session_id}")
+        agent_name = text_data.agent_name
+        content = text_data.prompt_text
+        async with async_session_maker() as db:
             if not await verify_auth_session(db, auth_session_id):
                 logger.warning(f"Invalid auth session: {auth_session_id}")
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid auth session")
-            
-            logger.info("Auth session verified successfully")
-            
-            agent_name = text_data.agent_name
-            content = text_data.prompt_text
-            logger.info(f"Processing message for user {user_id}, agent: {agent_name}")
 
+            logger.info(f"Processing message for user {user_id}, agent: {agent_name}")
             try:
-                async with db.execute("SELECT id FROM chat_sessions WHERE user_id = ? AND end_time IS NULL", (user_id,)) as cursor:
-                    result = await cursor.fetchone()
-                    chat_session_id = result[0] if result else None
-
-                if not chat_session_id:
-                    chat_session_id = await create_chat_session(db, user_id)
-
-                if chat_session_id:
-                    # TODO: Implement LLM client integration
-                    response_text = "This is a placeholder response. LLM integration pending."
-
-                    if response_text:
-                        logger.info(f"Generated response: {response_text}")
-
-                        updated_history = await update_and_get_history(db, user_id, content, response_text, chat_session_id)
-
-                        # Broadcast the entire updated history
-                        history_message = {
-                            "type": "history_update",
-                            "chat_session_id": chat_session_id,
-                            "history": [
-                                {"text": h[2], "isUser": True} if idx % 2 == 0 else {"text": f"{agent_name}: {h[3]}", "isUser": False}
-                                for idx, h in enumerate(updated_history)
-                            ]
-                        }
-                        await manager.broadcast(history_message, user_id)
-
-                        if include_response:
-                            return JSONResponse(status_code=status.HTTP_200_OK, content={"response_text": response_text})
-                    else:
-                        logger.error(f"Failed to generate response for user {user_id}")
-                        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to generate response")
-
-                else:
-                    logger.error(f"Failed to create chat session for user {user_id}")
-                    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create chat session")
-
-            except Exception as e:
-                logger.error(f"Error in processing text request: {e}")
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+                turn = await prepare_chat_turn(db, user_id, content, agent_name)
+            except RuntimeError as e:
+                logger.error(str(e))
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create chat session")
+
+        # Relay the reply to the user's sockets as it is generated
+        try:
+            async for delta in turn.stream():
+                await manager.send_to_user(user_id, turn.delta_message(delta))
+        except LLMError as e:
+            logger.error(f"LLM request failed: {e}")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Language model unavailable")
+        response_text = turn.response_text
+
+        async with async_session_maker() as db:
+            entry = await turn.save(db)
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save message")
+
+        # Send only the new entry; clients resync from their last seq on a gap
+        await manager.send_to_user(user_id, turn.done_message(entry))
+        await manager.send_to_user(user_id, history_delta_message(turn.chat_session_id, [entry], entry[0] - 1))
+
+        if include_response:
+            return JSONResponse(status_code=status.HTTP_200_OK, content={"response_text": response_text, "seq": entry[0]})
     
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         logger.warning("Token has expired")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
@@ -114,10 +112,11 @@ async def deepgram_transcribe(
     request: Request,
     audio: UploadFile = File(...),
     agent_name: str = Form(...),
-    db = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    http=Depends(get_stt_http)
 ):
     try:
-        token = request.headers.get("Authorization").split()[1]
+        token = request.headers.get("Authorization", "").replace("Bearer ", "")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("user_id")
 
@@ -143,33 +142,29 @@ async def deepgram_transcribe(
         }
         logger.info(f"Sending request to Deepgram with params: {params}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.deepgram.com/v1/listen",
-                headers=headers,
-                params=params,
-                data=audio_data
-            ) as response:
-                if response.status != 200:
-                    error_detail = await response.text()
-                    logger.error(f"Deepgram API error: {error_detail}")
-                    raise HTTPException(status_code=500, detail=f"Error communicating with Deepgram API: {error_detail}")
-
-                transcription_result = await response.json()
-                logger.info("Received response from Deepgram")
-                transcription = transcription_result['results']['channels'][0]['alternatives'][0]['transcript']
-                detected_language = transcription_result['results']['channels'][0].get('detected_language', 'unknown')
-                logger.info(f"Detected language: {detected_language}")
-
-                async with db.execute("SELECT id FROM chat_sessions WHERE user_id = ? AND end_time IS NULL", (user_id,)) as cursor:
-                    chat_session = await cursor.fetchone()
-                
-                if not chat_session:
-                    chat_session_id = await create_chat_session(db, user_id)
-                else:
-                    chat_session_id = chat_session[0]
-
-                return {"transcription": transcription, "detected_language": detected_language}
+        async with http.post(
+            DEEPGRAM_API_URL,
+            headers=headers,
+            params=params,
+            data=audio_data
+        ) as response:
+            if response.status != 200:
+                error_detail = await response.text()
+                logger.error(f"Deepgram API error: {error_detail}")
+                raise HTTPException(status_code=500, detail=f"Error communicating with Deepgram API: {error_detail}")
+
+            transcription_result = await response.json()
+        logger.info("Received response from Deepgram")
+        transcription = transcription_result['results']['channels'][0]['alternatives'][0]['transcript']
+        detected_language = transcription_result['results']['channels'][0].get('detected_language', 'unknown')
+        logger.info(f"Detected language: {detected_language}")
+
+        if not await get_active_chat_session_id(db, user_id):
+            await create_chat_session(db, user_id)
+
+        return {"transcription": transcription, "detected_language": detected_language}
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         logger.error("Token expired")
         raise HTTPException(status_code=401, detail="Token expired")
@@ -180,42 +175,6 @@ async def deepgram_transcribe(
         logger.error(f"Error processing audio: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process audio: {str(e)}")
 
-@router.get("/api/tts/config/")
-async def get_tts_configuration():
-    return {"voices": ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]}
-
-class SpeechRequest(BaseModel):
-    text: str
-    voice: str
-    speed: float = 1.0
-
-@router.post("/api/tts/synthesize/")
-async def generate_speech(speech_request: SpeechRequest):
-    try:
-        if speech_request.voice not in ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]:
-            raise HTTPException(status_code=400, detail="Invalid voice specified")
-        if not 0.25 <= speech_request.speed <= 4.0:
-            raise HTTPException(status_code=400, detail="Invalid speed specified")
-        
-        speech_file_path = Path("/tmp") / f"speech_{datetime.now().timestamp()}.wav"
-        
-        response = await openai.audio.speech.create(
-            model="tts-1",
-            voice=speech_request.voice,
-            input=speech_request.text
-        )
-        
-        with open(speech_file_path, "wb") as f:
-            f.write(response.content)
-        
-        with open(speech_file_path, "rb") as audio_file:
-            audio_content = audio_file.read()
-        
-        return {"audio_content": base64.b64encode(audio_content).decode('utf-8')}
-    except Exception as e:
-        logger.error(f"Error in generate_speech: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate speech")
-
 @router.post("/api/reset-chat-session/")
 async def reset_chat_session(request: Request, db = Depends(get_db)):
     token = request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -0,0 +1,80 @@
+import base64
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from ..config import DEFAULT_SPEECH_MODEL
+from ..http_client import get_tts_http
+from ..tts import AUDIO_MEDIA_TYPES, open_speech_stream, iter_speech_chunks, synthesize_speech
+from ..tts_cache import tts_cache
+
+# Text-to-speech endpoints; only imported and mounted when ENABLE_TTS is set
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/api/tts/config/")
+async def get_tts_configuration():
+    return {"voices": ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]}
+
+class SpeechRequest(BaseModel):
+    text: str
+    voice: str
+    speed: float = 1.0
+    format: str = "wav"
+
+@router.post("/api/tts/synthesize/")
+async def generate_speech(
+    speech_request: SpeechRequest,
+    stream: bool = False,
+    http=Depends(get_tts_http)
+):
+    """Synthesize speech; with ?stream=true audio is forwarded as it is generated"""
+    try:
+        if speech_request.voice not in ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]:
+            raise HTTPException(status_code=400, detail="Invalid voice specified")
+        if not 0.25 <= speech_request.speed <= 4.0:
+            raise HTTPException(status_code=400, detail="Invalid speed specified")
+        if speech_request.format not in AUDIO_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="Invalid audio format specified")
+
+        media_type = AUDIO_MEDIA_TYPES[speech_request.format]
+        cache_key = tts_cache.key(
+            speech_request.text,
+            speech_request.voice,
+            DEFAULT_SPEECH_MODEL,
+            speech_request.speed,
+            speech_request.format
+        )
+        audio = await tts_cache.get(cache_key)
+
+        if stream:
+            if audio is not None:
+                return Response(content=audio, media_type=media_type)
+            # Provider errors surface here, before any audio has been sent
+            provider_response = await open_speech_stream(
+                http,
+                speech_request.text,
+                speech_request.voice,
+                speed=speech_request.speed,
+                response_format=speech_request.format
+            )
+            return StreamingResponse(
+                tts_cache.tee(cache_key, iter_speech_chunks(provider_response)),
+                media_type=media_type
+            )
+
+        if audio is None:
+            audio = await synthesize_speech(
+                http,
+                speech_request.text,
+                speech_request.voice,
+                speed=speech_request.speed,
+                response_format=speech_request.format
+            )
+            await tts_cache.put(cache_key, audio)
+        return {"audio_content": base64.b64encode(audio).decode('utf-8')}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in generate_speech: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate speech")
@@ -1,41 +1,46 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from ..auth import verify_auth_session
-from ..models import User
-from ..ws import ConnectionManager
-from ..database import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from ..auth import authenticate_websocket
+from ..ws import manager
+from ..database import async_session_maker, get_history_since, history_delta_message, user_owns_chat_session
+from ..conversation import prepare_chat_turn
+from ..http_client import http_clients
+from ..llm import LLMError
+from ..profiler import ProfilerBusy, profiler
+from ..stt_stream import StreamingTranscriber
+from ..ws_protocol import FrameError, decode_frame, negotiate
+import asyncio
+import base64
+import binascii
+import functools
 import logging
 import json
-import jwt
 from typing import Optional
-from ..config import SECRET_KEY, ALGORITHM
 
 router = APIRouter()
-manager = ConnectionManager()
 logger = logging.getLogger(__name__)
 
-async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
-    """Get user from JWT token"""
+async def relay_audio(transcriber: StreamingTranscriber, chunk: bytes, send) -> Optional[StreamingTranscriber]:
+    """Forward audio to the open transcription stream
+
+    If the provider stream has failed or closed, the client gets an error
+    frame and the stream is dropped (None is returned); chat carries on.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("user_id")
-        if user_id is None:
-            return None
-            
-        stmt = select(User).where(User.id == user_id)
-        result = await db.execute(stmt)
-        return result.scalar_one_or_none()
-    except jwt.JWTError:
+        await transcriber.send_audio(chunk)
+        return transcriber
+    except Exception as e:
+        logger.warning(f"Transcription stream failed: {e}")
+        await transcriber.close()
+        await send({"type": "error", "error": "Transcription stream closed"})
         return None
 
 @router.websocket("/ws/{token}")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    token: str,
-    db: AsyncSession = Depends(get_db)
-):
-    """WebSocket endpoint for real-time communication"""
+async def websocket_endpoint(websocket: WebSocket, token: str):
+    """WebSocket endpoint for real-time communication
+
+    Handlers that need the database open a session per message, so idle
+    sockets do not hold pooled connections.
+    """
     try:
         # Get auth session ID from query params
         auth_session_id = websocket.query_params.get("session")
@@ -43,42 +48,156 @@ async def websocket_endpoint(
             await websocket.close(code=4001, reason="Missing auth session")
             return
 
-        # Verify auth session
-        if not await verify_auth_session(db, auth_session_id):
-            await websocket.close(code=4001, reason="Invalid or expired session")
-            return
-
-        # Get user from token
-        user = await get_user_from_token(token, db)
+        # Verify token and auth session
+        user = await authenticate_websocket(token, auth_session_id)
         if not user:
-            await websocket.close(code=4001, reason="Invalid authentication token")
+            await websocket.close(code=4001, reason="Invalid or expired session")
             return
 
-        # Accept connection
-        await manager.connect(websocket, user.id)
+        # Accept connection in the frame format the client asked for
+        subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+        await manager.connect(websocket, user.user_id, subprotocol)
+        binary = manager.outbound[websocket].binary
+        # Replies are queued so they stay in order with pushed messages
+        send = functools.partial(manager.send, websocket)
+        # Live transcription stream, open between audio_start and audio_end
+        transcriber: Optional[StreamingTranscriber] = None
         
         try:
             while True:
-                # Receive message
-                data = await websocket.receive_text()
+                # Receive message; audio frames go to the open transcription stream
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                manager.touch(websocket)
                 try:
-                    message_data = json.loads(data)
-                except json.JSONDecodeError:
-                    logger.error(f"Invalid JSON received: {data}")
+                    message_data, audio = decode_frame(message, binary)
+                except (FrameError, ValueError) as e:
+                    logger.error(f"Invalid frame received: {e}")
+                    continue
+                if audio is not None:
+                    if transcriber:
+                        transcriber = await relay_audio(transcriber, audio, send)
+                    else:
+                        await send({"type": "error", "error": "No open audio stream"})
                     continue
 
                 # Process message based on type
                 message_type = message_data.get("type")
                 if message_type == "chat":
-                    # Handle chat message
+                    # Chat messages go to the session's room once the sender has joined it;
+                    # until then (or without a session) they are echoed to the sender only
+                    session_id = message_data.get("session_id")
                     await manager.broadcast_message(
-                        user.id,
+                        user.user_id,
                         message_data.get("content", ""),
-                        message_data.get("session_id")
+                        session_id,
+                        to_room=session_id is not None and manager.in_room(websocket, session_id)
                     )
+                elif message_type == "join":
+                    session_id = message_data.get("session_id")
+                    try:
+                        async with async_session_maker() as db:
+                            owned = await user_owns_chat_session(db, user.user_id, int(session_id))
+                    except (TypeError, ValueError):
+                        owned = False
+                    if not owned:
+                        await send({"type": "error", "error": "Session not found"})
+                        continue
+                    manager.join_room(websocket, session_id)
+                    await send({"type": "joined", "session_id": session_id})
+                elif message_type == "leave":
+                    session_id = message_data.get("session_id")
+                    manager.leave_room(websocket, session_id)
+                    await send({"type": "left", "session_id": session_id})
+                elif message_type == "prompt":
+                    # Stream the assistant reply back as assistant_delta frames
+                    try:
+                        async with async_session_maker() as db:
+                            turn = await prepare_chat_turn(
+                                db,
+                                user.user_id,
+                                message_data.get("content", ""),
+                                message_data.get("agent_name")
+                            )
+                    except Exception as e:
+                        logger.error(f"Error preparing chat turn: {e}")
+                        await send({"type": "error", "error": "Could not start chat turn"})
+                        continue
+                    try:
+                        async for delta in turn.stream():
+                            await send(turn.delta_message(delta))
+                    except LLMError as e:
+                        logger.error(f"LLM request failed: {e}")
+                        await send({
+                            "type": "error",
+                            "turn_id": turn.turn_id,
+                            "error": "Language model unavailable"
+                        })
+                        continue
+                    async with async_session_maker() as db:
+                        entry = await turn.save(db)
+                    await send(turn.done_message(entry))
+                    if entry:
+                        await manager.send_to_user(
+                            user.user_id,
+                            history_delta_message(turn.chat_session_id, [entry], entry[0] - 1)
+                        )
+                elif message_type == "history_sync":
+                    # Client asks for everything after the last seq it holds
+                    try:
+                        chat_session_id = int(message_data.get("chat_session_id"))
+                        since_seq = int(message_data.get("since_seq", 0))
+                    except (TypeError, ValueError):
+                        await send({"type": "error", "error": "Invalid history_sync request"})
+                        continue
+                    async with async_session_maker() as db:
+                        entries = await get_history_since(db, user.user_id, chat_session_id, since_seq)
+                    await send(
+                        history_delta_message(chat_session_id, entries, since_seq)
+                    )
+                elif message_type == "audio_start":
+                    if transcriber:
+                        await transcriber.close()
+                    transcriber = StreamingTranscriber(
+                        http_clients.get("stt"),
+                        send,
+                        encoding=message_data.get("encoding"),
+                        sample_rate=message_data.get("sample_rate"),
+                        language=message_data.get("language", "en")
+                    )
+                    try:
+                        await transcriber.start()
+                    except Exception as e:
+                        logger.error(f"Could not open transcription stream: {e}")
+                        transcriber = None
+                        await send({"type": "error", "error": "Transcription unavailable"})
+                        continue
+                    await send({"type": "audio_ready"})
+                elif message_type == "audio_chunk":
+                    # Text fallback for clients that cannot send binary frames
+                    if transcriber:
+                        try:
+                            chunk = base64.b64decode(message_data.get("data", ""), validate=True)
+                        except (binascii.Error, TypeError, ValueError):
+                            await transcriber.close()
+                            transcriber = None
+                            await send({"type": "error", "error": "Invalid audio data"})
+                            continue
+                        transcriber = await relay_audio(transcriber, chunk, send)
+                    else:
+                        await send({"type": "error", "error": "No open audio stream"})
+                elif message_type == "audio_end":
+                    if transcriber:
+                        await transcriber.finish()
+                        transcriber = None
+                    await send({"type": "audio_done"})
+                elif message_type == "pong":
+                    # Reply to a server ping; receiving it already marked the socket alive
+                    pass
                 elif message_type == "heartbeat":
                     # Respond to heartbeat
-                    await websocket.send_json({
+                    await send({
                         "type": "heartbeat",
                         "status": "alive"
                     })
@@ -86,23 +205,52 @@ async def websocket_endpoint(
                     logger.warning(f"Unknown message type: {message_type}")
 
         except WebSocketDisconnect:
-            await manager.disconnect(websocket, user.id)
-            await manager.broadcast_user_disconnect(user.id)
+            await manager.disconnect(websocket, user.user_id)
+            await manager.broadcast_user_disconnect(user.user_id)
         except Exception as e:
             logger.error(f"WebSocket error: {e}")
-            await manager.disconnect(websocket, user.id)
+            await manager.disconnect(websocket, user.user_id)
             await websocket.close(code=1011, reason="Internal server error")
+        finally:
+            if transcriber:
+                await transcriber.close()
 
     except Exception as e:
         logger.error(f"WebSocket connection error: {e}")
         await websocket.close(code=1011, reason="Internal server error")
 
+async def send_profile(websocket: WebSocket, command: dict):
+    """Run a sampling profile for an admin socket and send it when done
+
+    Takes the same bounds as GET /api/admin/profile: seconds > 0 and
+    interval_ms between 1 and 1000.
+    """
+    try:
+        seconds = float(command.get("seconds", 10))
+        interval_ms = float(command.get("interval_ms", 5))
+    except (TypeError, ValueError):
+        seconds = interval_ms = float("nan")
+    if not (seconds > 0 and 1 <= interval_ms <= 1000):
+        await manager.send(websocket, {"type": "error", "error": "Profile needs seconds > 0 and interval_ms 1-1000"})
+        return
+    try:
+        result = await profiler.run(seconds, interval=interval_ms / 1000)
+    except ProfilerBusy as e:
+        await manager.send(websocket, {"type": "error", "error": str(e)})
+        return
+    except Exception as e:
+        logger.error(f"Profile failed: {e}")
+        await manager.send(websocket, {"type": "error", "error": "Profile failed"})
+        return
+    profile_format = "collapsed" if command.get("format") == "collapsed" else "speedscope"
+    await manager.send(websocket, {
+        "type": "profile",
+        "format": profile_format,
+        "data": result.collapsed() if profile_format == "collapsed" else result.speedscope()
+    })
+
 @router.websocket("/ws/admin/{token}")
-async def admin_websocket_endpoint(
-    websocket: WebSocket,
-    token: str,
-    db: AsyncSession = Depends(get_db)
-):
+async def admin_websocket_endpoint(websocket: WebSocket, token: str):
     """Admin WebSocket endpoint for monitoring and management"""
     try:
         # Get auth session ID from query params
@@ -111,28 +259,33 @@ async def admin_websocket_endpoint(
             await websocket.close(code=4001, reason="Missing auth session")
             return
 
-        # Verify auth session
-        if not await verify_auth_session(db, auth_session_id):
+        # Verify token and auth session
+        user = await authenticate_websocket(token, auth_session_id)
+        if not user:
             await websocket.close(code=4001, reason="Invalid or expired session")
             return
-
-        # Get user from token
-        user = await get_user_from_token(token, db)
-        if not user or not user.is_admin:
+        if not user.is_admin:
             await websocket.close(code=4003, reason="Admin access required")
             return
 
-        await manager.connect_admin(websocket, user.id)
+        await manager.connect_admin(websocket, user.user_id)
+        # Profile being taken for this socket, sampled in the background so
+        # the socket keeps serving commands meanwhile
+        profile_task: Optional[asyncio.Task] = None
         try:
             while True:
                 data = await websocket.receive_text()
+                manager.touch(websocket)
                 try:
                     admin_data = json.loads(data)
+                    if admin_data.get("type") == "pong":
+                        # Reply to a server ping; receiving it already marked the socket alive
+                        continue
                     # Process admin commands
                     command = admin_data.get("command")
                     if command == "get_stats":
                         stats = manager.get_connection_stats()
-                        await websocket.send_json({
+                        await manager.send(websocket, {
                             "type": "stats",
                             "data": stats
                         })
@@ -140,16 +293,24 @@ async def admin_websocket_endpoint(
                         await manager.broadcast_system_message(
                             admin_data.get("message", "")
                         )
+                    elif command == "profile":
+                        if profile_task is not None and not profile_task.done():
+                            await manager.send(websocket, {"type": "error", "error": "A profile is already running"})
+                        else:
+                            profile_task = asyncio.create_task(send_profile(websocket, admin_data))
                     else:
                         logger.warning(f"Unknown admin command: {command}")
                 except json.JSONDecodeError:
                     logger.error(f"Invalid JSON in admin message: {data}")
         except WebSocketDisconnect:
-            await manager.disconnect_admin(websocket, user.id)
+            await manager.disconnect_admin(websocket, user.user_id)
         except Exception as e:
             logger.error(f"Admin WebSocket error: {e}")
-            await manager.disconnect_admin(websocket, user.id)
+            await manager.disconnect_admin(websocket, user.user_id)
             await websocket.close(code=1011, reason="Internal server error")
+        finally:
+            if profile_task is not None:
+                profile_task.cancel()
     except Exception as e:
         logger.error(f"Admin WebSocket connection error: {e}")
         await websocket.close(code=1011, reason="Internal server error")
@@ -0,0 +1,74 @@
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """Local embedding: hashed character trigrams and words, L2-normalized
+
+    No model is involved; similar wording yields similar vectors, which is
+    what matching near-identical prompts needs.
+    """
+    padded = f" {text} "
+    features = [padded[i:i + 3] for i in range(len(padded) - 2)] + text.split()
+    buckets = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) % dim for feature in features),
+        dtype=np.int64,
+        count=len(features)
+    )
+    vector = np.bincount(buckets, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticIndex:
+    """Fixed-capacity matrix of unit vectors searched by cosine similarity
+
+    Each row (slot) belongs to one key and one namespace; a search scores
+    the rows of its namespace with a single matrix-vector product.
+    """
+
+    def __init__(self, capacity: int, dim: int):
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        # Namespace id per slot; -1 marks a free slot
+        self.namespaces = np.full(capacity, -1, dtype=np.int64)
+        self.keys: List[Optional[Hashable]] = [None] * capacity
+        self._slots: Dict[Hashable, int] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._namespace_ids: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, namespace: Hashable, key: Hashable, text: str) -> bool:
+        """Index text under key; returns False when the index is full"""
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                return False
+            slot = self._free.pop()
+            self._slots[key] = slot
+        self.vectors[slot] = embed_text(text, self.dim)
+        self.namespaces[slot] = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+        self.keys[slot] = key
+        return True
+
+    def remove(self, key: Hashable):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self.namespaces[slot] = -1
+            self.keys[slot] = None
+            self._free.append(slot)
+
+    def search(self, namespace: Hashable, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Most similar key in the namespace and its cosine similarity"""
+        namespace_id = self._namespace_ids.get(namespace)
+        if namespace_id is None:
+            return None
+        # Score every row in one product (cheaper than gathering the
+        # namespace's rows first), then rule out the other namespaces
+        scores = self.vectors @ embed_text(text, self.dim)
+        scores[self.namespaces != namespace_id] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] == -np.inf:
+            return None
+        return self.keys[best], float(scores[best])
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+from .config import DEEPGRAM_API_KEY, DEEPGRAM_STREAM_URL
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+TranscriptCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class StreamingTranscriber:
+    """Relay audio frames to Deepgram's live endpoint and report transcripts
+
+    Every Results message from the provider is handed to `on_transcript` as
+    {"type": "transcript", "text", "is_final", "speech_final"}. Interim results
+    (is_final false) may be revised by later ones.
+    """
+
+    def __init__(
+        self,
+        http: "aiohttp.ClientSession",
+        on_transcript: TranscriptCallback,
+        encoding: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        language: str = "en",
+        url: Optional[str] = None
+    ):
+        self.http = http
+        self.on_transcript = on_transcript
+        self.url = url or DEEPGRAM_STREAM_URL
+        self.params = {
+            "model": "general",
+            "punctuate": "true",
+            "interim_results": "true",
+            "language": language
+        }
+        # Containerized audio (webm/ogg) is self-describing; raw PCM is not
+        if encoding:
+            self.params["encoding"] = encoding
+        if sample_rate:
+            self.params["sample_rate"] = str(sample_rate)
+        self._ws: Optional["aiohttp.ClientWebSocketResponse"] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Open the provider stream"""
+        self._ws = await self.http.ws_connect(
+            self.url,
+            params=self.params,
+            headers={"Authorization": f"Token {DEEPGRAM_API_KEY}"},
+            heartbeat=10
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def send_audio(self, chunk: bytes):
+        """Forward one audio frame"""
+        if self._ws is None or self._ws.closed:
+            raise RuntimeError("Transcription stream is not open")
+        await self._ws.send_bytes(chunk)
+
+    async def finish(self, timeout: float = 10.0):
+        """Flush remaining audio and wait for the final transcripts"""
+        if self._ws is None:
+            return
+        try:
+            if not self._ws.closed:
+                await self._ws.send_str(json.dumps({"type": "CloseStream"}))
+            if self._reader:
+                await asyncio.wait_for(self._reader, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for final transcripts")
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Tear down the provider stream without waiting for results"""
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+
+    async def _read(self):
+        import aiohttp
+        async for message in self._ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            if data.get("type") != "Results":
+                continue
+            alternatives = data.get("channel", {}).get("alternatives") or [{}]
+            text = alternatives[0].get("transcript", "")
+            is_final = bool(data.get("is_final"))
+            if not text and not is_final:
+                continue
+            try:
+                await self.on_transcript({
+                    "type": "transcript",
+                    "text": text,
+                    "is_final": is_final,
+                    "speech_final": bool(data.get("speech_final"))
+                })
+            except Exception as e:
+                logger.error(f"Error delivering transcript: {e}")
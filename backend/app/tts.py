@@ -0,0 +1,75 @@
+import logging
+from typing import TYPE_CHECKING, AsyncIterator
+from .config import OPENAI_API_KEY, OPENAI_API_BASE, DEFAULT_SPEECH_MODEL
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Response formats supported by the speech API and the media type of each
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "pcm": "audio/pcm"
+}
+
+class TTSError(Exception):
+    """Raised when the speech provider rejects or fails a request"""
+
+async def open_speech_stream(
+    http: "aiohttp.ClientSession",
+    text: str,
+    voice: str,
+    speed: float = 1.0,
+    model: str = DEFAULT_SPEECH_MODEL,
+    response_format: str = "wav"
+) -> "aiohttp.ClientResponse":
+    """Start a speech request and return the provider response once headers arrive
+
+    The caller owns the response and must release it, normally by draining
+    it through iter_speech_chunks.
+    """
+    response = await http.post(
+        f"{OPENAI_API_BASE}/audio/speech",
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+        json={
+            "model": model,
+            "voice": voice,
+            "input": text,
+            "speed": speed,
+            "response_format": response_format
+        }
+    )
+    if response.status != 200:
+        error_detail = await response.text()
+        response.release()
+        logger.error(f"TTS provider error: {error_detail}")
+        raise TTSError(error_detail)
+    return response
+
+async def iter_speech_chunks(response: "aiohttp.ClientResponse") -> AsyncIterator[bytes]:
+    """Yield audio chunks as the provider sends them, then release the connection"""
+    try:
+        async for chunk in response.content.iter_any():
+            yield chunk
+    finally:
+        response.release()
+
+async def synthesize_speech(
+    http: "aiohttp.ClientSession",
+    text: str,
+    voice: str,
+    speed: float = 1.0,
+    model: str = DEFAULT_SPEECH_MODEL,
+    response_format: str = "wav"
+) -> bytes:
+    """Synthesize speech and return the complete audio"""
+    response = await open_speech_stream(http, text, voice, speed, model, response_format)
+    try:
+        return await response.read()
+    finally:
+        response.release()
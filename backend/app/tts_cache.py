@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+from .config import TTS_CACHE_ENABLED, TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+class TTSCache:
+    """Disk-backed, content-addressed cache of synthesized audio
+
+    Files are named by the hash of everything that affects the audio. An
+    in-memory index (key -> size, least recently used first) is rebuilt from
+    the directory on first use and drives eviction once the total size
+    exceeds max_bytes. Writes go to a temp file and are renamed into place,
+    so readers never see partial audio.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, enabled: bool = True):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(text: str, voice: str, model: str, speed: float, response_format: str) -> str:
+        """Content address of a synthesis request"""
+        payload = json.dumps([text, voice, model, round(speed, 3), response_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    async def _load(self):
+        """Rebuild the index from disk, oldest modification first"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            entries = await asyncio.to_thread(self._scan, self.directory)
+            for _, key, size in entries:
+                self._index[key] = size
+                self._total_bytes += size
+            self._loaded = True
+        await self._evict()
+
+    @staticmethod
+    def _scan(directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in directory.glob("??/*"):
+            if path.name.startswith("."):
+                continue  # leftover temp file from an interrupted write
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        return sorted(entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio and mark it recently used, or None"""
+        if not self.enabled:
+            return None
+        await self._load()
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            # Persist recency so the LRU order survives restarts
+            await asyncio.to_thread(os.utime, path)
+        except FileNotFoundError:
+            self._forget(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        self.bytes_saved += len(data)
+        return data
+
+    async def put(self, key: str, data: bytes):
+        """Store audio atomically, evicting least recently used entries if needed"""
+        if not self.enabled or not data or len(data) > self.max_bytes:
+            return
+        await self._load()
+        try:
+            await asyncio.to_thread(self._write, self._path(key), data)
+        except OSError as e:
+            logger.error(f"Error writing TTS cache entry {key}: {e}")
+            return
+        self._forget(key)
+        self._index[key] = len(data)
+        self._total_bytes += len(data)
+        await self._evict()
+
+    async def tee(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass chunks through and cache the audio once the stream completes"""
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        # Only reached when the stream was fully consumed
+        await self.put(key, b"".join(parts))
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _forget(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    async def _evict(self):
+        paths = []
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            paths.append(self._path(key))
+        if paths:
+            await asyncio.to_thread(self._unlink, paths)
+
+    @staticmethod
+    def _unlink(paths):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit ratio and bytes saved for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions
+        }
+
+# Create a global instance of the TTS cache
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, enabled=TTS_CACHE_ENABLED)
@@ -1,60 +1,398 @@
 from fastapi import WebSocket
-from typing import Dict, Set, Optional
+from typing import Callable, Dict, Iterable, List, Set, Optional, Tuple, Union
+import asyncio
+import heapq
+import itertools
 import logging
 import json
+import time
+import uuid
 from datetime import datetime
+from .broker import Broker, InProcessBroker, create_broker
+from .metrics import metrics
+from .ws_protocol import BINARY_SUBPROTOCOL, binary_message, encode_message
+from .config import (
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT,
+    WS_SLOW_CONSUMER_POLICY,
+    WS_BROKER_URL,
+    WS_HEARTBEAT_INTERVAL,
+    WS_IDLE_TIMEOUT
+)
 
 logger = logging.getLogger(__name__)
 
+WS_MESSAGES = metrics.counter("ws_messages_total", "Websocket messages received and queued for sending", ("direction",))
+WS_EVICTIONS = metrics.counter("ws_evictions_total", "Sockets closed by the server", ("reason",))
+
+# Close code sent to consumers that cannot keep up
+SLOW_CONSUMER_CLOSE_CODE = 1008
+# Close code sent to sockets reaped for inactivity ("going away")
+IDLE_CLOSE_CODE = 1001
+
+class Outbound:
+    """Bounded send queue of one socket, drained by its own writer task"""
+
+    __slots__ = ("websocket", "user_id", "admin", "binary", "queue", "task", "dropped", "rooms", "last_seen", "pinged")
+
+    def __init__(self, websocket: WebSocket, user_id: int, admin: bool, binary: bool = False):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.admin = admin
+        # Negotiated frame format: binary frames instead of JSON text
+        self.binary = binary
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        # Rooms this socket has joined, so leaving them all is O(memberships)
+        self.rooms: Set[str] = set()
+        # Monotonic time of the last message from the client
+        self.last_seen = time.monotonic()
+        self.pinged = False
+
+# Broker channels: one per user and per room with local sockets, plus
+# one for admin monitors, one for system-wide broadcasts and one for
+# evicting keys from per-worker caches
+ALL_CHANNEL = "all"
+ADMINS_CHANNEL = "admins"
+INVALIDATE_CHANNEL = "invalidate"
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def room_channel(room) -> str:
+    return f"room:{room}"
+
 class ConnectionManager:
-    def __init__(self):
+    """Websocket connections of this worker
+
+    Every send is published on a broker channel; each worker delivers it to
+    its own sockets on that channel, so users connected to different workers
+    still reach each other.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.broker = broker or InProcessBroker()
+        self.broker.bind(self._on_broker_message)
+        self.broker.subscribe(ALL_CHANNEL)
+        self.broker.subscribe(INVALIDATE_CHANNEL)
+        # Per-worker caches kept coherent over the broker: name -> evict(key)
+        self._invalidators: Dict[str, Callable[[str], object]] = {}
         # Regular user connections: user_id -> Set[WebSocket]
         self.active_connections: Dict[int, Set[WebSocket]] = {}
         # Admin connections: user_id -> Set[WebSocket]
         self.admin_connections: Dict[int, Set[WebSocket]] = {}
-        # Last activity timestamp for each connection
-        self.last_activity: Dict[WebSocket, datetime] = {}
+        # Outbound queue for each connection
+        self.outbound: Dict[WebSocket, Outbound] = {}
+        # Chat session rooms: session_id -> Set[WebSocket]
+        self.rooms: Dict[str, Set[WebSocket]] = {}
+        # Background closes of evicted sockets
+        self._closing: Set[asyncio.Task] = set()
+        self.messages_dropped = 0
+        self.slow_consumers_evicted = 0
+        # Liveness checks: (due time, tiebreak, socket), at most one entry per socket
+        self._deadlines: List[Tuple[float, int, WebSocket]] = []
+        self._tiebreak = itertools.count()
+        self._reaper: Optional[asyncio.Task] = None
+        self.pings_sent = 0
+        self.idle_reaped = 0
+
+    async def start(self, broker_url: Optional[str] = WS_BROKER_URL):
+        """Start the idle reaper and switch to the configured broker; called from app startup"""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_forever())
+        broker = create_broker(broker_url)
+        if isinstance(broker, InProcessBroker) and isinstance(self.broker, InProcessBroker):
+            return
+        broker.bind(self._on_broker_message)
+        for channel in self.broker.channels:
+            broker.subscribe(channel)
+        await broker.start()
+        old, self.broker = self.broker, broker
+        await old.close()
+        logger.info(f"Websocket broker started: {type(broker).__name__}")
+
+    async def close(self):
+        """Stop the reaper and disconnect from the broker; called from app shutdown"""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        await self.broker.close()
 
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def connect(self, websocket: WebSocket, user_id: int, subprotocol: Optional[str] = None):
         """Connect a regular user"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
+            self.broker.subscribe(user_channel(user_id))
         self.active_connections[user_id].add(websocket)
-        self.last_activity[websocket] = datetime.utcnow()
+        self._register(websocket, user_id, admin=False, binary=subprotocol == BINARY_SUBPROTOCOL)
         logger.info(f"User {user_id} connected. Active connections: {len(self.active_connections)}")
 
-    async def connect_admin(self, websocket: WebSocket, user_id: int):
+    async def connect_admin(self, websocket: WebSocket, user_id: int, subprotocol: Optional[str] = None):
         """Connect an admin user"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
+        if not self.admin_connections:
+            self.broker.subscribe(ADMINS_CHANNEL)
         if user_id not in self.admin_connections:
             self.admin_connections[user_id] = set()
         self.admin_connections[user_id].add(websocket)
-        self.last_activity[websocket] = datetime.utcnow()
+        self._register(websocket, user_id, admin=True, binary=subprotocol == BINARY_SUBPROTOCOL)
         logger.info(f"Admin {user_id} connected. Active admin connections: {len(self.admin_connections)}")
 
     async def disconnect(self, websocket: WebSocket, user_id: int):
         """Disconnect a regular user"""
-        if user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-        if websocket in self.last_activity:
-            del self.last_activity[websocket]
+        self._unregister(websocket, user_id, admin=False)
         logger.info(f"User {user_id} disconnected. Active connections: {len(self.active_connections)}")
 
     async def disconnect_admin(self, websocket: WebSocket, user_id: int):
         """Disconnect an admin user"""
-        if user_id in self.admin_connections:
-            self.admin_connections[user_id].discard(websocket)
-            if not self.admin_connections[user_id]:
-                del self.admin_connections[user_id]
-        if websocket in self.last_activity:
-            del self.last_activity[websocket]
+        self._unregister(websocket, user_id, admin=True)
         logger.info(f"Admin {user_id} disconnected. Active admin connections: {len(self.admin_connections)}")
 
-    async def broadcast_message(self, user_id: int, message: str, session_id: Optional[str] = None):
-        """Broadcast a message to all connected users in the same session"""
+    def _register(self, websocket: WebSocket, user_id: int, admin: bool, binary: bool = False):
+        outbound = Outbound(websocket, user_id, admin, binary)
+        outbound.task = asyncio.create_task(self._writer(outbound))
+        self.outbound[websocket] = outbound
+        self._schedule(websocket, outbound.last_seen + WS_HEARTBEAT_INTERVAL)
+
+    def _unregister(self, websocket: WebSocket, user_id: int, admin: bool):
+        connections = self.admin_connections if admin else self.active_connections
+        if user_id in connections:
+            connections[user_id].discard(websocket)
+            if not connections[user_id]:
+                del connections[user_id]
+                if not admin:
+                    self.broker.unsubscribe(user_channel(user_id))
+                elif not connections:
+                    self.broker.unsubscribe(ADMINS_CHANNEL)
+        outbound = self.outbound.pop(websocket, None)
+        if outbound is None:
+            return
+        for room in outbound.rooms:
+            self._discard_member(room, websocket)
+        if outbound.task and outbound.task is not asyncio.current_task():
+            outbound.task.cancel()
+
+    def _discard_member(self, room: str, websocket: WebSocket):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(websocket)
+            if not members:
+                del self.rooms[room]
+                self.broker.unsubscribe(room_channel(room))
+
+    def join_room(self, websocket: WebSocket, session_id) -> bool:
+        """Add a connected socket to a chat session's room"""
+        outbound = self.outbound.get(websocket)
+        if outbound is None:
+            return False
+        room = str(session_id)
+        if room not in self.rooms:
+            self.rooms[room] = set()
+            self.broker.subscribe(room_channel(room))
+        self.rooms[room].add(websocket)
+        outbound.rooms.add(room)
+        return True
+
+    def leave_room(self, websocket: WebSocket, session_id):
+        """Remove a socket from a chat session's room"""
+        room = str(session_id)
+        outbound = self.outbound.get(websocket)
+        if outbound is not None:
+            outbound.rooms.discard(room)
+        self._discard_member(room, websocket)
+
+    def in_room(self, websocket: WebSocket, session_id) -> bool:
+        """Check whether a socket has joined a chat session's room"""
+        return websocket in self.rooms.get(str(session_id), ())
+
+    async def _writer(self, outbound: Outbound):
+        """Send queued payloads in order; evict the socket if a send stalls"""
+        websocket = outbound.websocket
+        while True:
+            frame = await outbound.queue.get()
+            try:
+                if isinstance(frame, bytes):
+                    await asyncio.wait_for(websocket.send_bytes(frame), WS_SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(websocket.send_text(frame), WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Send to user {outbound.user_id} timed out; evicting")
+                self.slow_consumers_evicted += 1
+                self._evict(outbound, "Send timed out")
+                return
+            except Exception as e:
+                logger.error(f"Error sending message to user {outbound.user_id}: {e}")
+                self._unregister(websocket, outbound.user_id, outbound.admin)
+                return
+
+    def _evict(self, outbound: Outbound, reason: str, code: int = SLOW_CONSUMER_CLOSE_CODE):
+        """Drop a socket's state now and close it in the background"""
+        WS_EVICTIONS.inc(reason)
+        self._unregister(outbound.websocket, outbound.user_id, outbound.admin)
+        task = asyncio.create_task(self._close(outbound.websocket, reason, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, reason: str, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), WS_SEND_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Error closing evicted socket: {e}")
+
+    def touch(self, websocket: WebSocket):
+        """Record that the client sent something; O(1), the heap is fixed up lazily"""
+        WS_MESSAGES.inc("in")
+        outbound = self.outbound.get(websocket)
+        if outbound is not None:
+            outbound.last_seen = time.monotonic()
+            outbound.pinged = False
+
+    def _schedule(self, websocket: WebSocket, due: float):
+        heapq.heappush(self._deadlines, (due, next(self._tiebreak), websocket))
+
+    def reap_idle(self, now: Optional[float] = None) -> int:
+        """Ping quiet sockets and close those idle past WS_IDLE_TIMEOUT
+
+        Only heap entries that are due are visited. An entry made stale by
+        later activity is pushed back with the socket's real due time, so
+        each socket keeps a single entry and active sockets are never pinged.
+        Returns the number of sockets reaped.
+        """
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, websocket = heapq.heappop(self._deadlines)
+            outbound = self.outbound.get(websocket)
+            if outbound is None:
+                continue  # already disconnected
+            idle = now - outbound.last_seen
+            if idle >= WS_IDLE_TIMEOUT:
+                logger.info(f"Reaping socket of user {outbound.user_id} idle for {idle:.0f}s")
+                self.idle_reaped += 1
+                reaped += 1
+                self._evict(outbound, "Idle timeout", IDLE_CLOSE_CODE)
+            elif idle >= WS_HEARTBEAT_INTERVAL:
+                if not outbound.pinged:
+                    outbound.pinged = True
+                    self.pings_sent += 1
+                    self._enqueue(outbound, encode_message({"type": "ping"}, outbound.binary))
+                self._schedule(websocket, outbound.last_seen + WS_IDLE_TIMEOUT)
+            else:
+                self._schedule(websocket, outbound.last_seen + WS_HEARTBEAT_INTERVAL)
+        return reaped
+
+    async def _reap_forever(self):
+        while True:
+            now = time.monotonic()
+            # Sockets registered meanwhile are due no earlier than one interval out
+            wait = WS_HEARTBEAT_INTERVAL
+            if self._deadlines:
+                wait = min(wait, max(0.0, self._deadlines[0][0] - now))
+            await asyncio.sleep(wait)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"Error reaping idle sockets: {e}")
+
+    def _enqueue(self, outbound: Outbound, frame: Union[str, bytes]):
+        try:
+            outbound.queue.put_nowait(frame)
+            WS_MESSAGES.inc("out")
+        except asyncio.QueueFull:
+            if WS_SLOW_CONSUMER_POLICY == "drop":
+                outbound.dropped += 1
+                self.messages_dropped += 1
+            else:
+                logger.warning(f"Send queue of user {outbound.user_id} is full; evicting")
+                self.slow_consumers_evicted += 1
+                self._evict(outbound, "Send queue full")
+
+    def _fanout(self, text: str, connection_sets: Iterable[Set[WebSocket]], exclude: Optional[int] = None):
+        """Queue an already serialized payload on every given connection
+
+        Returns without waiting for delivery; a slow socket only ever
+        delays its own queue.
+        """
+        # Snapshot first: evictions during the loop mutate the registries
+        targets = [websocket for connections in connection_sets for websocket in connections]
+        frame = None
+        for websocket in targets:
+            outbound = self.outbound.get(websocket)
+            if outbound is None or id(websocket) == exclude:
+                continue
+            if outbound.binary:
+                # Encoded (and compressed) once for all binary sockets
+                if frame is None:
+                    frame = binary_message(text)
+                self._enqueue(outbound, frame)
+            else:
+                self._enqueue(outbound, text)
+
+    async def send(self, websocket: WebSocket, data: dict):
+        """Send a message to one socket, in order with everything queued for it"""
+        outbound = self.outbound.get(websocket)
+        if outbound is not None:
+            self._enqueue(outbound, encode_message(data, outbound.binary))
+
+    async def _publish(self, channel: str, data: dict, exclude: Optional[WebSocket] = None):
+        """Serialize once and publish; the first line names a socket to skip"""
+        header = f"{self.worker_id}:{id(exclude)}" if exclude is not None else ""
+        await self.broker.publish(channel, f"{header}\n{json.dumps(data, default=str)}")
+
+    def on_invalidate(self, cache: str, invalidate: Callable[[str], object]):
+        """Register how this worker evicts a key from the cache named `cache`"""
+        self._invalidators[cache] = invalidate
+
+    async def publish_invalidation(self, cache: str, key: str):
+        """Evict a key from a per-worker cache on every worker, this one included"""
+        await self._publish(INVALIDATE_CHANNEL, {"cache": cache, "key": key})
+
+    def _on_broker_message(self, channel: str, message: str):
+        """Deliver a published payload to this worker's sockets on the channel"""
+        header, _, text = message.partition("\n")
+        if channel == INVALIDATE_CHANNEL:
+            data = json.loads(text)
+            invalidate = self._invalidators.get(data["cache"])
+            if invalidate is not None:
+                invalidate(data["key"])
+            return
+        exclude = None
+        if header:
+            worker_id, _, socket_id = header.partition(":")
+            if worker_id == self.worker_id:
+                exclude = int(socket_id)
+
+        kind, _, key = channel.partition(":")
+        if kind == "user":
+            targets = [self.active_connections.get(int(key), ())]
+        elif kind == "room":
+            targets = [self.rooms.get(key, ())]
+        elif channel == ADMINS_CHANNEL:
+            targets = list(self.admin_connections.values())
+        elif channel == ALL_CHANNEL:
+            targets = [*self.active_connections.values(), *self.admin_connections.values()]
+        else:
+            return
+        self._fanout(text, targets, exclude)
+
+    async def send_to_user(self, user_id: int, data: dict):
+        """Send a message to every connection of a single user"""
+        await self._publish(user_channel(user_id), data)
+
+    async def send_to_room(self, session_id, data: dict, exclude: Optional[WebSocket] = None):
+        """Send a message to every socket in a chat session's room"""
+        await self._publish(room_channel(session_id), data, exclude)
+
+    async def broadcast_message(self, user_id: int, message: str, session_id: Optional[str] = None,
+                                to_room: bool = True):
+        """Broadcast a message to the session's room, or only to the sender without one
+
+        With to_room=False the message keeps its session_id but only reaches
+        the sender's own sockets. Admin monitors receive every message.
+        """
         try:
             data = {
                 "type": "message",
@@ -63,27 +401,11 @@ class ConnectionManager:
                 "session_id": session_id,
                 "timestamp": datetime.utcnow().isoformat()
             }
-            
-            # Send to all users in the session
-            for uid, connections in self.active_connections.items():
-                for connection in connections:
-                    try:
-                        await connection.send_json(data)
-                        self.last_activity[connection] = datetime.utcnow()
-                    except Exception as e:
-                        logger.error(f"Error sending message to user {uid}: {e}")
-                        await self.disconnect(connection, uid)
-
-            # Send to all admin connections
-            for uid, connections in self.admin_connections.items():
-                for connection in connections:
-                    try:
-                        await connection.send_json(data)
-                        self.last_activity[connection] = datetime.utcnow()
-                    except Exception as e:
-                        logger.error(f"Error sending message to admin {uid}: {e}")
-                        await self.disconnect_admin(connection, uid)
-
+            if session_id is not None and to_room:
+                await self._publish(room_channel(session_id), data)
+            else:
+                await self._publish(user_channel(user_id), data)
+            await self._publish(ADMINS_CHANNEL, data)
         except Exception as e:
             logger.error(f"Error broadcasting message: {e}")
 
@@ -94,26 +416,7 @@ class ConnectionManager:
             "content": message,
             "timestamp": datetime.utcnow().isoformat()
         }
-        
-        # Send to all regular users
-        for user_id, connections in self.active_connections.items():
-            for connection in connections:
-                try:
-                    await connection.send_json(data)
-                    self.last_activity[connection] = datetime.utcnow()
-                except Exception as e:
-                    logger.error(f"Error sending system message to user {user_id}: {e}")
-                    await self.disconnect(connection, user_id)
-
-        # Send to all admins
-        for user_id, connections in self.admin_connections.items():
-            for connection in connections:
-                try:
-                    await connection.send_json(data)
-                    self.last_activity[connection] = datetime.utcnow()
-                except Exception as e:
-                    logger.error(f"Error sending system message to admin {user_id}: {e}")
-                    await self.disconnect_admin(connection, user_id)
+        await self._publish(ALL_CHANNEL, data)
 
     async def broadcast_user_disconnect(self, user_id: int):
         """Broadcast user disconnect event to admins"""
@@ -122,15 +425,7 @@ class ConnectionManager:
             "user_id": user_id,
             "timestamp": datetime.utcnow().isoformat()
         }
-        
-        for admin_id, connections in self.admin_connections.items():
-            for connection in connections:
-                try:
-                    await connection.send_json(data)
-                    self.last_activity[connection] = datetime.utcnow()
-                except Exception as e:
-                    logger.error(f"Error sending disconnect event to admin {admin_id}: {e}")
-                    await self.disconnect_admin(connection, admin_id)
+        await self._publish(ADMINS_CHANNEL, data)
 
     def get_connection_stats(self):
         """Get statistics about current connections"""
@@ -138,7 +433,7 @@ class ConnectionManager:
             "users": {
                 "total": len(self.active_connections),
                 "connections": {
-                    user_id: len(connections) 
+                    user_id: len(connections)
                     for user_id, connections in self.active_connections.items()
                 }
             },
@@ -148,8 +443,31 @@ class ConnectionManager:
                     user_id: len(connections)
                     for user_id, connections in self.admin_connections.items()
                 }
+            },
+            "rooms": {
+                "total": len(self.rooms),
+                "members": sum(len(members) for members in self.rooms.values())
+            },
+            "broker": {
+                "backend": type(self.broker).__name__,
+                "channels": len(self.broker.channels),
+                "publish_errors": self.broker.publish_errors
+            },
+            "heartbeat": {
+                "interval": WS_HEARTBEAT_INTERVAL,
+                "idle_timeout": WS_IDLE_TIMEOUT,
+                "pings_sent": self.pings_sent,
+                "reaped": self.idle_reaped,
+                "scheduled": len(self._deadlines)
+            },
+            "outbound": {
+                "queued": sum(outbound.queue.qsize() for outbound in self.outbound.values()),
+                "messages_dropped": self.messages_dropped,
+                "slow_consumers_evicted": self.slow_consumers_evicted
             }
         }
 
 # Create a global instance of the connection manager
 manager = ConnectionManager()
+
+metrics.gauge("ws_connections", "Open websocket connections on this worker", callback=lambda: len(manager.outbound))
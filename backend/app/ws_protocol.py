@@ -0,0 +1,99 @@
+"""Websocket frame formats
+
+Clients pick a format with the websocket subprotocol:
+
+- tutor.json.v1 (also the default when none is requested): JSON text
+  frames for messages; binary frames carry raw audio.
+- tutor.binary.v1: every frame is binary, a 2-byte header followed by the
+  payload. Header byte 0 is the frame kind (FRAME_MESSAGE with a UTF-8 JSON
+  payload, or FRAME_AUDIO with raw audio). Byte 1 holds flags; FLAG_DEFLATE
+  marks a zlib-compressed payload. The server compresses message payloads
+  above WS_COMPRESS_MIN_BYTES, so large history frames shrink while small
+  ones skip the CPU cost.
+"""
+import json
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+from .config import WS_COMPRESS_MIN_BYTES, WS_COMPRESS_LEVEL, WS_MAX_MESSAGE_SIZE
+
+JSON_SUBPROTOCOL = "tutor.json.v1"
+BINARY_SUBPROTOCOL = "tutor.binary.v1"
+
+FRAME_MESSAGE = 0x01
+FRAME_AUDIO = 0x02
+FLAG_DEFLATE = 0x01
+
+class FrameError(ValueError):
+    """Raised for frames that do not follow the negotiated format"""
+
+def negotiate(requested: Iterable[str]) -> Optional[str]:
+    """Pick the subprotocol to accept from the ones the client offered"""
+    for subprotocol in requested:
+        if subprotocol in (BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL):
+            return subprotocol
+    return None
+
+def encode_binary(kind: int, payload: bytes, compress: bool = False) -> bytes:
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, WS_COMPRESS_LEVEL)
+        flags |= FLAG_DEFLATE
+    return bytes((kind, flags)) + payload
+
+def binary_message(text: str) -> bytes:
+    """Binary frame for an already serialized JSON message"""
+    payload = text.encode("utf-8")
+    return encode_binary(FRAME_MESSAGE, payload, compress=len(payload) >= WS_COMPRESS_MIN_BYTES)
+
+def decode_binary(frame: bytes) -> Tuple[int, bytes]:
+    """Split a binary frame into (kind, payload), decompressing if flagged
+
+    Compressed payloads may inflate to at most WS_MAX_MESSAGE_SIZE bytes.
+    """
+    if len(frame) < 2:
+        raise FrameError("Frame shorter than its header")
+    kind, flags = frame[0], frame[1]
+    payload = frame[2:]
+    if flags & FLAG_DEFLATE:
+        decompressor = zlib.decompressobj()
+        try:
+            payload = decompressor.decompress(payload, WS_MAX_MESSAGE_SIZE)
+        except zlib.error as e:
+            raise FrameError(f"Invalid compressed payload: {e}")
+        if decompressor.unconsumed_tail:
+            raise FrameError(f"Payload inflates beyond {WS_MAX_MESSAGE_SIZE} bytes")
+    return kind, payload
+
+def encode_message(data: Dict[str, Any], binary: bool) -> Union[str, bytes]:
+    """Serialize a message for a socket in the given mode"""
+    text = json.dumps(data, default=str)
+    return binary_message(text) if binary else text
+
+def _load_message(payload: Union[str, bytes]) -> Dict[str, Any]:
+    try:
+        data = json.loads(payload)
+    except ValueError as e:
+        raise FrameError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise FrameError("Message is not a JSON object")
+    return data
+
+def decode_frame(message: Dict[str, Any], binary: bool) -> Tuple[Optional[Dict[str, Any]], Optional[bytes]]:
+    """Decode an ASGI websocket.receive event into (message, audio)
+
+    Exactly one side is set. Raises FrameError for frames that cannot be
+    decoded or whose message is not a JSON object.
+    """
+    raw = message.get("bytes")
+    if raw is None:
+        if binary:
+            raise FrameError("Text frame on a binary connection")
+        return _load_message(message.get("text") or ""), None
+    if not binary:
+        return None, raw
+    kind, payload = decode_binary(raw)
+    if kind == FRAME_MESSAGE:
+        return _load_message(payload), None
+    if kind == FRAME_AUDIO:
+        return None, payload
+    raise FrameError(f"Unknown frame kind {kind}")
@@ -0,0 +1,39 @@
+"""p50/p99 of /api/chat/sessions/active with the auth session cache on and off.
+
+Run from backend/:  python -m benchmarks.bench_auth_cache [requests]
+"""
+import asyncio
+import json
+import sys
+
+from benchmarks.common import Timer, make_client, percentiles, reset_schema, seed_user
+
+async def run(requests: int):
+    from app.auth import auth_session_cache
+    from app.database import engine
+
+    await reset_schema()
+    credentials = await seed_user()
+    results = {}
+
+    async with make_client(credentials) as client:
+        for label, enabled in (("cache_off", False), ("cache_on", True)):
+            auth_session_cache.enabled = enabled
+            auth_session_cache.clear()
+            # Warm up the connection pool (and the cache when enabled)
+            for _ in range(20):
+                await client.get("/api/chat/sessions/active")
+
+            samples = []
+            for _ in range(requests):
+                with Timer(samples):
+                    response = await client.get("/api/chat/sessions/active")
+                response.raise_for_status()
+            results[label] = percentiles(samples)
+
+    results["cache_stats"] = auth_session_cache.stats()
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
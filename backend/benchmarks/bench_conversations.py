@@ -0,0 +1,105 @@
+"""Round trips and latency of GET /api/chat/conversations on 1k sessions x 50 messages.
+
+Run from backend/:  python -m benchmarks.bench_conversations [sessions] [messages]
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, select
+
+from benchmarks.common import Timer, make_client, percentiles, reset_schema, seed_user
+
+async def seed(user_id: int, sessions: int, messages: int):
+    from app.database import async_session_maker
+    from app.models import ChatSession, ChatMessage
+
+    start = datetime(2024, 1, 1)
+    async with async_session_maker() as db:
+        await db.execute(insert(ChatSession), [
+            {"user_id": user_id, "start_time": start, "end_time": start} for _ in range(sessions)
+        ])
+        session_ids = (await db.execute(select(ChatSession.id))).scalars().all()
+        rows = [
+            {
+                "chat_session_id": session_id,
+                "user_id": user_id,
+                "content": f"message {m}",
+                "response": "reply",
+                "created_at": start + timedelta(seconds=m)
+            }
+            for session_id in session_ids
+            for m in range(messages)
+        ]
+        for offset in range(0, len(rows), 5000):
+            await db.execute(insert(ChatMessage), rows[offset:offset + 5000])
+        await db.commit()
+
+async def legacy_round_trips(user_id: int) -> int:
+    """Statement count of the old one-SELECT-per-session loop, for reference"""
+    from app.database import async_session_maker
+    from app.models import ChatSession, ChatMessage
+
+    async with async_session_maker() as db:
+        sessions = (await db.execute(
+            select(ChatSession).where(ChatSession.user_id == user_id)
+        )).scalars().all()
+        for session in sessions:
+            await db.execute(
+                select(ChatMessage)
+                .where(ChatMessage.chat_session_id == session.id)
+                .order_by(ChatMessage.created_at)
+            )
+    return 1 + len(sessions)
+
+async def run(sessions: int, messages: int):
+    from app.database import engine
+
+    await reset_schema()
+    credentials = await seed_user()
+    await seed(credentials["id"], sessions, messages)
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement)
+    )
+    results = {"sessions": sessions, "messages_per_session": messages, "pages": {}}
+
+    async with make_client(credentials) as client:
+        await client.get("/api/chat/sessions/active")  # warm the auth cache
+        for params in ({"limit": 10}, {"limit": 200}, {"limit": 200, "messages_limit": 5}):
+            samples = []
+            round_trips = []
+            for _ in range(20):
+                statements.clear()
+                with Timer(samples):
+                    response = await client.get("/api/chat/conversations", params=params)
+                response.raise_for_status()
+                round_trips.append(len(statements))
+            label = "&".join(f"{k}={v}" for k, v in params.items())
+            results["pages"][label] = {"round_trips": max(round_trips), **percentiles(samples)}
+
+        # Walk every conversation through the keyset cursor
+        statements.clear()
+        cursor, pages = None, 0
+        while True:
+            params = {"limit": 200, "messages_limit": 5}
+            if cursor:
+                params["before"] = cursor
+            response = await client.get("/api/chat/conversations", params=params)
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        results["full_walk"] = {"pages": pages, "round_trips": len(statements)}
+
+    results["legacy_n_plus_one_round_trips"] = await legacy_round_trips(credentials["id"])
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(run(*(args + [1000, 50][len(args):])))
@@ -0,0 +1,71 @@
+"""Time-to-first-token of a chat turn: SSE stream vs the buffered text endpoint.
+
+The fake provider waits 200 ms, then emits 50 tokens 20 ms apart.
+Run from backend/:  python -m benchmarks.bench_llm_stream [requests]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.common import percentiles, reset_schema, seed_user, serve_app
+from benchmarks import fake_upstream
+
+async def measure_sse(http, base, requests):
+    ttft, total = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with http.post(f"{base}/api/chat/stream", json={"prompt_text": "Hola"}) as response:
+            response.raise_for_status()
+            first = None
+            async for line in response.content:
+                if first is None and line.startswith(b"event: delta"):
+                    first = time.perf_counter() - start
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+    return {"ttft": percentiles(ttft), "total": percentiles(total)}
+
+async def measure_buffered(http, base, requests):
+    # Without streaming the first token is visible only with the whole reply
+    total = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with http.post(
+            f"{base}/api/multimedia/text/",
+            params={"include_response": "true"},
+            json={"prompt_text": "Hola", "agent_name": "default"}
+        ) as response:
+            response.raise_for_status()
+            await response.read()
+        total.append(time.perf_counter() - start)
+    return {"ttft": percentiles(total), "total": percentiles(total)}
+
+async def run(requests: int):
+    from app.database import engine
+    from app.llm import providers
+
+    await reset_schema()
+    credentials = await seed_user()
+    provider = await fake_upstream.start(fake_upstream.create_app())
+    providers.OPENAI_API_BASE = f"{provider['base']}/v1"
+    server, task, base = await serve_app()
+
+    async with aiohttp.ClientSession(
+        headers={"Authorization": f"Bearer {credentials['token']}"},
+        cookies={"auth_session_id": credentials["session_id"]}
+    ) as http:
+        results = {
+            "buffered_text_endpoint": await measure_buffered(http, base, requests),
+            "sse_stream": await measure_sse(http, base, requests)
+        }
+
+    server.should_exit = True
+    await task
+    await provider["runner"].cleanup()
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,285 @@
+"""End-to-end load test: mixed user workloads against a real server.
+
+Starts the API under uvicorn against the benchmark database (SQLite, or
+Postgres via BENCH_DATABASE_URL) with the LLM, STT and TTS providers
+replaced by the local fakes in fake_upstream. Each virtual user logs in,
+opens a chat session and a websocket, then runs weighted scenarios until
+the time is up:
+
+  login, create_session, text_turn (SSE, plus its time to first token),
+  history, ws_chat (round trip through the session room), tts, stt
+
+Reports throughput, errors and p50/p95/p99 per scenario as JSON together
+with the git commit. Pass an earlier report with --baseline to add the
+p95 change per scenario.
+Run from backend/:  python -m benchmarks.bench_load --users 20 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.common import BACKEND_DIR, Timer, percentiles, reset_schema, serve_app
+from benchmarks import fake_upstream
+
+PASSWORD = "load-test-password"
+
+# Relative frequency of each scenario in the mix
+SCENARIO_WEIGHTS = {
+    "login": 1,
+    "create_session": 1,
+    "text_turn": 4,
+    "history": 6,
+    "ws_chat": 6,
+    "tts": 2,
+    "stt": 2
+}
+
+PROMPTS = [f"How do I say '{word}' in Spanish?" for word in (
+    "house", "dog", "cat", "to eat", "to drink", "thank you", "please", "goodbye",
+    "good morning", "where is the station", "how much is it", "I am tired"
+)]
+PHRASES = ["¡Hola!", "Buenos días", "¿Cómo estás?", "Muy bien, gracias", "Hasta luego", "¿Dónde está el baño?"]
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def seed_users(count: int) -> List[str]:
+    """Create load-test users sharing one password hash (bcrypt is slow on purpose)"""
+    from app.auth import get_password_hash
+    from app.database import async_session_maker
+    from app.models import User
+
+    password_hash = get_password_hash(PASSWORD)
+    usernames = [f"load{i}" for i in range(count)]
+    async with async_session_maker() as db:
+        db.add_all([
+            User(username=name, email=f"{name}@example.com", password_hash=password_hash)
+            for name in usernames
+        ])
+        await db.commit()
+    return usernames
+
+class Recorder:
+    """Latency samples and errors per scenario"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def report(self, elapsed: float) -> Dict:
+        names = sorted(set(self.samples) | set(self.errors))
+        return {
+            name: {
+                "ok": len(self.samples[name]),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(self.samples[name]) / elapsed, 2),
+                **(percentiles(self.samples[name]) if self.samples[name] else {})
+            }
+            for name in names
+        }
+
+class VirtualUser:
+    def __init__(self, http: aiohttp.ClientSession, base: str, username: str, recorder: Recorder, rng: random.Random):
+        self.http = http
+        self.base = base
+        self.username = username
+        self.recorder = recorder
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.session_id = None
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.sent = 0
+
+    async def login(self):
+        async with self.http.post(
+            f"{self.base}/api/auth/login",
+            json={"username": self.username, "password": PASSWORD}
+        ) as response:
+            response.raise_for_status()
+            body = await response.json()
+        # The session cookie is marked secure, so it is sent by hand over plain HTTP
+        self.headers = {
+            "Authorization": f"Bearer {body['access_token']}",
+            "Cookie": f"auth_session_id={body['session_id']}"
+        }
+        return body
+
+    async def create_session(self):
+        async with self.http.post(f"{self.base}/api/chat/sessions", headers=self.headers) as response:
+            response.raise_for_status()
+            self.session_id = (await response.json())["session_id"]
+
+    async def text_turn(self):
+        start = time.perf_counter()
+        first = None
+        async with self.http.post(
+            f"{self.base}/api/chat/stream",
+            headers=self.headers,
+            json={"prompt_text": self.rng.choice(PROMPTS)}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if first is None and line.startswith(b"event: delta"):
+                    first = time.perf_counter() - start
+                if line.startswith(b"event: error"):
+                    raise RuntimeError("Turn ended with an error event")
+        if first is not None:
+            self.recorder.samples["text_turn_ttft"].append(first)
+
+    async def history(self):
+        async with self.http.get(
+            f"{self.base}/api/chat/sessions/{self.session_id}/messages",
+            headers=self.headers,
+            params={"since": 0}
+        ) as response:
+            response.raise_for_status()
+            await response.read()
+
+    async def open_socket(self):
+        token = self.headers["Authorization"].split(" ", 1)[1]
+        auth_session_id = self.headers["Cookie"].split("=", 1)[1]
+        self.ws = await self.http.ws_connect(
+            f"{self.base.replace('http', 'ws', 1)}/ws/{token}",
+            params={"session": auth_session_id}
+        )
+        await self.ws.send_json({"type": "join", "session_id": self.session_id})
+        await self._receive("joined")
+
+    async def ws_chat(self):
+        self.sent += 1
+        content = f"{self.username} message {self.sent}"
+        await self.ws.send_json({"type": "chat", "session_id": self.session_id, "content": content})
+        await self._receive("message", content)
+
+    async def _receive(self, message_type: str, content: Optional[str] = None, timeout: float = 10):
+        # Pushed frames (history updates, deltas) may arrive in between
+        while True:
+            data = await self.ws.receive_json(timeout=timeout)
+            if data.get("type") == message_type and (content is None or data.get("content") == content):
+                return data
+
+    async def tts(self):
+        async with self.http.post(
+            f"{self.base}/api/tts/synthesize/",
+            headers=self.headers,
+            params={"stream": "true"},
+            json={"text": self.rng.choice(PHRASES), "voice": "alloy"}
+        ) as response:
+            response.raise_for_status()
+            async for _ in response.content.iter_any():
+                pass
+
+    async def stt(self):
+        form = aiohttp.FormData()
+        form.add_field("audio", b"\0" * 32 * 1024, filename="speech.webm", content_type="audio/webm")
+        form.add_field("agent_name", "default")
+        async with self.http.post(
+            f"{self.base}/api/multimedia/deepgram_transcribe/",
+            headers=self.headers,
+            data=form
+        ) as response:
+            response.raise_for_status()
+            await response.json()
+
+    async def timed(self, name: str, scenario):
+        try:
+            with Timer(self.recorder.samples[name]):
+                await scenario()
+        except Exception:
+            # Failed calls count as errors, not as latency samples
+            self.recorder.samples[name].pop()
+            self.recorder.errors[name] += 1
+
+    async def run(self, deadline: float):
+        await self.timed("login", self.login)
+        await self.timed("create_session", self.create_session)
+        if self.session_id is None:
+            return
+        await self.open_socket()
+        names = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        try:
+            while time.perf_counter() < deadline:
+                name = self.rng.choices(names, weights)[0]
+                await self.timed(name, getattr(self, name))
+        finally:
+            await self.ws.close()
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    """p95 change per scenario against an earlier report, in percent"""
+    changes = {}
+    for name, stats in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {}).get("p95_ms")
+        if before and "p95_ms" in stats:
+            changes[name] = round((stats["p95_ms"] - before) / before * 100, 1)
+    return {"commit": baseline.get("commit"), "p95_change_pct": changes}
+
+async def run(users: int, duration: float, seed: int, baseline: Optional[Dict]):
+    from app import tts
+    from app.database import engine
+    from app.llm import providers
+    from app.routers import multimedia_router
+
+    await reset_schema()
+    usernames = await seed_users(users)
+    upstream = await fake_upstream.start(fake_upstream.create_app())
+    providers.OPENAI_API_BASE = f"{upstream['base']}/v1"
+    tts.OPENAI_API_BASE = f"{upstream['base']}/v1"
+    multimedia_router.DEEPGRAM_API_URL = f"{upstream['base']}/v1/listen"
+    server, task, base = await serve_app()
+
+    recorder = Recorder()
+    connector = aiohttp.TCPConnector(limit=users * 4)
+    async with aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar()) as http:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            VirtualUser(http, base, name, recorder, random.Random(seed + i)).run(deadline)
+            for i, name in enumerate(usernames)
+        ))
+        elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await task
+    await upstream["runner"].cleanup()
+    await engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "database": engine.url.get_backend_name(),
+        "users": users,
+        "duration_s": round(elapsed, 2),
+        "scenarios": recorder.report(elapsed)
+    }
+    report["total_rps"] = round(sum(
+        stats["ok"] for name, stats in report["scenarios"].items() if not name.endswith("_ttft")
+    ) / elapsed, 2)
+    if baseline:
+        report["baseline"] = compare(report, baseline)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    asyncio.run(run(args.users, args.duration, args.seed, baseline))
@@ -0,0 +1,107 @@
+"""Requests/sec on /health through the old decorator middlewares vs the ASGI one.
+
+Both apps have the same CORS layer and the real /health handler; only the
+request middleware differs. App loggers run at INFO into a null handler, so
+the logging work is paid without flooding the terminal.
+Run from backend/:  python -m benchmarks.bench_middleware [requests] [concurrency]
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from benchmarks.common import Timer, percentiles
+
+def legacy_app():
+    """The app's middleware stack before the ASGI rewrite"""
+    from fastapi import FastAPI, Request, HTTPException
+    from app.main import health_check
+
+    logger = logging.getLogger("app.main")
+    app = FastAPI()
+    add_cors(app)
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        logger.info(f"Request: {request.method} {request.url}")
+        try:
+            response = await call_next(request)
+            logger.info(f"Response status: {response.status_code}")
+            return response
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    @app.middleware("http")
+    async def auth_middleware(request: Request, call_next):
+        try:
+            response = await call_next(request)
+            if response.status_code == 401:
+                response.headers["X-Token-Expired"] = "true"
+            return response
+        except Exception as e:
+            logger.error(f"Auth middleware error: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    app.get("/health")(health_check)
+    return app
+
+def asgi_app():
+    from fastapi import FastAPI
+    from app.main import health_check
+    from app.middleware import RequestMiddleware
+
+    app = FastAPI()
+    add_cors(app)
+    app.add_middleware(RequestMiddleware)
+    app.get("/health")(health_check)
+    return app
+
+def add_cors(app):
+    from fastapi.middleware.cors import CORSMiddleware
+    from app.config import CORS_ORIGINS
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"]
+    )
+
+async def measure(app, requests: int, concurrency: int):
+    import httpx
+
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/health")
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                with Timer(samples):
+                    response = await client.get("/health", headers={"Origin": "http://localhost:3000"})
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"requests_per_sec": round(requests / elapsed, 1), "latency": percentiles(samples)}
+
+async def run(requests: int, concurrency: int):
+    root = logging.getLogger()
+    root.handlers = [logging.NullHandler()]
+    logging.getLogger("app").setLevel(logging.INFO)
+
+    results = {}
+    for label, factory in (("decorators", legacy_app), ("asgi", asgi_app)):
+        results[label] = await measure(factory(), requests, concurrency)
+    print(json.dumps({"requests": requests, "concurrency": concurrency, **results}, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    ))
@@ -0,0 +1,42 @@
+"""Lookup latency of the tutor response cache when full, exact tier vs similarity tier.
+
+Every entry shares one namespace, so each similarity lookup scores the
+whole matrix (the worst case).
+Run from backend/:  python -m benchmarks.bench_response_cache [entries] [lookups]
+"""
+import json
+import random
+import sys
+
+from benchmarks.common import Timer, percentiles
+
+WORDS = "hola adiós gracias por favor casa perro gato comer beber hablar tener ser estar ir venir".split()
+
+def prompt(rng: random.Random) -> str:
+    return "how do I say " + " ".join(rng.choices(WORDS, k=4)) + " in Spanish?"
+
+def run(entries: int, lookups: int):
+    from app.response_cache import ResponseCache
+
+    rng = random.Random(7)
+    prompts = [prompt(rng) for _ in range(entries)]
+    results = {}
+    for label, semantic in (("exact_only", False), ("with_similarity", True)):
+        cache = ResponseCache(maxsize=entries, ttl=3600, semantic=semantic, threshold=0.9)
+        for text in prompts:
+            cache.set(1, "tutor", "gpt-4o-mini", text, "respuesta")
+
+        hits, misses = [], []
+        for i in range(lookups):
+            with Timer(hits):
+                cache.get(1, "tutor", "gpt-4o-mini", prompts[i % entries])
+            with Timer(misses):
+                cache.get(1, "tutor", "gpt-4o-mini", f"conjugate verb number {i}")
+        results[label] = {"hit": percentiles(hits), "miss": percentiles(misses)}
+    print(json.dumps({"entries": entries, **results}, indent=2))
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    )
@@ -0,0 +1,115 @@
+"""Worker cold start: importing app.main and running its startup hooks.
+
+Each run is a fresh interpreter started with `python -X importtime`, once
+with every feature enabled and once with the optional routers (TTS,
+websocket) disabled. Reports the median import and startup time of each
+profile, the import time of the bare interpreter for reference, the
+self-time per top-level package from the importtime log and which of the
+deferred modules the import loaded.
+Run from backend/:  python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.common import BACKEND_DIR
+
+# Feature flags per profile, on top of the benchmark environment
+PROFILES = {
+    "all_features": {},
+    "core_only": {"ENABLE_TTS": "false", "ENABLE_WEBSOCKET": "false"}
+}
+
+# Modules kept out of the import of app.main: aiohttp is preloaded in the
+# background once the app starts, the routers only load with their feature
+LAZY_MODULES = ["aiohttp", "passlib", "numpy", "app.routers.tts_router", "app.routers.ws_router"]
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+loaded = [name for name in {lazy!r} if name in sys.modules]
+
+async def lifespan():
+    await app.main.app.router.startup()
+    started = time.perf_counter()
+    await app.main.app.router.shutdown()
+    # Pooled aiosqlite connections hold non-daemon threads
+    await app.database.engine.dispose()
+    return started
+
+started = asyncio.run(lifespan())
+print(json.dumps({{"import_s": imported - start, "startup_s": started - imported, "loaded": loaded}}))
+"""
+
+def parse_importtime(log: str) -> Dict[str, int]:
+    """Self time in microseconds per top-level package (app modules kept whole)
+
+    Stops at app.main: modules imported after it (startup, the background
+    aiohttp preload) are not part of the import.
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = name if name.startswith("app.") else name.split(".")[0]
+        totals[package] += int(self_us)
+        if name == "app.main":
+            break
+    return totals
+
+def run_once(code: str, env: Dict[str, str]) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    # The interpreter baseline prints nothing; app runs print their timings
+    report = json.loads(result.stdout) if result.stdout.strip() else {}
+    report["packages_us"] = parse_importtime(result.stderr)
+    return report
+
+def summarize(runs: List[Dict], top: int) -> Dict:
+    packages: Dict[str, List[int]] = defaultdict(list)
+    for run in runs:
+        for name, us in run["packages_us"].items():
+            packages[name].append(us)
+    medians = {name: statistics.median(values) for name, values in packages.items()}
+    return {
+        "import_ms": round(statistics.median(run["import_s"] for run in runs) * 1000, 1),
+        "startup_ms": round(statistics.median(run["startup_s"] for run in runs) * 1000, 1),
+        "top_packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(medians.items(), key=lambda item: -item[1])[:top]
+        },
+        "deferred_modules_imported": runs[-1]["loaded"]
+    }
+
+def main(runs: int, top: int):
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    baseline = [run_once("pass", env) for _ in range(runs)]
+    report = {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "interpreter_ms": round(statistics.median(
+            sum(run["packages_us"].values()) for run in baseline
+        ) / 1000, 1)
+    }
+    child = CHILD.format(lazy=LAZY_MODULES)
+    for name, flags in PROFILES.items():
+        report[name] = summarize([run_once(child, dict(env, **flags)) for _ in range(runs)], top)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="packages to list by import self-time")
+    args = parser.parse_args()
+    main(args.runs, args.top)
@@ -0,0 +1,51 @@
+"""Time-to-first-byte and payload size of /api/tts/synthesize/, streaming vs buffered.
+
+The fake provider emits 10 x 16 KiB chunks, 50 ms apart.
+Run from backend/:  python -m benchmarks.bench_tts_stream [requests]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.common import percentiles, serve_app
+from benchmarks import fake_upstream
+
+async def measure(http, url, params, requests):
+    ttfb, total, size = [], [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with http.post(url, params=params, json={"text": "hola", "voice": "alloy"}) as response:
+            response.raise_for_status()
+            first = await response.content.readany()
+            ttfb.append(time.perf_counter() - start)
+            rest = await response.read()
+            total.append(time.perf_counter() - start)
+            size = len(first) + len(rest)
+    return {"ttfb": percentiles(ttfb), "total": percentiles(total), "response_bytes": size}
+
+async def run(requests: int):
+    from app import tts
+    from app.database import engine
+
+    provider = await fake_upstream.start(fake_upstream.create_app())
+    tts.OPENAI_API_BASE = f"{provider['base']}/v1"
+    server, task, base = await serve_app()
+
+    url = f"{base}/api/tts/synthesize/"
+    async with aiohttp.ClientSession() as http:
+        results = {
+            "buffered_base64": await measure(http, url, {}, requests),
+            "streaming": await measure(http, url, {"stream": "true"}, requests)
+        }
+
+    server.should_exit = True
+    await task
+    await provider["runner"].cleanup()
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
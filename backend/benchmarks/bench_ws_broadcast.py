@@ -0,0 +1,90 @@
+"""Broadcast completion time across 5k simulated sockets, sequential vs queued fan-out.
+
+Each socket takes 1 ms per send (network write); in the queued run 1% of them
+stall for 2 s and get evicted. The sequential baseline runs without stalled
+sockets (each would add its full stall to every broadcast), so it is a lower bound.
+Run from backend/:  python -m benchmarks.bench_ws_broadcast [sockets] [broadcasts]
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from benchmarks.common import percentiles
+
+class SimulatedSocket:
+    def __init__(self, delay: float, on_receive):
+        self.delay = delay
+        self.on_receive = on_receive
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.on_receive()
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+def make_sockets(count: int, on_receive, stalled: bool = True):
+    return [
+        SimulatedSocket(2.0 if stalled and i % 100 == 0 else 0.001, on_receive)
+        for i in range(count)
+    ]
+
+async def sequential(count: int, broadcasts: int):
+    """The previous fan-out: serialize and await every socket in turn"""
+    samples = []
+    sockets = make_sockets(count, lambda: None, stalled=False)
+    for _ in range(broadcasts):
+        start = time.perf_counter()
+        for socket in sockets:
+            await socket.send_json({"type": "system", "content": "hola"})
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+async def queued(count: int, broadcasts: int):
+    from app import ws
+
+    ws.WS_SEND_TIMEOUT = 0.5
+    manager = ws.ConnectionManager()
+    received = 0
+    def on_receive():
+        nonlocal received
+        received += 1
+    sockets = make_sockets(count, on_receive)
+    for i, socket in enumerate(sockets):
+        await manager.connect(socket, user_id=i)
+
+    enqueue, complete = [], []
+    for _ in range(broadcasts):
+        healthy = len(manager.outbound) - sum(1 for s in manager.outbound if s.delay > 1)
+        target = received + healthy
+        start = time.perf_counter()
+        await manager.broadcast_system_message("hola")
+        enqueue.append(time.perf_counter() - start)
+        while received < target:
+            await asyncio.sleep(0.001)
+        complete.append(time.perf_counter() - start)
+
+    await asyncio.sleep(1)  # let the stalled sends time out
+    stats = manager.get_connection_stats()["outbound"]
+    for socket, outbound in list(manager.outbound.items()):
+        await manager.disconnect(socket, outbound.user_id)
+    return {"enqueue": percentiles(enqueue), "delivered_to_healthy": percentiles(complete), **stats}
+
+async def run(count: int, broadcasts: int):
+    logging.getLogger("app.ws").setLevel(logging.ERROR)
+    results = {"sockets": count, "broadcasts": broadcasts}
+    results["queued"] = await queued(count, broadcasts)
+    results["sequential_no_stalls"] = await sequential(count, 3)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(run(*(args + [5000, 20][len(args):])))
@@ -0,0 +1,84 @@
+"""Bytes on the wire and server CPU per 1k websocket messages, by frame format.
+
+Formats: the JSON text path; JSON text with permessage-deflate on every
+frame (as the websocket transport would apply it); and the binary framing,
+which compresses only payloads above WS_COMPRESS_MIN_BYTES.
+Run from backend/:  python -m benchmarks.bench_ws_protocol [messages]
+"""
+import base64
+import json
+import sys
+import time
+import zlib
+from datetime import datetime
+
+from benchmarks import common  # noqa: F401  (environment for app.config)
+
+def history_frame():
+    from app.database import history_delta_message
+
+    entries = [
+        (seq, f"¿Cómo se dice 'message {seq}' en español?", "Se dice 'mensaje'. " * 4, None, datetime(2024, 1, 1))
+        for seq in range(1, 51)
+    ]
+    return history_delta_message(12, entries, 0)
+
+def outgoing_json(messages, deflate):
+    compressor = zlib.compressobj(wbits=-15) if deflate else None
+    size = 0
+    start = time.process_time()
+    for data in messages:
+        frame = json.dumps(data, default=str).encode()
+        if compressor:
+            frame = compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        size += len(frame)
+    return size, time.process_time() - start
+
+def outgoing_binary(messages):
+    from app.ws_protocol import encode_message
+
+    size = 0
+    start = time.process_time()
+    for data in messages:
+        size += len(encode_message(data, binary=True))
+    return size, time.process_time() - start
+
+def incoming_audio_json(chunks):
+    frames = [json.dumps({"type": "audio_chunk", "data": base64.b64encode(c).decode()}) for c in chunks]
+    start = time.process_time()
+    for frame in frames:
+        base64.b64decode(json.loads(frame)["data"])
+    return sum(len(f) for f in frames), time.process_time() - start
+
+def incoming_audio_binary(chunks):
+    from app.ws_protocol import FRAME_AUDIO, decode_frame, encode_binary
+
+    frames = [encode_binary(FRAME_AUDIO, c) for c in chunks]
+    start = time.process_time()
+    for frame in frames:
+        decode_frame({"bytes": frame}, binary=True)
+    return sum(len(f) for f in frames), time.process_time() - start
+
+def report(size, cpu, count):
+    return {"bytes_per_1k": round(size * 1000 / count), "cpu_ms_per_1k": round(cpu * 1000 * 1000 / count, 3)}
+
+def run(count: int):
+    small = [{"type": "assistant_delta", "turn_id": "9f1c2b", "chat_session_id": 12, "delta": "¡Hola! "}] * count
+    history = [history_frame()] * count
+    audio = [bytes(range(256)) * 12 + bytes(128)] * count  # 100 ms of 16 kHz PCM
+
+    results = {}
+    for label, messages in (("small_events", small), ("history_frames", history)):
+        results[label] = {
+            "json": report(*outgoing_json(messages, deflate=False), count),
+            "json_permessage_deflate": report(*outgoing_json(messages, deflate=True), count),
+            "binary": report(*outgoing_binary(messages), count)
+        }
+    results["audio_chunks_in"] = {
+        "json_base64": report(*incoming_audio_json(audio), count),
+        "binary": report(*incoming_audio_binary(audio), count)
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,116 @@
+"""Shared helpers for the backend benchmarks.
+
+Import this module before anything from `app`: it points the app at a local
+SQLite database (unless BENCH_DATABASE_URL is set) and fills in dummy API keys
+so app startup validates without real credentials. The tutor response cache
+is off unless RESPONSE_CACHE_ENABLED is set.
+"""
+import os
+import sys
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+BENCH_DB_PATH = Path(tempfile.gettempdir()) / "language_tutor_bench.db"
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DB_PATH}")
+os.environ.setdefault("OPENAI_API_KEY", "bench-openai-key")
+os.environ.setdefault("DEEPGRAM_API_KEY", "bench-deepgram-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Measure the LLM streaming path, not repeated benchmark prompts served from cache
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as milliseconds"""
+    ordered = sorted(samples)
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3)
+    }
+
+class Timer:
+    """Context manager that appends the elapsed wall time to a list"""
+
+    def __init__(self, samples: List[float]):
+        self.samples = samples
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self.start)
+
+async def reset_schema():
+    """Drop and recreate all tables"""
+    from app.database import engine
+    from app.models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+async def seed_user(username: str = "bench") -> Dict:
+    """Create a user with a live auth session and return its credentials"""
+    from app.database import async_session_maker
+    from app.models import User, AuthSession
+    from app.routers.auth_router import create_access_token
+
+    async with async_session_maker() as db:
+        user = User(username=username, email=f"{username}@example.com", password_hash="not-used")
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+
+        token, _ = create_access_token(data={"user_id": user.id})
+        session_id = f"session_{user.id}_bench"
+        db.add(AuthSession(
+            id=session_id,
+            user_id=user.id,
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        ))
+        await db.commit()
+    return {"id": user.id, "token": token, "session_id": session_id}
+
+def make_client(credentials: Dict):
+    """In-process HTTP client authenticated with the given credentials"""
+    import httpx
+    from app.main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench",
+        headers={"Authorization": f"Bearer {credentials['token']}"},
+        cookies={"auth_session_id": credentials["session_id"]}
+    )
+
+async def serve_app(port: int = 0):
+    """Run the API under uvicorn in this event loop; returns (server, task, base URL)
+
+    A real server is needed wherever chunked transfer matters, since the
+    in-process ASGI transport buffers whole responses.
+    """
+    import asyncio
+    import socket
+    import uvicorn
+    from app.main import app
+
+    if port == 0:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task, f"http://127.0.0.1:{port}"
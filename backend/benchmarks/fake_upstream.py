@@ -0,0 +1,65 @@
+"""Local stand-ins for the upstream providers used by the benchmarks."""
+import asyncio
+import json
+from typing import Dict
+
+from aiohttp import web
+
+def create_app(
+    speech_chunks: int = 10,
+    speech_chunk_size: int = 16 * 1024,
+    speech_chunk_delay: float = 0.05,
+    completion_tokens: int = 50,
+    first_token_delay: float = 0.2,
+    token_delay: float = 0.02
+) -> web.Application:
+    """Fake provider app; audio and completion tokens are emitted with delays"""
+
+    async def speech(request):
+        await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        await response.prepare(request)
+        for _ in range(speech_chunks):
+            await asyncio.sleep(speech_chunk_delay)
+            await response.write(b"\0" * speech_chunk_size)
+        await response.write_eof()
+        return response
+
+    async def listen(request):
+        await request.read()
+        return web.json_response({
+            "results": {"channels": [{"alternatives": [{"transcript": "hola"}], "detected_language": "es"}]}
+        })
+
+    async def chat_completions(request):
+        body = await request.json()
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + token_delay * completion_tokens)
+            return web.json_response({
+                "choices": [{"message": {"role": "assistant", "content": "token " * completion_tokens}}]
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(first_token_delay)
+        for _ in range(completion_tokens):
+            event = {"choices": [{"delta": {"content": "token "}}]}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            await asyncio.sleep(token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/audio/speech", speech)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/listen", listen)
+    return app
+
+async def start(app: web.Application) -> Dict:
+    """Serve an app on a free local port; returns its base URL and runner"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return {"base": f"http://127.0.0.1:{port}", "runner": runner}
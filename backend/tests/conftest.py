@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+# Make `app` importable and point it at a throwaway SQLite database before
+# app.config is imported (it reads the environment at import time)
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+TEST_DB_PATH = Path(tempfile.gettempdir()) / "language_tutor_test.db"
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite+aiosqlite:///{TEST_DB_PATH}")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("DEEPGRAM_API_KEY", "test-deepgram-key")
+
+@pytest.fixture(autouse=True)
+def tts_cache(tmp_path, monkeypatch):
+    """Fresh TTS cache per test, kept out of the real cache directory"""
+    from app.tts_cache import TTSCache
+    from app.routers import tts_router
+
+    cache = TTSCache(tmp_path / "tts-cache", max_bytes=1024 * 1024)
+    monkeypatch.setattr(tts_router, "tts_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    """Empty tutor response cache for each test"""
+    from app.response_cache import response_cache
+
+    response_cache.clear()
+    return response_cache
+
+@pytest_asyncio.fixture
+async def db():
+    """Fresh schema and an open session for each test"""
+    from app.database import engine, async_session_maker
+    from app.models import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session_maker() as session:
+        yield session
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def auth_user(db):
+    """A user with a live auth session and matching access token"""
+    from datetime import datetime, timedelta
+    from app.models import User, AuthSession
+    from app.routers.auth_router import create_access_token
+
+    user = User(username="tester", email="tester@example.com", password_hash="not-used")
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+
+    token, _ = create_access_token(data={"user_id": user.id})
+    session_id = f"session_{user.id}_test"
+    db.add(AuthSession(
+        id=session_id,
+        user_id=user.id,
+        expires_at=datetime.utcnow() + timedelta(hours=1)
+    ))
+    await db.commit()
+    return {"id": user.id, "token": token, "session_id": session_id}
+
+@pytest_asyncio.fixture
+async def client(auth_user):
+    """HTTP client authenticated as auth_user"""
+    import httpx
+    from app.main import app
+    from app.auth import auth_session_cache
+
+    auth_session_cache.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://test",
+        headers={"Authorization": f"Bearer {auth_user['token']}"},
+        cookies={"auth_session_id": auth_user["session_id"]}
+    ) as client:
+        yield client
+
+# Audio returned by the fake speech API, one write per chunk
+SPEECH_CHUNKS = [b"RIFF", b"-fake", b"-wav", b"-data"]
+
+# Reply streamed by the fake chat APIs, one event per token
+REPLY_TOKENS = ["¡Hola", "! ", "¿Qué ", "tal?"]
+
+@pytest_asyncio.fixture
+async def upstream(monkeypatch):
+    """Local stand-in for Deepgram and the OpenAI and Anthropic APIs
+
+    Points the app at it and records the client port of every request so
+    tests can tell whether connections were reused.
+    """
+    from aiohttp import web
+    from aiohttp import WSMsgType
+    from app import stt_stream, tts
+    from app.llm import providers
+    from app.http_client import http_clients
+    from app.routers import multimedia_router
+
+    peers = []
+    speech_requests = []
+    live_streams = []
+    llm_requests = []
+
+    async def sse_reply(request, events):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for event in events:
+            await response.write(event.encode())
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request):
+        body = await request.json()
+        llm_requests.append({"provider": "openai", **body})
+        if body["messages"][-1]["content"] == "fail":
+            return web.json_response({"error": {"message": "overloaded"}}, status=503)
+        return await sse_reply(request, [
+            f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n" for token in REPLY_TOKENS
+        ] + ["data: [DONE]\n\n"])
+
+    async def messages(request):
+        body = await request.json()
+        llm_requests.append({"provider": "anthropic", **body})
+        return await sse_reply(request, [
+            "event: message_start\ndata: {}\n\n"
+        ] + [
+            f"event: content_block_delta\ndata: {json.dumps({'delta': {'type': 'text_delta', 'text': token}})}\n\n"
+            for token in REPLY_TOKENS
+        ] + ["event: message_stop\ndata: {}\n\n"])
+
+    async def listen(request):
+        peers.append(request.transport.get_extra_info("peername")[1])
+        await request.read()
+        return web.json_response({
+            "results": {"channels": [{"alternatives": [{"transcript": "hola"}], "detected_language": "es"}]}
+        })
+
+    async def speech(request):
+        peers.append(request.transport.get_extra_info("peername")[1])
+        speech_requests.append(await request.json())
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        await response.prepare(request)
+        for chunk in SPEECH_CHUNKS:
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def live(request):
+        # Deepgram-style live endpoint: an interim result per frame, a final
+        # result once the client sends CloseStream
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        stream = {"params": dict(request.query), "frames": []}
+        live_streams.append(stream)
+        async for message in ws:
+            if message.type == WSMsgType.BINARY:
+                stream["frames"].append(message.data)
+                await ws.send_json({
+                    "type": "Results",
+                    "is_final": False,
+                    "channel": {"alternatives": [{"transcript": f"hola {len(stream['frames'])}"}]}
+                })
+            elif message.type == WSMsgType.TEXT and json.loads(message.data).get("type") == "CloseStream":
+                await ws.send_json({
+                    "type": "Results",
+                    "is_final": True,
+                    "speech_final": True,
+                    "channel": {"alternatives": [{"transcript": "hola mundo"}]}
+                })
+                await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_post("/v1/listen", listen)
+    app.router.add_get("/v1/live", live)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/v1/messages", messages)
+    app.router.add_post("/v1/audio/speech", speech)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    monkeypatch.setattr(multimedia_router, "DEEPGRAM_API_URL", f"{base}/v1/listen")
+    monkeypatch.setattr(stt_stream, "DEEPGRAM_STREAM_URL", f"ws://{base[len('http://'):]}/v1/live")
+    monkeypatch.setattr(tts, "OPENAI_API_BASE", f"{base}/v1")
+    monkeypatch.setattr(providers, "OPENAI_API_BASE", f"{base}/v1")
+    monkeypatch.setattr(providers, "ANTHROPIC_API_BASE", f"{base}/v1")
+    await http_clients.start()
+    yield {
+        "base": base,
+        "peers": peers,
+        "speech_requests": speech_requests,
+        "live_streams": live_streams,
+        "llm_requests": llm_requests
+    }
+    await http_clients.close()
+    await runner.cleanup()
+
+class FakeSocket:
+    """Records what it is sent; `delay` makes it a slow consumer"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        await self.send_text(data)
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+async def settle():
+    """Let queued websocket writers run"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+class WebSocketSession:
+    """Drive one of the app's websocket routes in the test's own event loop
+
+    Starlette's TestClient runs the app on a separate loop thread, which
+    does not mix with the shared aiohttp sessions or the async engine.
+    """
+
+    def __init__(self, app, path: str, query_string: str = "", subprotocols=()):
+        self.app = app
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"test")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+            "subprotocols": list(subprotocols)
+        }
+        self.inbound = asyncio.Queue()
+        self.outbound = asyncio.Queue()
+        self.close_code = None
+        self.subprotocol = None
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.app(self.scope, self.inbound.get, self.outbound.put))
+        await self.inbound.put({"type": "websocket.connect"})
+        message = await asyncio.wait_for(self.outbound.get(), 5)
+        if message["type"] == "websocket.close":
+            self.close_code = message.get("code")
+        else:
+            self.subprotocol = message.get("subprotocol")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.inbound.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 5)
+
+    async def send_json(self, data):
+        await self.inbound.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def send_bytes(self, data: bytes):
+        await self.inbound.put({"type": "websocket.receive", "bytes": data})
+
+    async def receive(self, timeout: float = 5):
+        message = await asyncio.wait_for(self.outbound.get(), timeout)
+        assert message["type"] == "websocket.send", message
+        return message
+
+    async def receive_json(self, timeout: float = 5):
+        return json.loads((await self.receive(timeout))["text"])
+
+    async def receive_bytes(self, timeout: float = 5) -> bytes:
+        return (await self.receive(timeout))["bytes"]
+
+@pytest.fixture
+def connect_ws(auth_user):
+    """Open the user websocket as auth_user: `async with connect_ws() as ws`"""
+    from app.main import app
+    from app.auth import auth_session_cache
+
+    auth_session_cache.clear()
+
+    def connect(token=None, session=None, subprotocols=()):
+        return WebSocketSession(
+            app,
+            f"/ws/{token or auth_user['token']}",
+            f"session={session or auth_user['session_id']}",
+            subprotocols
+        )
+    return connect
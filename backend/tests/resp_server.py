@@ -0,0 +1,66 @@
+"""Minimal stand-in for a Redis server's pub/sub commands, for tests"""
+import asyncio
+from typing import Dict, Set
+
+from app.broker import encode_command, read_reply
+
+def confirmation(kind: bytes, channel: bytes, count: int) -> bytes:
+    """Reply to (UN)SUBSCRIBE: [kind, channel, subscription count]"""
+    return b"*3\r\n$%d\r\n%s\r\n$%d\r\n%s\r\n:%d\r\n" % (len(kind), kind, len(channel), channel, count)
+
+class PubSubServer:
+    """Speaks enough RESP for PING, AUTH, SUBSCRIBE, UNSUBSCRIBE and PUBLISH"""
+
+    def __init__(self):
+        self.subscribers: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.published = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.url = f"redis://{host}:{self.port}"
+        return self
+
+    async def close(self):
+        self.server.close()
+        for writers in self.subscribers.values():
+            for writer in writers:
+                writer.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels: Set[bytes] = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].upper()
+                if name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        channels.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(confirmation(b"subscribe", channel, len(channels)))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in command[1:]:
+                        channels.discard(channel)
+                        self.subscribers.get(channel, set()).discard(writer)
+                        writer.write(confirmation(b"unsubscribe", channel, len(channels)))
+                elif name == b"PUBLISH":
+                    _, channel, message = command
+                    receivers = list(self.subscribers.get(channel, ()))
+                    for subscriber in receivers:
+                        subscriber.write(encode_command(b"message", channel, message))
+                    self.published += 1
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(writer)
+            writer.close()
@@ -0,0 +1,91 @@
+import time
+import pytest
+
+from app.cache import TTLCache
+from app.auth import auth_session_cache
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl=5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    monkeypatch.setattr(time, "monotonic", lambda: now + 2)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_ttl_cache_disabled():
+    cache = TTLCache(maxsize=10, ttl=5, enabled=False)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+@pytest.mark.asyncio
+async def test_repeat_requests_served_from_cache(client, auth_user):
+    response = await client.get("/api/chat/sessions/active")
+    assert response.status_code == 200
+    assert auth_session_cache.stats()["size"] == 1
+
+    hits = auth_session_cache.hits
+    response = await client.get("/api/chat/sessions/active")
+    assert response.status_code == 200
+    assert auth_session_cache.hits == hits + 1
+
+@pytest.mark.asyncio
+async def test_logout_invalidates_cached_session(client, auth_user):
+    assert (await client.get("/api/chat/sessions/active")).status_code == 200
+
+    await client.post("/api/auth/logout")
+    assert auth_user["session_id"] not in auth_session_cache._data
+
+    client.cookies.set("auth_session_id", auth_user["session_id"])
+    response = await client.get("/api/chat/sessions/active")
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_logout_is_published_to_other_workers(client, auth_user, monkeypatch):
+    from app.ws import manager
+
+    published = []
+    async def publish_invalidation(cache, key):
+        published.append((cache, key))
+    monkeypatch.setattr(manager, "publish_invalidation", publish_invalidation)
+
+    await client.post("/api/auth/logout")
+    assert published == [("auth_session", auth_user["session_id"])]
+
+@pytest.mark.asyncio
+async def test_refresh_invalidates_cached_session(client, auth_user):
+    assert (await client.get("/api/chat/sessions/active")).status_code == 200
+
+    response = await client.post("/api/auth/refresh")
+    assert response.status_code == 200
+    assert auth_user["session_id"] not in auth_session_cache._data
+
+@pytest.mark.asyncio
+async def test_expired_session_is_dropped(client, auth_user, db):
+    from datetime import datetime, timedelta
+    from app.models import AuthSession
+
+    assert (await client.get("/api/chat/sessions/active")).status_code == 200
+    session = await db.get(AuthSession, auth_user["session_id"])
+    session.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    await db.commit()
+    auth_session_cache._data[auth_user["session_id"]][1]["expires_at"] = session.expires_at
+
+    response = await client.get("/api/chat/sessions/active")
+    assert response.status_code == 401
+    assert auth_user["session_id"] not in auth_session_cache._data
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import select
+
+PARAMS = {"system_prompt": "You are a tutor.", "model": "gpt-4o-mini", "max_tokens": 100}
+
+def exchanges(count, start=1, tokens=50):
+    return [(seq, f"question {seq}", f"answer {seq}", tokens) for seq in range(start, start + count)]
+
+def test_estimate_tokens():
+    from app.context import estimate_tokens
+
+    assert estimate_tokens("") == 0 and estimate_tokens(None) == 0
+    assert estimate_tokens("Hola, ¿qué tal?") == 6
+    assert estimate_tokens("conversation " * 100) == 325
+    assert estimate_tokens("你好" * 30) == 45
+
+def test_history_overflow_folds_oldest_exchanges_into_summary():
+    from app.context import build_context
+
+    context = build_context(PARAMS, None, 0, exchanges(20), "next", max_history_tokens=400)
+    # Folded down to 75% of the budget: 6 exchanges of 50 tokens are kept
+    assert context.folded == 14 and context.summary_seq == 14
+    assert context.history_tokens == 300
+    assert context.summary.splitlines()[0] == "- Learner: question 1 / Tutor: answer 1"
+    assert len(context.summary.splitlines()) == 14
+
+    roles = [m["role"] for m in context.messages]
+    assert roles == ["system", "system"] + ["user", "assistant"] * 6 + ["user"]
+    assert context.messages[2]["content"] == "question 15"
+    assert context.messages[-1]["content"] == "next"
+
+    # The next turn fits again without touching the summary
+    later = build_context(PARAMS, context.summary, 14, exchanges(7, start=15), "more", max_history_tokens=400)
+    assert later.folded == 0 and later.summary == context.summary and later.summary_seq == 14
+
+def test_model_window_limits_the_budget():
+    from app.context import build_context
+
+    params = dict(PARAMS, model="gpt-4", max_tokens=7600)
+    context = build_context(params, None, 0, exchanges(4, tokens=60), "next", max_history_tokens=5000)
+    assert context.folded == 4 and context.history_tokens == 0
+
+def test_summary_keeps_newest_lines_within_its_budget():
+    from app.context import estimate_tokens, fold_summary
+
+    summary = fold_summary(None, exchanges(200), max_tokens=100)
+    assert estimate_tokens(summary) <= 100
+    assert summary.splitlines()[-1] == "- Learner: question 200 / Tutor: answer 200"
+
+@pytest.mark.asyncio
+async def test_long_session_sends_summary_and_recent_history(upstream, client, db, auth_user, monkeypatch):
+    from app import context
+    from app.database import append_chat_message, create_chat_session
+    from app.models import ChatMessage, ChatSession
+
+    monkeypatch.setattr(context, "CONTEXT_MAX_HISTORY_TOKENS", 400)
+    chat_session_id = await create_chat_session(db, auth_user["id"])
+    for seq in range(1, 13):
+        await append_chat_message(db, auth_user["id"], f"question {seq} " + "palabra " * 20, "respuesta " * 20, chat_session_id)
+
+    await client.post("/api/chat/stream", json={"prompt_text": "Hola"})
+    sent = upstream["llm_requests"][-1]["messages"]
+    assert sent[1]["role"] == "system" and sent[1]["content"].startswith("Summary of the earlier conversation")
+    questions = [m["content"] for m in sent if m["role"] == "user"]
+    assert 1 < len(questions) < 13 and questions[-1] == "Hola"
+    assert questions[0].startswith(f"question {13 - len(questions) + 1} ")
+
+    session = (await db.execute(
+        select(ChatSession).where(ChatSession.id == chat_session_id).execution_options(populate_existing=True)
+    )).scalar_one()
+    counts = (await db.execute(select(ChatMessage.token_count))).scalars().all()
+    assert session.summary_seq == 13 - len(questions)
+    assert f"question {session.summary_seq} " in session.summary and session.summary in sent[1]["content"]
+    assert all(counts) and session.token_total == sum(counts)
+    assert session.last_seq == 13
@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import ChatSession, ChatMessage
+
+async def seed_conversations(db, user_id, sessions, messages):
+    start = datetime(2024, 1, 1)
+    for s in range(sessions):
+        session = ChatSession(user_id=user_id, start_time=start, end_time=start)
+        db.add(session)
+        await db.flush()
+        for m in range(messages):
+            db.add(ChatMessage(
+                chat_session_id=session.id,
+                user_id=user_id,
+                content=f"s{session.id}m{m}",
+                response="ok",
+                created_at=start + timedelta(seconds=m)
+            ))
+    # An empty session is never listed
+    db.add(ChatSession(user_id=user_id, start_time=start))
+    await db.commit()
+
+@contextmanager
+def count_statements():
+    statements = []
+    def before_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_execute)
+
+@pytest.mark.asyncio
+async def test_keyset_pagination(client, auth_user, db):
+    await seed_conversations(db, auth_user["id"], sessions=5, messages=3)
+
+    response = await client.get("/api/chat/conversations", params={"limit": 2})
+    assert response.status_code == 200
+    first = response.json()
+    assert [c["id"] for c in first] == [5, 4]
+    assert [m["text"] for m in first[0]["messages"]] == ["s5m0", "s5m1", "s5m2"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get("/api/chat/conversations", params={"limit": 2, "before": cursor})
+    assert [c["id"] for c in response.json()] == [3, 2]
+
+    response = await client.get("/api/chat/conversations", params={"limit": 2, "before": 2})
+    assert [c["id"] for c in response.json()] == [1]
+    assert "X-Next-Cursor" not in response.headers
+
+@pytest.mark.asyncio
+async def test_without_limit_every_conversation_is_returned(client, auth_user, db):
+    await seed_conversations(db, auth_user["id"], sessions=60, messages=1)
+
+    response = await client.get("/api/chat/conversations")
+    assert len(response.json()) == 60
+    assert "X-Next-Cursor" not in response.headers
+
+@pytest.mark.asyncio
+async def test_message_preview_limit(client, auth_user, db):
+    await seed_conversations(db, auth_user["id"], sessions=2, messages=5)
+
+    response = await client.get("/api/chat/conversations", params={"messages_limit": 2})
+    for conversation in response.json():
+        texts = [m["text"] for m in conversation["messages"]]
+        assert texts == [f"s{conversation['id']}m3", f"s{conversation['id']}m4"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sessions", [3, 30])
+async def test_query_count_independent_of_session_count(client, auth_user, db, sessions):
+    await seed_conversations(db, auth_user["id"], sessions=sessions, messages=2)
+    await client.get("/api/chat/sessions/active")  # warm the auth cache
+
+    with count_statements() as statements:
+        response = await client.get("/api/chat/conversations", params={"limit": 200})
+    assert len(response.json()) == sessions
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 2
@@ -0,0 +1,31 @@
+import pytest
+
+from app.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STATEMENT_TIMEOUT_MS
+from app.database import get_engine_options, InstrumentedQueuePool, engine
+
+def test_postgres_profile():
+    options = get_engine_options("postgresql+asyncpg://u:p@localhost/db")
+    assert options["echo"] is False
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == DB_POOL_SIZE
+    assert options["max_overflow"] == DB_MAX_OVERFLOW
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"]["server_settings"]["statement_timeout"] == str(DB_STATEMENT_TIMEOUT_MS)
+
+def test_in_memory_sqlite_keeps_default_pool():
+    assert get_engine_options("sqlite+aiosqlite:///:memory:") == {"echo": False}
+
+@pytest.mark.asyncio
+async def test_pool_metrics_endpoint(client):
+    assert isinstance(engine.sync_engine.pool, InstrumentedQueuePool)
+    before = (await client.get("/metrics/db")).json()
+
+    for _ in range(3):
+        await client.get("/api/chat/sessions/active")
+    after = (await client.get("/metrics/db")).json()
+
+    assert after["checkouts_total"] >= before["checkouts_total"] + 3
+    assert after["checked_out"] == 0
+    assert after["size"] == DB_POOL_SIZE
+    assert after["wait_seconds_total"] >= before["wait_seconds_total"]
+    assert after["connection_age_seconds_max"] >= 0
@@ -0,0 +1,65 @@
+import pytest
+
+from app.database import (
+    create_chat_session,
+    end_chat_session,
+    append_chat_message,
+    get_history_since,
+    history_delta_message
+)
+
+@pytest.mark.asyncio
+async def test_append_assigns_gapless_sequence(db, auth_user):
+    other_session_id = await create_chat_session(db, auth_user["id"])
+    await append_chat_message(db, auth_user["id"], "other", "reply", other_session_id)
+    await end_chat_session(db, other_session_id)
+    chat_session_id = await create_chat_session(db, auth_user["id"])
+
+    first = await append_chat_message(db, auth_user["id"], "hola", "hello", chat_session_id)
+    second = await append_chat_message(db, auth_user["id"], "adios", "bye", chat_session_id)
+
+    assert first[:3] == (1, "hola", "hello")
+    assert second[:3] == (2, "adios", "bye")
+
+@pytest.mark.asyncio
+async def test_history_since_returns_only_delta(db, auth_user):
+    chat_session_id = await create_chat_session(db, auth_user["id"])
+    for i in range(5):
+        await append_chat_message(db, auth_user["id"], f"m{i}", f"r{i}", chat_session_id)
+
+    entries = await get_history_since(db, auth_user["id"], chat_session_id, since_seq=3)
+    assert [entry[0] for entry in entries] == [4, 5]
+
+    message = history_delta_message(chat_session_id, entries, 3)
+    assert message["type"] == "history_update"
+    assert message["since_seq"] == 3
+    assert message["last_seq"] == 5
+    assert [m["content"] for m in message["messages"]] == ["m3", "m4"]
+
+@pytest.mark.asyncio
+async def test_messages_endpoint_serves_delta(client, auth_user, db):
+    chat_session_id = await create_chat_session(db, auth_user["id"])
+    for i in range(3):
+        await append_chat_message(db, auth_user["id"], f"m{i}", f"r{i}", chat_session_id)
+
+    response = await client.get(f"/api/chat/sessions/{chat_session_id}/messages", params={"since": 1})
+    assert response.status_code == 200
+    assert [m["seq"] for m in response.json()["messages"]] == [2, 3]
+
+    response = await client.get(f"/api/chat/sessions/{chat_session_id}/messages", params={"since": 3})
+    assert response.json()["messages"] == []
+    assert response.json()["last_seq"] == 3
+
+@pytest.mark.asyncio
+async def test_create_returns_open_session(db, auth_user):
+    first = await create_chat_session(db, auth_user["id"])
+    assert await create_chat_session(db, auth_user["id"]) == first
+
+@pytest.mark.asyncio
+async def test_websocket_history_sync_rejects_bad_input(connect_ws):
+    async with connect_ws() as ws:
+        for request in ({"since_seq": "abc", "chat_session_id": 1}, {"since_seq": 0}, {"chat_session_id": [1]}):
+            await ws.send_json({"type": "history_sync", **request})
+            assert await ws.receive_json() == {"type": "error", "error": "Invalid history_sync request"}
+        await ws.send_json({"type": "heartbeat"})
+        assert (await ws.receive_json())["type"] == "heartbeat"
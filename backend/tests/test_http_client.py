@@ -0,0 +1,40 @@
+import pytest
+
+from app.http_client import http_clients
+
+@pytest.mark.asyncio
+async def test_registry_reuses_sessions(upstream):
+    assert http_clients.get("stt") is http_clients.get("stt")
+    assert http_clients.get("stt") is not http_clients.get("tts")
+
+@pytest.mark.asyncio
+async def test_registry_requires_start():
+    await http_clients.close()
+    with pytest.raises(RuntimeError):
+        http_clients.get("stt")
+
+@pytest.mark.asyncio
+async def test_transcribe_reuses_connection(client, upstream):
+    for _ in range(5):
+        response = await client.post(
+            "/api/multimedia/deepgram_transcribe/",
+            files={"audio": ("clip.webm", b"\x1aE\xdf\xa3fake", "audio/webm")},
+            data={"agent_name": "tutor"}
+        )
+        assert response.status_code == 200
+        assert response.json()["transcription"] == "hola"
+
+    assert len(upstream["peers"]) == 5
+    assert len(set(upstream["peers"])) == 1
+
+@pytest.mark.asyncio
+async def test_tts_reuses_connection(client, upstream):
+    for i in range(3):
+        response = await client.post(
+            "/api/tts/synthesize/",
+            json={"text": f"hola {i}", "voice": "alloy"}
+        )
+        assert response.status_code == 200
+
+    assert len(upstream["peers"]) == 3
+    assert len(set(upstream["peers"])) == 1
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+PROMPT = [{"role": "user", "content": "Hola"}]
+
+async def collect(stream):
+    return "".join([delta async for delta in stream])
+
+@pytest.fixture
+def fakes(monkeypatch):
+    """Register fake providers: `fakes(name, first_token_delay=..., error_rate=...)`"""
+    from app.llm import providers, fake_provider
+
+    def register(name, **options):
+        monkeypatch.setitem(providers.PROVIDERS, name, fake_provider(name=name, **options))
+    return register
+
+@pytest.mark.asyncio
+async def test_failure_before_first_token_fails_over(fakes):
+    from app.llm import LLMGateway
+
+    fakes("flaky", error_rate=1.0)
+    fakes("steady")
+    gateway = LLMGateway()
+
+    reply = await collect(gateway.stream_chain([("flaky", "m"), ("steady", "m")], PROMPT))
+    assert reply == "steady: Hola"
+    stats = gateway.stats()
+    assert stats["failovers"] == 1
+    assert stats["providers"]["flaky"]["failed"] == 1 and stats["providers"]["steady"]["completed"] == 1
+
+@pytest.mark.asyncio
+async def test_whole_chain_failing_raises(fakes):
+    from app.llm import LLMError, LLMGateway
+
+    fakes("down", error_rate=1.0)
+    fakes("also_down", error_rate=1.0)
+    with pytest.raises(LLMError):
+        await collect(LLMGateway().stream_chain([("down", "m"), ("also_down", "m")], PROMPT))
+
+@pytest.mark.asyncio
+async def test_slow_provider_is_hedged(fakes, monkeypatch):
+    from app.llm import LLMGateway, gateway as gateway_module
+
+    monkeypatch.setattr(gateway_module, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    fakes("slow", first_token_delay=1.0)
+    fakes("fast")
+    gateway = LLMGateway()
+
+    started = asyncio.get_running_loop().time()
+    reply = await collect(gateway.stream_chain([("slow", "m"), ("fast", "m")], PROMPT, hedge=True))
+    assert reply == "fast: Hola"
+    assert asyncio.get_running_loop().time() - started < 0.5
+    stats = gateway.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    # The losing call was cancelled, not counted against the slow provider
+    assert stats["providers"]["slow"]["in_flight"] == 0 and stats["providers"]["slow"]["failed"] == 0
+
+@pytest.mark.asyncio
+async def test_hedge_delay_follows_observed_p95(fakes, monkeypatch):
+    from app.llm import LLMGateway, gateway as gateway_module
+
+    monkeypatch.setattr(gateway_module, "LLM_HEDGE_MIN_SAMPLES", 10)
+    monkeypatch.setattr(gateway_module, "LLM_HEDGE_MIN_DELAY", 0.0)
+    gateway = LLMGateway()
+    health = gateway.health("fake")
+    for ms in range(1, 21):
+        health.record_latency(ms / 1000)
+    assert gateway.hedge_delay("fake") == pytest.approx(0.020)
+
+@pytest.mark.asyncio
+async def test_breaker_opens_short_circuits_and_recovers(fakes, monkeypatch):
+    from app.llm import LLMGateway, ProviderUnavailable, providers, fake_provider
+
+    fakes("broken", error_rate=1.0)
+    gateway = LLMGateway(health_options={"window": 4, "min_calls": 4, "error_rate": 0.5, "cooldown": 0.05})
+    for _ in range(4):
+        with pytest.raises(Exception):
+            await collect(gateway.stream("broken", "m", PROMPT))
+    assert gateway.stats()["providers"]["broken"]["breaker"] == "open"
+
+    with pytest.raises(ProviderUnavailable):
+        await collect(gateway.stream("broken", "m", PROMPT))
+    # The chain skips it without waiting on it
+    fakes("backup")
+    assert await collect(gateway.stream_chain([("broken", "m"), ("backup", "m")], PROMPT)) == "backup: Hola"
+    assert gateway.stats()["providers"]["broken"]["short_circuited"] == 2
+
+    # After the cooldown one probe goes through and its success closes the breaker
+    monkeypatch.setitem(providers.PROVIDERS, "broken", fake_provider(name="broken"))
+    await asyncio.sleep(0.06)
+    assert await collect(gateway.stream("broken", "m", PROMPT)) == "broken: Hola"
+    stats = gateway.stats()["providers"]["broken"]
+    assert stats["breaker"] == "closed" and stats["times_opened"] == 1
+
+@pytest.mark.asyncio
+async def test_agent_fallbacks_are_used_for_chat(client, db, fakes):
+    from app.models import Agent, ChatMessage
+
+    fakes("primary", error_rate=1.0)
+    fakes("secondary")
+    db.add(Agent(name="resilient", provider="primary", model="m", fallbacks="secondary:m"))
+    await db.commit()
+
+    response = await client.post("/api/chat/stream", json={"prompt_text": "Hola", "agent_name": "resilient"})
+    assert response.status_code == 200 and "event: done" in response.text
+    saved = (await db.execute(select(ChatMessage))).scalars().one()
+    assert saved.response == "secondary: Hola"
+
+@pytest.mark.asyncio
+async def test_single_provider_connection_error_is_an_llm_error(monkeypatch):
+    import socket
+    from app.http_client import HTTPClientRegistry
+    from app.llm import LLMError, LLMGateway, providers
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(providers, "OPENAI_API_BASE", f"http://127.0.0.1:{port}/v1")
+    clients = HTTPClientRegistry()
+    await clients.start()
+    gateway = LLMGateway(clients=clients)
+    try:
+        with pytest.raises(LLMError, match="openai request failed"):
+            await collect(gateway.stream_chain([("openai", "gpt-4o-mini")], PROMPT))
+    finally:
+        await clients.close()
+    assert gateway.stats()["providers"]["openai"]["failed"] == 1
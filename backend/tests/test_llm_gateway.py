@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+PROMPT = [{"role": "system", "content": "Be brief"}, {"role": "user", "content": "Hola amigo"}]
+
+async def collect(stream):
+    return [delta async for delta in stream]
+
+@pytest.mark.asyncio
+async def test_fake_provider_streams_offline():
+    from app.llm import LLMGateway
+
+    gateway = LLMGateway()
+    assert await collect(gateway.stream("fake", "echo", PROMPT)) == ["Echo: ", "Hola ", "amigo"]
+    assert gateway.stats()["providers"]["fake"]["completed"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_per_provider(monkeypatch):
+    from app.llm import LLMGateway, providers
+
+    monkeypatch.setattr(providers, "LLM_FAKE_TOKEN_DELAY", 0.01)
+    gateway = LLMGateway(limits={"fake": 2})
+    peak = 0
+
+    async def consume():
+        nonlocal peak
+        async for _ in gateway.stream("fake", "echo", PROMPT):
+            peak = max(peak, gateway.stats()["providers"]["fake"]["in_flight"])
+
+    await asyncio.gather(*(consume() for _ in range(6)))
+    stats = gateway.stats()["providers"]["fake"]
+    assert peak == 2
+    assert stats["completed"] == 6 and stats["in_flight"] == 0 and stats["waiting"] == 0
+
+@pytest.mark.asyncio
+async def test_request_fails_when_no_slot_frees_up():
+    from app.llm import LLMError, LLMGateway
+
+    gateway = LLMGateway(limits={"fake": 1}, queue_timeout=0.01)
+    held = gateway.stream("fake", "echo", PROMPT)
+    await held.__anext__()
+    with pytest.raises(LLMError):
+        await collect(gateway.stream("fake", "echo", PROMPT))
+    await held.aclose()
+
+    assert await collect(gateway.stream("fake", "echo", PROMPT))
+    stats = gateway.stats()["providers"]["fake"]
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_unknown_provider_is_rejected():
+    from app.llm import LLMError, LLMGateway
+
+    with pytest.raises(LLMError):
+        await collect(LLMGateway().stream("nope", "model", PROMPT))
+
+@pytest.mark.asyncio
+async def test_agent_row_selects_fake_provider(client, db):
+    from app.models import Agent, ChatMessage
+
+    db.add(Agent(name="offline", provider="fake", model="echo"))
+    await db.commit()
+
+    response = await client.post("/api/chat/stream", json={"prompt_text": "Hola", "agent_name": "offline"})
+    assert response.status_code == 200 and "event: done" in response.text
+    saved = (await db.execute(select(ChatMessage))).scalars().one()
+    assert saved.response == "Echo: Hola"
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from conftest import REPLY_TOKENS
+
+REPLY = "".join(REPLY_TOKENS)
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+@pytest.mark.asyncio
+async def test_sse_streams_deltas_then_saves_full_reply(upstream, client, db, auth_user):
+    from app.models import ChatMessage
+
+    response = await client.post("/api/chat/stream", json={"prompt_text": "Hola"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    assert [e for e, _ in events] == ["delta"] * len(REPLY_TOKENS) + ["done"]
+    assert [data["delta"] for _, data in events[:-1]] == REPLY_TOKENS
+    assert events[-1][1]["seq"] == 1
+
+    saved = (await db.execute(select(ChatMessage))).scalars().all()
+    assert [(m.content, m.response, m.seq) for m in saved] == [("Hola", REPLY, 1)]
+
+    # The next turn carries the saved exchange as history
+    await client.post("/api/chat/stream", json={"prompt_text": "Bien"})
+    sent = upstream["llm_requests"][-1]["messages"]
+    assert [m["role"] for m in sent] == ["system", "user", "assistant", "user"]
+    assert sent[2]["content"] == REPLY
+    assert upstream["llm_requests"][-1]["stream"] is True
+
+@pytest.mark.asyncio
+async def test_sse_uses_agent_provider_and_parameters(upstream, client, db):
+    from app.models import Agent
+
+    db.add(Agent(name="claude-tutor", system_prompt="Be brief", provider="anthropic", model="claude-3-sonnet", temperature=0.2))
+    await db.commit()
+
+    response = await client.post("/api/chat/stream", json={"prompt_text": "Hola", "agent_name": "claude-tutor"})
+    events = parse_sse(response.text)
+    assert "".join(data["delta"] for e, data in events if e == "delta") == REPLY
+
+    sent = upstream["llm_requests"][0]
+    assert sent["provider"] == "anthropic"
+    assert sent["model"] == "claude-3-sonnet"
+    assert sent["system"] == "Be brief"
+    assert sent["temperature"] == 0.2
+    assert all(m["role"] != "system" for m in sent["messages"])
+
+@pytest.mark.asyncio
+async def test_failed_stream_reports_error_and_saves_nothing(upstream, client, db):
+    from app.models import ChatMessage
+
+    response = await client.post("/api/chat/stream", json={"prompt_text": "fail"})
+    [(event, data)] = parse_sse(response.text)
+    assert event == "error"
+    assert data["detail"] == "Language model unavailable"
+    assert (await db.execute(select(ChatMessage))).scalars().all() == []
+
+@pytest.mark.asyncio
+async def test_websocket_prompt_streams_assistant_deltas(upstream, connect_ws):
+    async with connect_ws() as ws:
+        await ws.send_json({"type": "prompt", "content": "Hola"})
+        deltas = [await ws.receive_json() for _ in REPLY_TOKENS]
+        assert {d["type"] for d in deltas} == {"assistant_delta"}
+        assert [d["delta"] for d in deltas] == REPLY_TOKENS
+        assert len({d["turn_id"] for d in deltas}) == 1
+
+        done = await ws.receive_json()
+        assert done["type"] == "assistant_done" and done["seq"] == 1
+        update = await ws.receive_json()
+        assert update["type"] == "history_update"
+        assert update["messages"][0]["response"] == REPLY
+
+@pytest.mark.asyncio
+async def test_text_endpoint_returns_llm_reply(upstream, client):
+    response = await client.post(
+        "/api/multimedia/text/",
+        params={"include_response": "true"},
+        json={"prompt_text": "Hola", "agent_name": "missing-agent"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"response_text": REPLY, "seq": 1}
+
+@pytest.mark.asyncio
+async def test_text_endpoint_holds_no_connection_while_streaming(upstream, client, monkeypatch):
+    from app.database import get_pool_stats
+    from app.routers import multimedia_router
+
+    checked_out = []
+    send_to_user = multimedia_router.manager.send_to_user
+
+    async def record(user_id, data):
+        if data["type"] == "assistant_delta":
+            checked_out.append(get_pool_stats()["checked_out"])
+        await send_to_user(user_id, data)
+    monkeypatch.setattr(multimedia_router.manager, "send_to_user", record)
+
+    response = await client.post("/api/multimedia/text/", json={"prompt_text": "Hola", "agent_name": "missing-agent"})
+    assert response.status_code == 200
+    assert checked_out == [0] * len(REPLY_TOKENS)
+
+@pytest.mark.asyncio
+async def test_websocket_prompt_that_cannot_start_keeps_the_socket(connect_ws, monkeypatch):
+    from app.routers import ws_router
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("Failed to create chat session")
+    monkeypatch.setattr(ws_router, "prepare_chat_turn", broken)
+
+    async with connect_ws() as ws:
+        await ws.send_json({"type": "prompt", "content": "Hola"})
+        assert await ws.receive_json() == {"type": "error", "error": "Could not start chat turn"}
+        await ws.send_json({"type": "heartbeat"})
+        assert (await ws.receive_json())["type"] == "heartbeat"
@@ -0,0 +1,60 @@
+import pytest
+
+def count(histogram, *labels) -> int:
+    snapshot = histogram.snapshot(*labels)
+    return snapshot["count"] if snapshot else 0
+
+def test_histogram_buckets_and_text_format():
+    from app.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.1, 1.0))
+    requests = registry.counter("demo_total", "Demo requests", ("route",))
+    registry.gauge("demo_open", "Demo gauge", callback=lambda: 3)
+    for value in (0.05, 0.1, 0.5, 7.0):
+        latency.observe(value, '/a"b')
+    requests.inc("/a")
+    requests.inc("/a", amount=2)
+
+    assert latency.snapshot('/a"b')["buckets"] == {0.1: 2, 1.0: 3, float("inf"): 4}
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a\\"b",le="1.0"} 3' in text
+    assert 'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{route="/a\\"b"} 4' in text
+    assert 'demo_total{route="/a"} 3' in text
+    assert "demo_open 3" in text
+    with pytest.raises(ValueError):
+        registry.counter("demo_total", "Registered twice")
+
+@pytest.mark.asyncio
+async def test_requests_queries_and_upstream_calls_are_exported(upstream, client, auth_user):
+    from app.metrics import CONTENT_TYPE
+    from app.middleware import HTTP_LATENCY
+    from app.database import DB_QUERY_SECONDS
+    from app.http_client import UPSTREAM_SECONDS
+    from app.llm.gateway import LLM_FIRST_TOKEN_SECONDS
+
+    route = "/api/chat/sessions/{session_id}/messages"
+    before = (
+        count(HTTP_LATENCY, "GET", route),
+        count(DB_QUERY_SECONDS, "SELECT"),
+        count(UPSTREAM_SECONDS, "llm.openai"),
+        count(LLM_FIRST_TOKEN_SECONDS, "openai")
+    )
+    await client.get("/api/chat/sessions/1/messages")
+    await client.get("/api/chat/sessions/2/messages")
+    await client.post("/api/chat/stream", json={"prompt_text": "Hola"})
+
+    assert count(HTTP_LATENCY, "GET", route) == before[0] + 2
+    assert count(DB_QUERY_SECONDS, "SELECT") > before[1]
+    assert count(UPSTREAM_SECONDS, "llm.openai") == before[2] + 1
+    assert count(LLM_FIRST_TOKEN_SECONDS, "openai") == before[3] + 1
+
+    response = await client.get("/metrics")
+    assert response.headers["content-type"] == f"{CONTENT_TYPE}; charset=utf-8"
+    # Path parameters are folded into the route template
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}"}}' in response.text
+    assert "/api/chat/sessions/1/messages" not in response.text
+    assert 'upstream_response_seconds_bucket{service="llm.openai",le="+Inf"}' in response.text
+    assert "ws_connections " in response.text
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+
+import pytest
+
+def chunked_app(release: asyncio.Event, status: int = 200):
+    """ASGI app that sends one chunk, waits for `release`, then finishes"""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n", "more_body": True})
+        await release.wait()
+        await send({"type": "http.response.body", "body": b"data: 2\n\n", "more_body": False})
+    return app
+
+def http_scope(path="/stream"):
+    return {"type": "http", "method": "GET", "path": path, "headers": []}
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+@pytest.mark.asyncio
+async def test_chunks_pass_through_unbuffered():
+    from app.middleware import RequestMiddleware, RequestStats
+
+    release = asyncio.Event()
+    stats = RequestStats()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    task = asyncio.create_task(RequestMiddleware(chunked_app(release), stats=stats)(http_scope(), receive, send))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    # The first chunk is out before the app has finished the response
+    assert [m.get("body") for m in sent] == [None, b"data: 1\n\n"]
+    assert stats.in_flight == 1
+    release.set()
+    await task
+    assert sent[-1]["body"] == b"data: 2\n\n"
+    assert stats.stats()["requests"] == 1 and stats.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_unauthorized_response_gets_token_expired_header(client):
+    response = await client.get("/api/agents/", headers={"Authorization": ""})
+    assert response.status_code == 401
+    assert response.headers["x-token-expired"] == "true"
+
+    response = await client.get("/health")
+    assert "x-token-expired" not in response.headers
+    # The 401 is counted; /health itself is still in flight while it reports
+    requests = response.json()["requests"]
+    assert requests["requests"] >= 1 and requests["in_flight"] >= 1
+
+@pytest.mark.asyncio
+async def test_only_sampled_slow_and_failed_requests_are_logged(caplog):
+    from app.middleware import RequestMiddleware, RequestStats
+
+    release = asyncio.Event()
+    release.set()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    caplog.set_level(logging.INFO, logger="app.middleware")
+    quiet = RequestMiddleware(chunked_app(release), stats=RequestStats(), sample_rate=0.0)
+    await quiet(http_scope(), receive, send)
+    assert not caplog.records
+
+    failing = RequestMiddleware(chunked_app(release, status=503), stats=RequestStats(), sample_rate=0.0)
+    await failing(http_scope("/broken"), receive, send)
+    slow = RequestMiddleware(chunked_app(release), stats=RequestStats(), sample_rate=0.0, slow_ms=0.0)
+    await slow(http_scope("/slow"), receive, send)
+    everything = RequestMiddleware(chunked_app(release), stats=RequestStats(), sample_rate=1.0)
+    await everything(http_scope("/sampled"), receive, send)
+    assert [(r.levelno, r.getMessage().split(" ->")[0]) for r in caplog.records] == [
+        (logging.WARNING, "GET /broken"),
+        (logging.WARNING, "GET /slow"),
+        (logging.INFO, "GET /sampled")
+    ]
+
+@pytest.mark.asyncio
+async def test_long_streams_are_not_slow_when_headers_are_prompt(caplog):
+    from app.middleware import RequestMiddleware, RequestStats
+
+    release = asyncio.Event()
+
+    async def send(message):
+        pass
+
+    caplog.set_level(logging.INFO, logger="app.middleware")
+    stats = RequestStats()
+    middleware = RequestMiddleware(chunked_app(release), stats=stats, sample_rate=0.0, slow_ms=50)
+    request = asyncio.create_task(middleware(http_scope(), receive, send))
+    await asyncio.sleep(0.1)
+    release.set()
+    await request
+
+    assert stats.stats()["slow"] == 0 and stats.stats()["mean_ms"] >= 90
+    assert not caplog.records
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import WebSocketSession
+
+def burn_cpu(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+async def busy_handler(stop: asyncio.Event):
+    while not stop.is_set():
+        burn_cpu(0.02)
+        await asyncio.sleep(0)
+
+async def waiting_handler(stop: asyncio.Event):
+    await stop.wait()
+
+@pytest.mark.asyncio
+async def test_profile_shows_running_code_and_awaiting_tasks():
+    from app.profiler import SamplingProfiler, ON_CPU_ROOT, AWAITING_ROOT
+
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(busy_handler(stop)), asyncio.create_task(waiting_handler(stop))]
+    try:
+        profile = await SamplingProfiler().run(0.3, interval=0.002, task_interval=0.02)
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+
+    lines = profile.collapsed().splitlines()
+    assert any(line.startswith(ON_CPU_ROOT) and "burn_cpu (test_profiler.py" in line for line in lines)
+    # The await chain is followed below the task's own coroutine
+    assert any(
+        line.startswith(AWAITING_ROOT) and "waiting_handler (test_profiler.py" in line and "Event.wait" in line
+        for line in lines
+    )
+
+    speedscope = profile.speedscope()
+    on_cpu, awaiting = speedscope["profiles"]
+    names = [frame["name"] for frame in speedscope["shared"]["frames"]]
+    assert on_cpu["type"] == "sampled" and len(on_cpu["samples"]) == len(on_cpu["weights"])
+    assert all(0 <= i < len(names) for stack in awaiting["samples"] for i in stack)
+    assert "burn_cpu" in names
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_is_admin_only_and_exclusive(client, monkeypatch):
+    from app import auth
+    from app.profiler import profiler
+
+    response = await client.get("/api/admin/profile", params={"seconds": 0.05})
+    assert response.status_code == 403
+
+    monkeypatch.setattr(auth, "ADMIN_USERNAMES", {"tester"})
+    response = await client.get("/api/admin/profile", params={"seconds": 0.1})
+    assert response.status_code == 200
+    assert response.json()["$schema"].startswith("https://www.speedscope.app/")
+
+    response = await client.get("/api/admin/profile", params={"seconds": 0.1, "format": "collapsed"})
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.startswith("[")
+
+    monkeypatch.setattr(profiler, "running", True)
+    response = await client.get("/api/admin/profile", params={"seconds": 0.05})
+    assert response.status_code == 409
+
+@pytest.mark.asyncio
+async def test_admin_socket_profiles_in_the_background(auth_user, monkeypatch):
+    from app import auth
+    from app.main import app
+
+    monkeypatch.setattr(auth, "ADMIN_USERNAMES", {"tester"})
+    async with WebSocketSession(app, f"/ws/admin/{auth_user['token']}", f"session={auth_user['session_id']}") as ws:
+        await ws.send_json({"command": "profile", "seconds": 0.2, "format": "collapsed"})
+        # Other commands are still served while the profile runs
+        await ws.send_json({"command": "get_stats"})
+        assert (await ws.receive_json())["type"] == "stats"
+        reply = await ws.receive_json()
+        assert reply["type"] == "profile" and reply["format"] == "collapsed"
+        assert "admin_websocket_endpoint" in reply["data"]
+
+@pytest.mark.asyncio
+async def test_admin_socket_rejects_bad_profile_parameters(auth_user, monkeypatch):
+    from app import auth
+    from app.main import app
+
+    monkeypatch.setattr(auth, "ADMIN_USERNAMES", {"tester"})
+    async with WebSocketSession(app, f"/ws/admin/{auth_user['token']}", f"session={auth_user['session_id']}") as ws:
+        for command in ({"interval_ms": 0}, {"seconds": "soon"}, {"seconds": -1}, {"interval_ms": 5000}):
+            await ws.send_json({"command": "profile", **command})
+            assert (await ws.receive_json())["type"] == "error"
+
+@pytest.mark.asyncio
+async def test_run_clamps_the_sampling_interval():
+    from app.profiler import MIN_INTERVAL, SamplingProfiler
+
+    profile = await SamplingProfiler().run(0.05, interval=0, task_interval=0)
+    assert profile.interval == MIN_INTERVAL and profile.task_interval == MIN_INTERVAL
+    with pytest.raises(ValueError):
+        await SamplingProfiler().run(float("nan"))
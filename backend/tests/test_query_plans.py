@@ -0,0 +1,93 @@
+"""Fail if the hot chat queries fall back to sequential scans on seeded data"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from app.database import engine
+from app.models import User, ChatSession, ChatMessage, AuthSession
+
+HOT_QUERIES = {
+    "active_session": (
+        "SELECT id FROM chat_sessions WHERE user_id = :user_id AND end_time IS NULL",
+        "chat_sessions"
+    ),
+    "conversation_page": (
+        "SELECT id FROM chat_sessions WHERE user_id = :user_id AND id < :before "
+        "ORDER BY id DESC LIMIT 50",
+        "chat_sessions"
+    ),
+    "history": (
+        "SELECT * FROM chat_messages WHERE chat_session_id = :session_id ORDER BY created_at",
+        "chat_messages"
+    ),
+    "history_delta": (
+        "SELECT * FROM chat_messages WHERE chat_session_id = :session_id AND seq > :seq ORDER BY seq",
+        "chat_messages"
+    ),
+    "expiry_sweep": (
+        "SELECT id FROM auth_sessions WHERE expires_at < :now",
+        "auth_sessions"
+    ),
+}
+PARAMS = {"user_id": 7, "before": 500, "session_id": 42, "seq": 10, "now": datetime(2024, 1, 1)}
+
+async def seed(db, users=50, sessions_per_user=20, messages_per_session=20):
+    start = datetime(2024, 1, 1)
+    await db.execute(insert(User), [
+        {"id": u, "username": f"u{u}", "email": f"u{u}@example.com", "password_hash": "x"}
+        for u in range(1, users + 1)
+    ])
+    await db.execute(insert(ChatSession), [
+        {
+            "user_id": u,
+            "start_time": start,
+            # Only the last session of each user is still open
+            "end_time": None if s == sessions_per_user - 1 else start
+        }
+        for u in range(1, users + 1)
+        for s in range(sessions_per_user)
+    ])
+    await db.execute(insert(ChatMessage), [
+        {
+            "chat_session_id": session_id,
+            "user_id": 1,
+            "content": "hola",
+            "seq": m + 1,
+            "created_at": start + timedelta(seconds=m)
+        }
+        for session_id in range(1, users * sessions_per_user + 1)
+        for m in range(messages_per_session)
+    ])
+    await db.execute(insert(AuthSession), [
+        {"id": f"s{i}", "user_id": 1 + i % users, "expires_at": start + timedelta(days=i % 30)}
+        for i in range(2000)
+    ])
+    await db.commit()
+
+async def explain(conn, sql):
+    if conn.dialect.name == "sqlite":
+        rows = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), PARAMS)
+        return [row[-1] for row in rows]
+    rows = await conn.execute(text(f"EXPLAIN {sql}"), PARAMS)
+    return [row[0] for row in rows]
+
+def is_seq_scan(plan, table, dialect):
+    for line in plan:
+        if dialect == "sqlite":
+            # "SCAN t" is a full table scan; "SEARCH t USING INDEX" is not
+            if line.startswith(f"SCAN {table}") and "INDEX" not in line:
+                return True
+        elif f"Seq Scan on {table}" in line:
+            return True
+    return False
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+async def test_hot_query_uses_index(db, name):
+    await seed(db)
+    sql, table = HOT_QUERIES[name]
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+        plan = await explain(conn, sql)
+        assert not is_seq_scan(plan, table, conn.dialect.name), "\n".join(plan)
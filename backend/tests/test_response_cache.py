@@ -0,0 +1,99 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from conftest import REPLY_TOKENS
+
+SYSTEM = "You are a Spanish tutor."
+
+def test_prompts_are_normalized():
+    from app.response_cache import ResponseCache
+
+    assert ResponseCache.normalize("  ¿Cómo se dice   HELLO en español? ") == "cómo se dice hello en español"
+    assert ResponseCache.normalize("Ｈｏｌａ!!") == "hola"
+
+def test_exact_tier_is_scoped_to_agent_and_system_prompt():
+    from app.response_cache import ResponseCache
+
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.set(1, SYSTEM, "gpt-4o-mini", "How do I say hello?", "Hola")
+
+    assert cache.get(1, SYSTEM, "gpt-4o-mini", "how do i say hello", prompt_tokens=20) == "Hola"
+    assert cache.get(2, SYSTEM, "gpt-4o-mini", "How do I say hello?") is None
+    assert cache.get(1, "Be terse.", "gpt-4o-mini", "How do I say hello?") is None
+    assert cache.get(1, SYSTEM, "gpt-4", "How do I say hello?") is None
+
+    stats = cache.stats()
+    assert stats["agents"]["1"] == {"hits": 1, "semantic_hits": 0, "misses": 2, "hit_ratio": 0.3333, "tokens_saved": 21}
+    assert stats["agents"]["2"]["misses"] == 1
+    assert stats["hits"] == 1 and stats["hit_ratio"] == 0.25
+
+def test_entries_expire_and_are_evicted_least_recently_used():
+    from app.response_cache import ResponseCache
+
+    cache = ResponseCache(maxsize=2, ttl=0.05)
+    cache.set(None, SYSTEM, "m", "uno", "one")
+    cache.set(None, SYSTEM, "m", "dos", "two")
+    assert cache.get(None, SYSTEM, "m", "uno") == "one"
+    cache.set(None, SYSTEM, "m", "tres", "three")
+    assert cache.get(None, SYSTEM, "m", "dos") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get(None, SYSTEM, "m", "uno") is None
+    assert len(cache) == 1
+
+def test_semantic_tier_matches_near_identical_prompts():
+    from app.response_cache import ResponseCache
+
+    cache = ResponseCache(maxsize=2, ttl=60, semantic=True, threshold=0.85)
+    cache.set(1, SYSTEM, "m", "How do I say hello in Spanish?", "Se dice «hola».")
+    cache.set(1, SYSTEM, "m", "Conjugate the verb tener", "tengo, tienes, tiene…")
+
+    assert cache.get(1, SYSTEM, "m", "how do you say hello in spanish") == "Se dice «hola»."
+    assert cache.get(1, SYSTEM, "m", "Correct this sentence: yo soy cansado") is None
+    assert cache.get(2, SYSTEM, "m", "how do you say hello in spanish") is None
+    assert cache.stats()["agents"]["1"]["semantic_hits"] == 1
+
+    # Evicted entries leave the similarity index too
+    cache.set(1, SYSTEM, "m", "Translate: good night", "Buenas noches")
+    cache.set(1, SYSTEM, "m", "Translate: good morning", "Buenos días")
+    assert len(cache.index) == 2
+    assert cache.get(1, SYSTEM, "m", "how do you say hello in spanish") is None
+
+async def end_active_session(client, db):
+    from app.models import ChatSession
+
+    session_id = (await db.execute(select(ChatSession.id).where(ChatSession.end_time.is_(None)))).scalar_one()
+    assert (await client.post(f"/api/chat/sessions/{session_id}/end")).status_code == 200
+
+@pytest.mark.asyncio
+async def test_repeated_prompt_is_served_from_cache(upstream, client, db, response_cache):
+    from app.models import ChatMessage
+
+    # Opening prompts of two conversations
+    for _ in range(2):
+        response = await client.post("/api/chat/stream", json={"prompt_text": "¿Cómo se dice hello?"})
+        assert "event: done" in response.text
+        await end_active_session(client, db)
+
+    assert len(upstream["llm_requests"]) == 1
+    saved = (await db.execute(select(ChatMessage.response).order_by(ChatMessage.seq))).scalars().all()
+    assert saved == ["".join(REPLY_TOKENS)] * 2
+
+    stats = (await client.get("/health")).json()["response_cache"]
+    assert stats["agents"]["default"]["hits"] == 1 and stats["agents"]["default"]["misses"] == 1
+    assert stats["tokens_saved"] > 0
+
+@pytest.mark.asyncio
+async def test_follow_up_prompts_are_not_shared_between_conversations(upstream, client, db, response_cache):
+    for opening in ("How do I say dog?", "How do I say cat?"):
+        for prompt in (opening, "why?"):
+            response = await client.post("/api/chat/stream", json={"prompt_text": prompt})
+            assert "event: done" in response.text
+        await end_active_session(client, db)
+
+    # "why?" depends on each conversation's history, so both went to the provider
+    assert len(upstream["llm_requests"]) == 4
+    assert response_cache.stats()["hits"] == 0
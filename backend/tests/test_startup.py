@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+def imported_modules(code: str, **env) -> set:
+    """Run `code` in a fresh interpreter and return the modules it imported"""
+    result = subprocess.run(
+        [sys.executable, "-c", code + "\nimport json, sys; print(json.dumps(sorted(sys.modules)))"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+def test_importing_the_app_defers_heavy_dependencies():
+    modules = imported_modules("import app.main")
+    assert "aiohttp" not in modules
+    assert "passlib" not in modules
+    assert "numpy" not in modules
+    assert "app.routers.tts_router" in modules
+    assert "app.routers.ws_router" in modules
+
+def test_disabled_feature_routers_are_not_imported():
+    code = (
+        "import app.main\n"
+        "paths = {route.path for route in app.main.app.routes}\n"
+        "assert '/api/tts/synthesize/' not in paths and '/ws/{token}' not in paths, paths\n"
+        "assert '/api/chat/stream' in paths, paths"
+    )
+    modules = imported_modules(code, ENABLE_TTS="false", ENABLE_WEBSOCKET="false")
+    assert "app.routers.tts_router" not in modules
+    assert "app.routers.ws_router" not in modules
+    assert "app.stt_stream" not in modules
+
+def test_missing_keys_fail_startup_not_import():
+    code = (
+        "import app.config\n"
+        "try:\n"
+        "    app.config.validate_settings()\n"
+        "except ValueError:\n"
+        "    pass\n"
+        "else:\n"
+        "    raise AssertionError('missing keys were accepted')"
+    )
+    imported_modules(code, OPENAI_API_KEY="", DEEPGRAM_API_KEY="")
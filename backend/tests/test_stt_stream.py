@@ -0,0 +1,72 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_audio_frames_stream_interim_and_final_transcripts(upstream, connect_ws):
+    async with connect_ws() as ws:
+        assert ws.close_code is None
+        await ws.send_json({"type": "audio_start", "encoding": "linear16", "sample_rate": 16000, "language": "es"})
+        assert await ws.receive_json() == {"type": "audio_ready"}
+
+        await ws.send_bytes(b"\x00\x01" * 160)
+        first = await ws.receive_json()
+        assert first == {"type": "transcript", "text": "hola 1", "is_final": False, "speech_final": False}
+
+        await ws.send_bytes(b"\x02\x03" * 160)
+        assert (await ws.receive_json())["text"] == "hola 2"
+
+        await ws.send_json({"type": "audio_end"})
+        final = await ws.receive_json()
+        assert final == {"type": "transcript", "text": "hola mundo", "is_final": True, "speech_final": True}
+        assert await ws.receive_json() == {"type": "audio_done"}
+
+    stream = upstream["live_streams"][0]
+    assert stream["frames"] == [b"\x00\x01" * 160, b"\x02\x03" * 160]
+    assert stream["params"]["encoding"] == "linear16"
+    assert stream["params"]["sample_rate"] == "16000"
+    assert stream["params"]["language"] == "es"
+    assert stream["params"]["interim_results"] == "true"
+
+@pytest.mark.asyncio
+async def test_base64_audio_chunk_fallback(upstream, connect_ws):
+    import base64
+
+    async with connect_ws() as ws:
+        await ws.send_json({"type": "audio_start"})
+        await ws.receive_json()
+        await ws.send_json({"type": "audio_chunk", "data": base64.b64encode(b"webm-bytes").decode()})
+        assert (await ws.receive_json())["text"] == "hola 1"
+        await ws.send_json({"type": "audio_end"})
+        assert (await ws.receive_json())["is_final"] is True
+
+    assert upstream["live_streams"][0]["frames"] == [b"webm-bytes"]
+    assert "encoding" not in upstream["live_streams"][0]["params"]
+
+@pytest.mark.asyncio
+async def test_audio_without_open_stream_is_rejected(upstream, connect_ws):
+    async with connect_ws() as ws:
+        await ws.send_bytes(b"orphan")
+        assert await ws.receive_json() == {"type": "error", "error": "No open audio stream"}
+
+    assert upstream["live_streams"] == []
+
+@pytest.mark.asyncio
+async def test_bad_audio_drops_the_stream_not_the_socket(upstream, connect_ws, monkeypatch):
+    from app.stt_stream import StreamingTranscriber
+
+    async with connect_ws() as ws:
+        await ws.send_json({"type": "audio_start"})
+        assert (await ws.receive_json())["type"] == "audio_ready"
+        await ws.send_json({"type": "audio_chunk", "data": "not base64!"})
+        assert await ws.receive_json() == {"type": "error", "error": "Invalid audio data"}
+        await ws.send_bytes(b"late")
+        assert await ws.receive_json() == {"type": "error", "error": "No open audio stream"}
+
+        async def closed(self, chunk):
+            raise RuntimeError("Transcription stream is not open")
+        monkeypatch.setattr(StreamingTranscriber, "send_audio", closed)
+        await ws.send_json({"type": "audio_start"})
+        assert (await ws.receive_json())["type"] == "audio_ready"
+        await ws.send_bytes(b"pcm")
+        assert await ws.receive_json() == {"type": "error", "error": "Transcription stream closed"}
+        await ws.send_json({"type": "heartbeat"})
+        assert (await ws.receive_json())["type"] == "heartbeat"
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from app.tts_cache import TTSCache
+from conftest import SPEECH_CHUNKS
+
+AUDIO = b"".join(SPEECH_CHUNKS)
+
+def test_key_depends_on_every_synthesis_parameter():
+    base = TTSCache.key("hola", "alloy", "tts-1", 1.0, "wav")
+    assert base == TTSCache.key("hola", "alloy", "tts-1", 1.0, "wav")
+    assert base != TTSCache.key("hola", "nova", "tts-1", 1.0, "wav")
+    assert base != TTSCache.key("hola", "alloy", "tts-1-hd", 1.0, "wav")
+    assert base != TTSCache.key("hola", "alloy", "tts-1", 1.25, "wav")
+    assert base != TTSCache.key("hola", "alloy", "tts-1", 1.0, "mp3")
+
+@pytest.mark.asyncio
+async def test_lru_eviction_by_size(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=10)
+    await cache.put("aa1", b"1234")
+    await cache.put("aa2", b"5678")
+    assert await cache.get("aa1") == b"1234"  # "aa2" is now least recently used
+    await cache.put("aa3", b"9012")
+
+    assert await cache.get("aa2") is None
+    assert await cache.get("aa1") == b"1234"
+    assert await cache.get("aa3") == b"9012"
+    assert cache.stats()["bytes"] == 8
+    assert cache.evictions == 1
+    assert not (tmp_path / "aa" / "aa2").exists()
+
+@pytest.mark.asyncio
+async def test_writes_are_atomic_and_index_survives_restart(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=100)
+    await cache.put("ab1", b"audio")
+    assert [p.name for p in (tmp_path / "ab").iterdir()] == ["ab1"]
+
+    # Interrupted write from a previous process
+    (tmp_path / "ab" / ".tmp-partial").write_bytes(b"aud")
+    reloaded = TTSCache(tmp_path, max_bytes=100)
+    assert await reloaded.get("ab1") == b"audio"
+    assert reloaded.stats()["entries"] == 1
+
+@pytest.mark.asyncio
+async def test_disabled_cache_never_stores(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=100, enabled=False)
+    await cache.put("ac1", b"audio")
+    assert await cache.get("ac1") is None
+    assert not os.listdir(tmp_path)
+
+@pytest.mark.asyncio
+async def test_repeat_synthesis_served_without_provider_call(client, upstream, tts_cache):
+    for _ in range(3):
+        response = await client.post("/api/tts/synthesize/", json={"text": "hola", "voice": "alloy"})
+        assert response.status_code == 200
+
+    assert len(upstream["speech_requests"]) == 1
+    stats = tts_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["bytes_saved"] == 2 * len(AUDIO)
+
+@pytest.mark.asyncio
+async def test_streamed_audio_is_cached(client, upstream, tts_cache):
+    params = {"stream": "true"}
+    body = {"text": "buenos dias", "voice": "nova"}
+    first = await client.post("/api/tts/synthesize/", params=params, json=body)
+    second = await client.post("/api/tts/synthesize/", params=params, json=body)
+
+    assert first.content == second.content == AUDIO
+    assert second.headers["content-type"] == "audio/wav"
+    assert len(upstream["speech_requests"]) == 1
+    assert tts_cache.hits == 1
@@ -0,0 +1,46 @@
+import base64
+
+import pytest
+
+from conftest import SPEECH_CHUNKS
+
+@pytest.mark.asyncio
+async def test_streaming_forwards_provider_audio(client, upstream):
+    async with client.stream(
+        "POST",
+        "/api/tts/synthesize/",
+        params={"stream": "true"},
+        json={"text": "hola", "voice": "alloy"}
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/wav"
+        assert "content-length" not in response.headers
+        body = b"".join([chunk async for chunk in response.aiter_bytes()])
+
+    assert body == b"".join(SPEECH_CHUNKS)
+    assert upstream["speech_requests"][0]["response_format"] == "wav"
+
+@pytest.mark.asyncio
+async def test_streaming_uses_requested_format(client, upstream):
+    response = await client.post(
+        "/api/tts/synthesize/",
+        params={"stream": "true"},
+        json={"text": "hola", "voice": "alloy", "format": "mp3"}
+    )
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert upstream["speech_requests"][0]["response_format"] == "mp3"
+
+@pytest.mark.asyncio
+async def test_buffered_mode_still_returns_base64(client, upstream):
+    response = await client.post("/api/tts/synthesize/", json={"text": "hola", "voice": "alloy"})
+    assert base64.b64decode(response.json()["audio_content"]) == b"".join(SPEECH_CHUNKS)
+
+@pytest.mark.asyncio
+async def test_invalid_format_rejected(client, upstream):
+    response = await client.post(
+        "/api/tts/synthesize/",
+        params={"stream": "true"},
+        json={"text": "hola", "voice": "alloy", "format": "midi"}
+    )
+    assert response.status_code == 400
+    assert upstream["speech_requests"] == []
@@ -0,0 +1,60 @@
+import contextlib
+
+import pytest
+
+from conftest import WebSocketSession
+
+IDLE_SOCKETS = 1000
+
+@pytest.mark.asyncio
+async def test_idle_sockets_hold_no_pool_connections(connect_ws, client, auth_user):
+    from app.database import get_pool_stats
+
+    assert IDLE_SOCKETS > get_pool_stats()["size"] + get_pool_stats()["max_overflow"]
+    before = get_pool_stats()
+    async with contextlib.AsyncExitStack() as stack:
+        sockets = [await stack.enter_async_context(connect_ws()) for _ in range(IDLE_SOCKETS)]
+        assert all(ws.close_code is None for ws in sockets)
+
+        # One lookup authenticated every socket and none kept its connection
+        stats = get_pool_stats()
+        assert stats["checkouts_total"] - before["checkouts_total"] == 1
+        assert stats["checked_out"] == 0
+
+        # The pool still serves HTTP and per-message work on the sockets
+        response = await client.post("/api/chat/sessions")
+        assert response.status_code == 200
+        session_id = response.json()["session_id"]
+        await sockets[-1].send_json({"type": "join", "session_id": session_id})
+        assert await sockets[-1].receive_json() == {"type": "joined", "session_id": session_id}
+        assert get_pool_stats()["checked_out"] == 0
+
+@pytest.mark.asyncio
+async def test_token_must_match_auth_session(connect_ws, auth_user):
+    from app.routers.auth_router import create_access_token
+
+    other_token, _ = create_access_token(data={"user_id": auth_user["id"] + 1})
+    async with connect_ws(token=other_token) as ws:
+        assert ws.close_code == 4001
+    async with connect_ws(token="not-a-jwt") as ws:
+        assert ws.close_code == 4001
+    async with connect_ws(session="unknown") as ws:
+        assert ws.close_code == 4001
+
+@pytest.mark.asyncio
+async def test_admin_socket_requires_admin_username(connect_ws, auth_user, monkeypatch):
+    from app import auth
+    from app.main import app
+
+    def admin_socket():
+        return WebSocketSession(app, f"/ws/admin/{auth_user['token']}", f"session={auth_user['session_id']}")
+
+    async with admin_socket() as ws:
+        assert ws.close_code == 4003
+
+    monkeypatch.setattr(auth, "ADMIN_USERNAMES", {"tester"})
+    async with admin_socket() as ws:
+        assert ws.close_code is None
+        await ws.send_json({"command": "get_stats"})
+        reply = await ws.receive_json()
+        assert reply["type"] == "stats" and reply["data"]["admins"]["total"] == 1
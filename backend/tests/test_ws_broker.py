@@ -0,0 +1,148 @@
+import asyncio
+import os
+import socket
+import sys
+from datetime import datetime
+
+import aiohttp
+import pytest
+import pytest_asyncio
+
+from conftest import BACKEND_DIR, FakeSocket, settle
+from resp_server import PubSubServer
+
+@pytest_asyncio.fixture
+async def pubsub_server():
+    server = await PubSubServer().start()
+    yield server
+    await server.close()
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+async def test_managers_on_redis_broker_deliver_to_each_other(pubsub_server):
+    from app.ws import ConnectionManager
+
+    first, second = ConnectionManager(), ConnectionManager()
+    await first.start(pubsub_server.url)
+    await second.start(pubsub_server.url)
+    try:
+        on_first, on_second = FakeSocket(), FakeSocket()
+        await first.connect(on_first, user_id=1)
+        await second.connect(on_second, user_id=2)
+        first.join_room(on_first, 10)
+        second.join_room(on_second, 10)
+        await wait_for(lambda: len(pubsub_server.subscribers.get(b"room:10", ())) == 2)
+
+        # Room messages reach both workers, excluding only the sender's socket
+        await second.send_to_room(10, {"type": "typing"}, exclude=on_second)
+        await wait_for(lambda: on_first.sent)
+        await settle()
+        assert on_second.sent == []
+
+        # User channels are only subscribed where the user is connected
+        await first.send_to_user(2, {"type": "ping"})
+        await wait_for(lambda: on_second.sent)
+        assert len(on_first.sent) == 1
+
+        await first.disconnect(on_first, 1)
+        await wait_for(lambda: b"user:1" not in pubsub_server.subscribers or not pubsub_server.subscribers[b"user:1"])
+        assert first.get_connection_stats()["broker"]["backend"] == "RedisBroker"
+        await second.disconnect(on_second, 2)
+    finally:
+        await first.close()
+        await second.close()
+
+@pytest.mark.asyncio
+async def test_invalidations_reach_every_workers_cache(pubsub_server):
+    from app.cache import TTLCache
+    from app.ws import ConnectionManager
+
+    workers = [ConnectionManager(), ConnectionManager()]
+    caches = [TTLCache(maxsize=10, ttl=3600) for _ in workers]
+    for worker, cache in zip(workers, caches):
+        worker.on_invalidate("auth_session", cache.invalidate)
+        cache.set("session_1", {"id": 1})
+        await worker.start(pubsub_server.url)
+    try:
+        # Revoked well inside the TTL on the worker that did not log out
+        await workers[0].publish_invalidation("auth_session", "session_1")
+        await wait_for(lambda: all(cache.get("session_1") is None for cache in caches))
+    finally:
+        for worker in workers:
+            await worker.close()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_local_delivery():
+    from app.broker import RedisBroker
+    from app.ws import ConnectionManager
+
+    # Nothing listens on the port, so every publish fails to connect
+    manager = ConnectionManager(RedisBroker(f"redis://127.0.0.1:{free_port()}"))
+    socket = FakeSocket()
+    await manager.connect(socket, user_id=1)
+
+    await manager.send_to_user(1, {"type": "ping"})
+    await settle()
+    assert len(socket.sent) == 1
+    assert manager.get_connection_stats()["broker"]["publish_errors"] == 1
+    await manager.disconnect(socket, 1)
+
+async def start_worker(broker_url: str):
+    port = free_port()
+    env = {**os.environ, "WS_BROKER_URL": broker_url, "LOG_LEVEL": "WARNING"}
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    base = f"127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as http:
+        for _ in range(200):
+            try:
+                async with http.get(f"http://{base}/health") as response:
+                    if response.status == 200:
+                        return process, base
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.05)
+    process.kill()
+    raise RuntimeError("worker did not start")
+
+@pytest.mark.asyncio
+async def test_two_worker_processes_share_rooms(pubsub_server, db, auth_user):
+    from app.models import ChatSession
+
+    chat_session = ChatSession(user_id=auth_user["id"], start_time=datetime.utcnow())
+    db.add(chat_session)
+    await db.commit()
+
+    workers = [await start_worker(pubsub_server.url) for _ in range(2)]
+    try:
+        query = f"/ws/{auth_user['token']}?session={auth_user['session_id']}"
+        async with aiohttp.ClientSession() as http:
+            async with http.ws_connect(f"ws://{workers[0][1]}{query}") as tab1, \
+                       http.ws_connect(f"ws://{workers[1][1]}{query}") as tab2:
+                for tab in (tab1, tab2):
+                    await tab.send_json({"type": "join", "session_id": chat_session.id})
+                    assert (await tab.receive_json(timeout=5))["type"] == "joined"
+
+                await tab2.send_json({"type": "chat", "session_id": chat_session.id, "content": "hola"})
+                for tab in (tab1, tab2):
+                    message = await tab.receive_json(timeout=5)
+                    assert message["type"] == "message" and message["content"] == "hola"
+    finally:
+        for process, _ in workers:
+            process.terminate()
+            await process.wait()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import FakeSocket, settle
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_once_and_reaches_everyone():
+    from app.ws import ConnectionManager
+
+    manager = ConnectionManager()
+    users = [FakeSocket() for _ in range(20)]
+    admin = FakeSocket()
+    for i, socket in enumerate(users):
+        await manager.connect(socket, user_id=i % 5)
+    await manager.connect_admin(admin, user_id=99)
+
+    await manager.broadcast_system_message("hola")
+    await settle()
+
+    payloads = [socket.sent[0] for socket in users + [admin]]
+    assert all(p is payloads[0] for p in payloads)
+    assert json.loads(payloads[0])["content"] == "hola"
+
+@pytest.mark.asyncio
+async def test_stalled_socket_is_evicted_without_delaying_others(monkeypatch):
+    from app import ws
+
+    monkeypatch.setattr(ws, "WS_SEND_TIMEOUT", 0.05)
+    manager = ws.ConnectionManager()
+    fast = FakeSocket()
+    stalled = FakeSocket(delay=10)
+    await manager.connect(fast, user_id=1)
+    await manager.connect(stalled, user_id=2)
+
+    await manager.broadcast_system_message("first")
+    await settle()
+    assert len(fast.sent) == 1
+
+    await asyncio.sleep(0.1)
+    assert stalled.closed_with == ws.SLOW_CONSUMER_CLOSE_CODE
+    assert 2 not in manager.active_connections
+    assert stalled not in manager.outbound
+    assert manager.get_connection_stats()["outbound"]["slow_consumers_evicted"] == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy", ["evict", "drop"])
+async def test_full_queue_applies_slow_consumer_policy(monkeypatch, policy):
+    from app import ws
+
+    monkeypatch.setattr(ws, "WS_SEND_QUEUE_SIZE", 2)
+    monkeypatch.setattr(ws, "WS_SLOW_CONSUMER_POLICY", policy)
+    manager = ws.ConnectionManager()
+    slow = FakeSocket(delay=1)
+    await manager.connect(slow, user_id=1)
+
+    # One payload in flight, two queued, the rest overflow
+    for i in range(6):
+        await manager.send_to_user(1, {"n": i})
+        await settle()
+
+    stats = manager.get_connection_stats()["outbound"]
+    if policy == "evict":
+        assert stats["slow_consumers_evicted"] == 1
+        assert 1 not in manager.active_connections
+    else:
+        assert stats["messages_dropped"] == 3
+        assert stats["queued"] == 2
+        assert manager.active_connections[1] == {slow}
+        await manager.disconnect(slow, 1)
+
+@pytest.mark.asyncio
+async def test_failed_send_unregisters_socket():
+    from app.ws import ConnectionManager
+
+    class BrokenSocket(FakeSocket):
+        async def send_text(self, text):
+            raise RuntimeError("connection reset")
+
+    manager = ConnectionManager()
+    broken = BrokenSocket()
+    await manager.connect(broken, user_id=7)
+    await manager.send_to_user(7, {"type": "ping"})
+    await settle()
+    assert manager.active_connections == {} and manager.outbound == {}
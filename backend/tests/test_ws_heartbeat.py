@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from conftest import FakeSocket, WebSocketSession, settle
+
+@pytest.fixture
+def timings(monkeypatch):
+    from app import ws
+
+    monkeypatch.setattr(ws, "WS_HEARTBEAT_INTERVAL", 10)
+    monkeypatch.setattr(ws, "WS_IDLE_TIMEOUT", 30)
+
+@pytest.mark.asyncio
+async def test_quiet_socket_is_pinged_then_reaped(timings):
+    from app import ws
+
+    manager = ws.ConnectionManager()
+    socket = FakeSocket()
+    await manager.connect(socket, user_id=1)
+    manager.join_room(socket, 5)
+    start = manager.outbound[socket].last_seen
+
+    assert manager.reap_idle(start + 5) == 0
+    assert manager.reap_idle(start + 10) == 0
+    await settle()
+    assert [json.loads(t) for t in socket.sent] == [{"type": "ping"}]
+
+    assert manager.reap_idle(start + 30) == 1
+    await settle()
+    assert socket.closed_with == ws.IDLE_CLOSE_CODE
+    assert manager.outbound == {} and manager.rooms == {} and manager.active_connections == {}
+    stats = manager.get_connection_stats()["heartbeat"]
+    assert stats["reaped"] == 1 and stats["pings_sent"] == 1 and stats["scheduled"] == 0
+
+@pytest.mark.asyncio
+async def test_active_socket_is_neither_pinged_nor_reaped(timings):
+    from app import ws
+
+    manager = ws.ConnectionManager()
+    socket = FakeSocket()
+    await manager.connect(socket, user_id=1)
+    start = manager.outbound[socket].last_seen
+
+    manager.outbound[socket].last_seen = start + 8  # client sent something
+    assert manager.reap_idle(start + 12) == 0
+    manager.outbound[socket].last_seen = start + 25
+    assert manager.reap_idle(start + 30) == 0
+    await settle()
+    assert socket.sent == []
+    assert len(manager._deadlines) == 1
+    await manager.disconnect(socket, 1)
+
+@pytest.mark.asyncio
+async def test_reaping_visits_only_due_entries(timings):
+    from app import ws
+
+    manager = ws.ConnectionManager()
+    sockets = [FakeSocket() for _ in range(1000)]
+    for i, socket in enumerate(sockets):
+        await manager.connect(socket, user_id=i)
+    # Only the first ten were connected long enough ago to be due
+    base = manager.outbound[sockets[-1]].last_seen
+    for socket in sockets[:10]:
+        manager.outbound[socket].last_seen = base - 100
+    for socket in sockets[:10]:
+        manager._schedule(socket, base - 90)
+
+    visited = []
+    pop = ws.heapq.heappop
+    def counting_pop(heap):
+        entry = pop(heap)
+        visited.append(entry)
+        return entry
+    ws.heapq.heappop = counting_pop
+    try:
+        assert manager.reap_idle(base) == 10
+    finally:
+        ws.heapq.heappop = pop
+    assert len(visited) == 10
+    assert len(manager.outbound) == 990
+    for socket in sockets[10:]:
+        await manager.disconnect(socket, manager.outbound[socket].user_id)
+
+@pytest.mark.asyncio
+async def test_client_messages_keep_websocket_alive(connect_ws):
+    from app.ws import manager
+
+    async with connect_ws() as ws:
+        socket = next(iter(manager.outbound))
+        before = manager.outbound[socket].last_seen
+        await ws.send_json({"type": "pong"})
+        await ws.send_json({"type": "heartbeat"})
+        assert (await ws.receive_json())["status"] == "alive"
+        assert manager.outbound[socket].last_seen > before
+
+@pytest.mark.asyncio
+async def test_admin_pong_is_not_an_unknown_command(auth_user, monkeypatch, caplog):
+    from app import auth
+    from app.main import app
+
+    monkeypatch.setattr(auth, "ADMIN_USERNAMES", {"tester"})
+    async with WebSocketSession(app, f"/ws/admin/{auth_user['token']}", f"session={auth_user['session_id']}") as ws:
+        await ws.send_json({"type": "pong"})
+        await ws.send_json({"command": "get_stats"})
+        assert (await ws.receive_json())["type"] == "stats"
+    assert "Unknown admin command" not in caplog.text
@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from conftest import FakeSocket, settle
+
+def message_frame(data):
+    from app.ws_protocol import FRAME_MESSAGE, encode_binary
+
+    return encode_binary(FRAME_MESSAGE, json.dumps(data).encode())
+
+def decode(frame):
+    from app.ws_protocol import FRAME_MESSAGE, decode_binary
+
+    kind, payload = decode_binary(frame)
+    assert kind == FRAME_MESSAGE
+    return json.loads(payload)
+
+def test_negotiation_prefers_the_clients_first_known_subprotocol():
+    from app.ws_protocol import BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL, negotiate
+
+    assert negotiate(["chat", BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL]) == BINARY_SUBPROTOCOL
+    assert negotiate([JSON_SUBPROTOCOL]) == JSON_SUBPROTOCOL
+    assert negotiate([]) is None
+
+def test_large_messages_are_compressed_small_ones_are_not():
+    from app.ws_protocol import FLAG_DEFLATE, binary_message, decode_binary
+
+    small = binary_message(json.dumps({"type": "ping"}))
+    large_text = json.dumps({"type": "history_update", "messages": [{"content": "hola " * 20}] * 50})
+    large = binary_message(large_text)
+
+    assert small[1] & FLAG_DEFLATE == 0
+    assert large[1] & FLAG_DEFLATE
+    assert len(large) < len(large_text) / 10
+    assert decode_binary(large)[1].decode() == large_text
+
+def test_decode_frame_by_mode():
+    from app.ws_protocol import FRAME_AUDIO, FrameError, decode_frame, encode_binary
+
+    assert decode_frame({"text": '{"type": "ping"}'}, binary=False) == ({"type": "ping"}, None)
+    assert decode_frame({"bytes": b"pcm"}, binary=False) == (None, b"pcm")
+    assert decode_frame({"bytes": message_frame({"type": "ping"})}, binary=True) == ({"type": "ping"}, None)
+    assert decode_frame({"bytes": encode_binary(FRAME_AUDIO, b"pcm")}, binary=True) == (None, b"pcm")
+    with pytest.raises(FrameError):
+        decode_frame({"text": "{}"}, binary=True)
+    with pytest.raises(FrameError):
+        decode_frame({"bytes": b"\x09\x00"}, binary=True)
+
+def test_decode_rejects_bombs_corrupt_payloads_and_non_objects():
+    import zlib
+    from app.ws_protocol import FLAG_DEFLATE, FRAME_MESSAGE, FrameError, decode_frame
+
+    bomb = bytes((FRAME_MESSAGE, FLAG_DEFLATE)) + zlib.compress(b" " * (8 * 1024 * 1024), 9)
+    corrupt = bytes((FRAME_MESSAGE, FLAG_DEFLATE)) + b"not zlib"
+    for frame in (bomb, corrupt, message_frame([1, 2])):
+        with pytest.raises(FrameError):
+            decode_frame({"bytes": frame}, binary=True)
+    for text in ('["chat"]', "not json"):
+        with pytest.raises(FrameError):
+            decode_frame({"text": text}, binary=False)
+
+@pytest.mark.asyncio
+async def test_fanout_encodes_once_per_format():
+    from app.ws import ConnectionManager
+    from app.ws_protocol import BINARY_SUBPROTOCOL
+
+    manager = ConnectionManager()
+    text_sockets = [FakeSocket() for _ in range(3)]
+    binary_sockets = [FakeSocket() for _ in range(3)]
+    for socket in text_sockets:
+        await manager.connect(socket, user_id=1)
+    for socket in binary_sockets:
+        await manager.connect(socket, user_id=1, subprotocol=BINARY_SUBPROTOCOL)
+
+    await manager.send_to_user(1, {"type": "system", "content": "hola"})
+    await settle()
+
+    assert all(s.sent[0] is text_sockets[0].sent[0] for s in text_sockets)
+    assert all(s.sent[0] is binary_sockets[0].sent[0] for s in binary_sockets)
+    assert decode(binary_sockets[0].sent[0]) == json.loads(text_sockets[0].sent[0])
+
+@pytest.mark.asyncio
+async def test_binary_websocket_session(connect_ws, db, auth_user):
+    from app.models import ChatMessage, ChatSession
+    from app.ws_protocol import BINARY_SUBPROTOCOL, FLAG_DEFLATE
+
+    chat_session = ChatSession(user_id=auth_user["id"], start_time=datetime.utcnow(), last_seq=40)
+    db.add(chat_session)
+    await db.commit()
+    db.add_all([
+        ChatMessage(chat_session_id=chat_session.id, user_id=auth_user["id"], seq=seq,
+                    content=f"mensaje {seq} " * 10, response="respuesta " * 10)
+        for seq in range(1, 41)
+    ])
+    await db.commit()
+
+    async with connect_ws(subprotocols=["tutor.binary.v1"]) as ws:
+        assert ws.subprotocol == BINARY_SUBPROTOCOL
+
+        await ws.send_bytes(message_frame({"type": "heartbeat"}))
+        assert decode(await ws.receive_bytes()) == {"type": "heartbeat", "status": "alive"}
+
+        await ws.send_bytes(message_frame({"type": "history_sync", "chat_session_id": chat_session.id, "since_seq": 0}))
+        frame = await ws.receive_bytes()
+        assert frame[1] & FLAG_DEFLATE
+        assert decode(frame)["last_seq"] == 40
+
+@pytest.mark.asyncio
+async def test_binary_audio_frames_reach_transcriber(upstream, connect_ws):
+    from app.ws_protocol import FRAME_AUDIO, encode_binary
+
+    async with connect_ws(subprotocols=["tutor.binary.v1"]) as ws:
+        await ws.send_bytes(message_frame({"type": "audio_start"}))
+        assert decode(await ws.receive_bytes()) == {"type": "audio_ready"}
+        await ws.send_bytes(encode_binary(FRAME_AUDIO, b"\x00\x01" * 100))
+        assert decode(await ws.receive_bytes())["text"] == "hola 1"
+        await ws.send_bytes(message_frame({"type": "audio_end"}))
+        assert decode(await ws.receive_bytes())["is_final"] is True
+
+    assert upstream["live_streams"][0]["frames"] == [b"\x00\x01" * 100]
+
+@pytest.mark.asyncio
+async def test_json_mode_is_the_default(connect_ws):
+    async with connect_ws() as ws:
+        assert ws.subprotocol is None
+        await ws.send_json({"type": "heartbeat"})
+        assert await ws.receive_json() == {"type": "heartbeat", "status": "alive"}
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from conftest import FakeSocket, settle
+
+@pytest.mark.asyncio
+async def test_room_messages_reach_members_only():
+    from app.ws import ConnectionManager
+
+    manager = ConnectionManager()
+    alice_tab1, alice_tab2, bob, admin = FakeSocket(), FakeSocket(), FakeSocket(), FakeSocket()
+    await manager.connect(alice_tab1, user_id=1)
+    await manager.connect(alice_tab2, user_id=1)
+    await manager.connect(bob, user_id=2)
+    await manager.connect_admin(admin, user_id=99)
+    manager.join_room(alice_tab1, 10)
+    manager.join_room(alice_tab2, "10")
+    manager.join_room(bob, 20)
+
+    await manager.broadcast_message(1, "hola", 10)
+    await settle()
+    assert len(alice_tab1.sent) == len(alice_tab2.sent) == 1
+    assert bob.sent == []
+    assert json.loads(admin.sent[0])["session_id"] == 10
+
+    await manager.send_to_room(10, {"type": "typing"}, exclude=alice_tab1)
+    await settle()
+    assert len(alice_tab1.sent) == 1 and len(alice_tab2.sent) == 2
+
+@pytest.mark.asyncio
+async def test_message_without_session_stays_with_sender():
+    from app.ws import ConnectionManager
+
+    manager = ConnectionManager()
+    alice, bob = FakeSocket(), FakeSocket()
+    await manager.connect(alice, user_id=1)
+    await manager.connect(bob, user_id=2)
+
+    await manager.broadcast_message(1, "hola")
+    await settle()
+    assert len(alice.sent) == 1 and bob.sent == []
+
+@pytest.mark.asyncio
+async def test_leave_and_disconnect_clean_up_rooms():
+    from app.ws import ConnectionManager
+
+    manager = ConnectionManager()
+    socket = FakeSocket()
+    await manager.connect(socket, user_id=1)
+    manager.join_room(socket, 10)
+    manager.join_room(socket, 11)
+
+    manager.leave_room(socket, 10)
+    assert not manager.in_room(socket, 10) and manager.in_room(socket, 11)
+
+    await manager.disconnect(socket, 1)
+    assert manager.rooms == {}
+    assert manager.get_connection_stats()["rooms"] == {"total": 0, "members": 0}
+
+@pytest.mark.asyncio
+async def test_join_requires_owning_the_session(connect_ws, db, auth_user):
+    from app.models import ChatSession, User
+
+    other = User(username="other", email="other@example.com", password_hash="not-used")
+    db.add(other)
+    await db.commit()
+    own = ChatSession(user_id=auth_user["id"], start_time=datetime.utcnow())
+    foreign = ChatSession(user_id=other.id, start_time=datetime.utcnow())
+    db.add_all([own, foreign])
+    await db.commit()
+
+    async with connect_ws() as ws:
+        await ws.send_json({"type": "join", "session_id": foreign.id})
+        assert await ws.receive_json() == {"type": "error", "error": "Session not found"}
+
+        await ws.send_json({"type": "chat", "session_id": own.id, "content": "solo"})
+        message = await ws.receive_json()
+        assert message["content"] == "solo" and message["session_id"] == own.id
+
+        await ws.send_json({"type": "join", "session_id": own.id})
+        assert await ws.receive_json() == {"type": "joined", "session_id": own.id}
+
+        await ws.send_json({"type": "chat", "session_id": own.id, "content": "hola"})
+        message = await ws.receive_json()
+        assert message["type"] == "message" and message["content"] == "hola"
+
+        await ws.send_json({"type": "leave", "session_id": own.id})
+        assert await ws.receive_json() == {"type": "left", "session_id": own.id}
+
+@pytest.mark.asyncio
+async def test_frontend_chat_frame_is_echoed_to_the_sender(connect_ws, auth_user):
+    from app.ws import manager
+
+    async with connect_ws() as ws, connect_ws() as other_tab:
+        # sendWebSocketMessage in the frontend: auth session id, no join
+        await ws.send_json({"type": "chat", "content": "hola", "session_id": auth_user["session_id"]})
+        for socket in (ws, other_tab):
+            message = await socket.receive_json()
+            assert message["type"] == "message" and message["content"] == "hola"
+            assert message["session_id"] == auth_user["session_id"]
+        assert manager.rooms == {}